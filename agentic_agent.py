@@ -2,17 +2,43 @@ from openai import OpenAI
 client = OpenAI()
 import json 
 import os
+from tool_registry import ToolRegistry
+from file_ranges import read_range
+from batch_ops import BatchError
+import batch_ops
+import tree_snapshot
+import content_index
 
-def read_file(filepath):
+TOOLS = ToolRegistry()
+
+@TOOLS.tool
+def read_file(filepath: str, offset: int = 0, limit: int = None, unit: str = "lines", tail: int = None):
+    """
+    Read the contents of a file at the specified filepath.
+    Large reads are capped; a truncated result ends with a marker giving the file size and the offset to continue from.
+
+    Args:
+        filepath: The path to the file to read
+        offset: Number of lines (or bytes, see unit) to skip from the start of the file
+        limit: Maximum number of lines (or bytes) to return
+        unit: "lines" (default) or "bytes", the unit of offset, limit and tail
+        tail: Return the last N lines (or bytes) instead, e.g. the end of a log file
+    """
     print(f"Reading file: {filepath}")
     try:
-        with open(filepath, 'r') as file:
-            content = file.read()
-        return content
+        return read_range(filepath, offset, limit, unit, tail)
     except Exception as error:
         return f"Error reading file: {str(error)}"
 
-def write_file(filepath, content):
+@TOOLS.tool
+def write_file(filepath: str, content: str):
+    """
+    Write content to a file at the specified filepath.
+
+    Args:
+        filepath: The path to the file to write to
+        content: The content to write to the file
+    """
     print(f"Writing to file: {filepath}")
     try:
         with open(filepath, 'w') as file:
@@ -21,7 +47,14 @@ def write_file(filepath, content):
     except Exception as error:
         return f"Error writing file: {str(error)}"
 
-def list_directory(path):
+@TOOLS.tool
+def list_directory(path: str):
+    """
+    List all files and directories in the specified path.
+
+    Args:
+        path: The directory path to list contents from
+    """
     print(f"Listing directory: {path}")
     try:
         entries = os.listdir(path)
@@ -29,7 +62,15 @@ def list_directory(path):
     except Exception as error:
         return f"Error listing directory: {str(error)}"
 
-def move_file(source_path, destination_path):
+@TOOLS.tool
+def move_file(source_path: str, destination_path: str):
+    """
+    Move or rename a file from source path to destination path.
+
+    Args:
+        source_path: The current path of the file to move
+        destination_path: The new path where the file should be moved to
+    """
     print(f"Moving file from {source_path} to {destination_path}")
     try:
         os.rename(source_path, destination_path)
@@ -37,12 +78,26 @@ def move_file(source_path, destination_path):
     except Exception as error:
         return f"Error moving file: {str(error)}"
 
-def contact_user(message):
+@TOOLS.tool
+def contact_user(message: str):
+    """
+    Contact the user to request information or clarification. Use this when you need user input to proceed with the task.
+
+    Args:
+        message: The message or question to present to the user
+    """
     print(f"\n[Agent contacting user]: {message}")
     user_response = input("Your response: ")
     return user_response
 
-def make_directory(path):
+@TOOLS.tool
+def make_directory(path: str):
+    """
+    Create a new directory at the specified path. Creates parent directories if they don't exist.
+
+    Args:
+        path: The path where the directory should be created
+    """
     print(f"Creating directory: {path}")
     try:
         os.makedirs(path, exist_ok=True)
@@ -50,113 +105,106 @@ def make_directory(path):
     except Exception as error:
         return f"Error creating directory: {str(error)}"
 
+@TOOLS.tool
+def move_many(moves: list[dict]):
+    """
+    Move or rename many files in one step. Every move is checked first; if any is invalid nothing is moved, and if one fails part-way the earlier moves are undone. Missing destination folders are created.
+
+    Args:
+        moves: A list of {"source": "current path", "destination": "new path"} objects
+    """
+    print(f"Moving {len(moves)} files")
+    try:
+        return batch_ops.move_many(moves)
+    except BatchError as error:
+        return f"Error: {str(error)}"
+    except Exception as error:
+        return f"Error moving files: {str(error)}"
+
+@TOOLS.tool
+def make_directories(paths: list[str]):
+    """
+    Create several directories (and their parents) in one step. If any can't be created, the ones already created are removed.
+
+    Args:
+        paths: The directory paths to create
+    """
+    print(f"Creating {len(paths)} directories")
+    try:
+        return batch_ops.make_directories(paths)
+    except BatchError as error:
+        return f"Error: {str(error)}"
+    except Exception as error:
+        return f"Error creating directories: {str(error)}"
+
+@TOOLS.tool
+def read_many(paths: list[str]):
+    """
+    Read several files in one call. Each file's text is capped, and files past the total cap are listed as skipped so they can be read in another call.
+
+    Args:
+        paths: The paths of the files to read
+    """
+    print(f"Reading {len(paths)} files")
+    try:
+        return batch_ops.read_many(paths)
+    except Exception as error:
+        return f"Error reading files: {str(error)}"
+
+@TOOLS.tool
+def summarize_folder(path: str = "."):
+    """
+    Summarize every text file below a folder in one call, without reading them in full: a table with one "path | title | headings | keywords" line per file. Use it to decide where files belong; read a file only if its line leaves that unclear.
+
+    Args:
+        path: The folder to summarize (default: the current directory)
+    """
+    print(f"Summarizing folder: {path}")
+    try:
+        return content_index.summarize_folder(path)
+    except Exception as error:
+        return f"Error summarizing folder: {str(error)}"
+
+@TOOLS.tool
+def snapshot_tree(path: str = "."):
+    """
+    Record every file and folder below a path in one call: a nested tree where folders are objects and files are [size in bytes, last modified, content hash]. Returns a snapshot_id to pass to changes_since later.
+
+    Args:
+        path: The directory to snapshot (default: the current directory)
+    """
+    print(f"Taking a snapshot of: {path}")
+    try:
+        return tree_snapshot.snapshot_tree(path)
+    except Exception as error:
+        return f"Error taking snapshot: {str(error)}"
+
+@TOOLS.tool
+def changes_since(snapshot_id: str):
+    """
+    Report what changed in a snapshotted tree since the snapshot was taken: files added, removed, moved (same content at a new path) and edited, and folders added and removed. Returns a new snapshot_id for the current state.
+
+    Args:
+        snapshot_id: The id returned by snapshot_tree (or an earlier changes_since)
+    """
+    print(f"Checking changes since snapshot: {snapshot_id}")
+    try:
+        return tree_snapshot.changes_since(snapshot_id)
+    except Exception as error:
+        return f"Error checking changes: {str(error)}"
+
 
 class Agent:
     def __init__(self):
-        self.tools = [
-            {
-                "type": "function",
-                "name": "read_file",
-                "description": "Read the contents of a file at the specified filepath.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "filepath": {
-                            "type": "string",
-                            "description": "The path to the file to read",
-                        },
-                    },
-                    "required": ["filepath"],
-                },
-            },
-            {
-                "type": "function",
-                "name": "write_file",
-                "description": "Write content to a file at the specified filepath.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "filepath": {
-                            "type": "string",
-                            "description": "The path to the file to write to",
-                        },
-                        "content": {
-                            "type": "string",
-                            "description": "The content to write to the file",
-                        },
-                    },
-                    "required": ["filepath", "content"],
-                },
-            },
-            {
-                "type": "function",
-                "name": "list_directory",
-                "description": "List all files and directories in the specified path.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "path": {
-                            "type": "string",
-                            "description": "The directory path to list contents from",
-                        },
-                    },
-                    "required": ["path"],
-                },
-            },
-            {
-                "type": "function",
-                "name": "move_file",
-                "description": "Move or rename a file from source path to destination path.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "source_path": {
-                            "type": "string",
-                            "description": "The current path of the file to move",
-                        },
-                        "destination_path": {
-                            "type": "string",
-                            "description": "The new path where the file should be moved to",
-                        },
-                    },
-                    "required": ["source_path", "destination_path"],
-                },
-            },
-            {
-                "type": "function",
-                "name": "contact_user",
-                "description": "Contact the user to request information or clarification. Use this when you need user input to proceed with the task.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "message": {
-                            "type": "string",
-                            "description": "The message or question to present to the user",
-                        },
-                    },
-                    "required": ["message"],
-                },
-            },
-            {
-                "type": "function",
-                "name": "make_directory",
-                "description": "Create a new directory at the specified path. Creates parent directories if they don't exist.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "path": {
-                            "type": "string",
-                            "description": "The path where the directory should be created",
-                        },
-                    },
-                    "required": ["path"],
-                },
-            }
-        ] # tools to use
+        self.tools = TOOLS.schemas # tools to use, built once at import
         self.name = "Agent"
         self.system_prompt = f"""
         You are a helpful file system assistant.
         Always check the current state of the file system before taking any action.
+        To read, move or create several files or folders, use read_many, move_many and make_directories
+        instead of one call per file.
+        To organize files by their content, start with summarize_folder rather than reading every file.
+        Use snapshot_tree to see a whole folder at once, and changes_since to see what your moves and edits changed.
         If you need clarification or additional information from the user, use the contact_user tool.
         You can use the following tools:
         {self.tools}
@@ -186,31 +234,7 @@ class Agent:
             print(item)
             if item.type == "function_call":
                 args = json.loads(item.arguments)
-                result = None
-                
-                if item.name == "read_file":
-                    # Execute the function logic for read_file
-                    result = read_file(args.get("filepath"))
-                    
-                elif item.name == "write_file":
-                    # Execute the function logic for write_file
-                    result = write_file(args.get("filepath"), args.get("content"))
-                    
-                elif item.name == "list_directory":
-                    # Execute the function logic for list_directory
-                    result = list_directory(args.get("path"))
-                
-                elif item.name == "move_file":
-                    # Execute the function logic for move_file
-                    result = move_file(args.get("source_path"), args.get("destination_path"))
-                
-                elif item.name == "contact_user":
-                    # Execute the function logic for contact_user
-                    result = contact_user(args.get("message"))
-                
-                elif item.name == "make_directory":
-                    # Execute the function logic for make_directory
-                    result = make_directory(args.get("path"))
+                result = TOOLS.dispatch(item.name, args)
                 
                 # Provide function call results to the model
                 if result is not None:
@@ -2,8 +2,19 @@ from openai import OpenAI
 client = OpenAI()
 import json 
 import os
+from tool_registry import ToolRegistry
+import tree_snapshot
 
-def read_file(filepath):
+TOOLS = ToolRegistry()
+
+@TOOLS.tool
+def read_file(filepath: str):
+    """
+    Read the contents of a file at the specified filepath.
+
+    Args:
+        filepath: The path to the file to read
+    """
     print(f"Reading file: {filepath}")
     try:
         with open(filepath, 'r') as file:
@@ -12,7 +23,15 @@ def read_file(filepath):
     except Exception as error:
         return f"Error reading file: {str(error)}"
 
-def write_file(filepath, content):
+@TOOLS.tool
+def write_file(filepath: str, content: str):
+    """
+    Write content to a file at the specified filepath.
+
+    Args:
+        filepath: The path to the file to write to
+        content: The content to write to the file
+    """
     print(f"Writing to file: {filepath}")
     try:
         with open(filepath, 'w') as file:
@@ -21,7 +40,14 @@ def write_file(filepath, content):
     except Exception as error:
         return f"Error writing file: {str(error)}"
 
-def list_directory(path):
+@TOOLS.tool
+def list_directory(path: str):
+    """
+    List all files and directories in the specified path.
+
+    Args:
+        path: The directory path to list contents from
+    """
     print(f"Listing directory: {path}")
     try:
         entries = os.listdir(path)
@@ -29,7 +55,15 @@ def list_directory(path):
     except Exception as error:
         return f"Error listing directory: {str(error)}"
 
-def move_file(source_path, destination_path):
+@TOOLS.tool
+def move_file(source_path: str, destination_path: str):
+    """
+    Move or rename a file from source path to destination path.
+
+    Args:
+        source_path: The current path of the file to move
+        destination_path: The new path where the file should be moved to
+    """
     print(f"Moving file from {source_path} to {destination_path}")
     try:
         os.rename(source_path, destination_path)
@@ -37,84 +71,45 @@ def move_file(source_path, destination_path):
     except Exception as error:
         return f"Error moving file: {str(error)}"
 
+@TOOLS.tool
+def snapshot_tree(path: str = "."):
+    """
+    Record every file and folder below a path in one call: a nested tree where folders are objects and files are [size in bytes, last modified, content hash]. Returns a snapshot_id to pass to changes_since later.
+
+    Args:
+        path: The directory to snapshot (default: the current directory)
+    """
+    print(f"Taking a snapshot of: {path}")
+    try:
+        return tree_snapshot.snapshot_tree(path)
+    except Exception as error:
+        return f"Error taking snapshot: {str(error)}"
+
+@TOOLS.tool
+def changes_since(snapshot_id: str):
+    """
+    Report what changed in a snapshotted tree since the snapshot was taken: files added, removed, moved (same content at a new path) and edited, and folders added and removed. Returns a new snapshot_id for the current state.
+
+    Args:
+        snapshot_id: The id returned by snapshot_tree (or an earlier changes_since)
+    """
+    print(f"Checking changes since snapshot: {snapshot_id}")
+    try:
+        return tree_snapshot.changes_since(snapshot_id)
+    except Exception as error:
+        return f"Error checking changes: {str(error)}"
+
 
 class Agent:
     def __init__(self):
-        self.tools = [
-            {
-                "type": "function",
-                "name": "read_file",
-                "description": "Read the contents of a file at the specified filepath.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "filepath": {
-                            "type": "string",
-                            "description": "The path to the file to read",
-                        },
-                    },
-                    "required": ["filepath"],
-                },
-            },
-            {
-                "type": "function",
-                "name": "write_file",
-                "description": "Write content to a file at the specified filepath.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "filepath": {
-                            "type": "string",
-                            "description": "The path to the file to write to",
-                        },
-                        "content": {
-                            "type": "string",
-                            "description": "The content to write to the file",
-                        },
-                    },
-                    "required": ["filepath", "content"],
-                },
-            },
-            {
-                "type": "function",
-                "name": "list_directory",
-                "description": "List all files and directories in the specified path.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "path": {
-                            "type": "string",
-                            "description": "The directory path to list contents from",
-                        },
-                    },
-                    "required": ["path"],
-                },
-            },
-            {
-                "type": "function",
-                "name": "move_file",
-                "description": "Move or rename a file from source path to destination path.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "source_path": {
-                            "type": "string",
-                            "description": "The current path of the file to move",
-                        },
-                        "destination_path": {
-                            "type": "string",
-                            "description": "The new path where the file should be moved to",
-                        },
-                    },
-                    "required": ["source_path", "destination_path"],
-                },
-            }
-        ] # tools to use
+        self.tools = TOOLS.schemas # tools to use, built once at import
         self.name = "Agent"
         self.system_prompt = f"""
         You are a helpful file system assistant.
         Don't ask the user clarifying questions as they do not have an interactive terminal.
         Always check the current state of the file system before taking any action.
+        To review changes to a folder, use changes_since with the snapshot_id you are given (or take one with
+        snapshot_tree) instead of listing and reading every file.
         You can use the following tools:
         {self.tools}
         """
@@ -143,23 +138,7 @@ class Agent:
             print(item)
             if item.type == "function_call":
                 args = json.loads(item.arguments)
-                result = None
-                
-                if item.name == "read_file":
-                    # Execute the function logic for read_file
-                    result = read_file(args.get("filepath"))
-                    
-                elif item.name == "write_file":
-                    # Execute the function logic for write_file
-                    result = write_file(args.get("filepath"), args.get("content"))
-                    
-                elif item.name == "list_directory":
-                    # Execute the function logic for list_directory
-                    result = list_directory(args.get("path"))
-                
-                elif item.name == "move_file":
-                    # Execute the function logic for move_file
-                    result = move_file(args.get("source_path"), args.get("destination_path"))
+                result = TOOLS.dispatch(item.name, args)
                 
                 # Provide function call results to the model
                 if result is not None:
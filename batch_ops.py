@@ -0,0 +1,218 @@
+"""
+Batch file operations for the agents' move_many, make_directories and read_many tools.
+
+Reorganizing a folder one move_file call at a time costs a model turn per file.
+These functions take whole lists instead. Every path is checked before anything
+is touched, and all problems are reported together. Moves and directory creation
+then run as one step: if an operation fails part-way, the ones already done are
+undone in reverse order, so the tree is left as it was.
+
+    move_many([{"source": "notes.md", "destination": "notes/notes.md"}, ...])
+    make_directories(["docs/guides", "docs/reference"])
+    read_many(["README.md", "notes/todo.md"])
+"""
+
+import os
+
+from file_ranges import read_range
+
+
+# Most problems listed when validation fails
+MAX_REPORTED_PROBLEMS = 20
+
+# Caps for read_many: per file, and across all files in the call
+READ_MANY_FILE_BYTES = 16 * 1024
+READ_MANY_TOTAL_BYTES = 128 * 1024
+
+
+class BatchError(Exception):
+    """A batch that was rejected up front or rolled back."""
+
+
+def _reject(problems):
+    shown = problems[:MAX_REPORTED_PROBLEMS]
+    more = len(problems) - len(shown)
+    message = f"Nothing was changed; {len(problems)} problem(s):\n" + "\n".join(f"- {problem}" for problem in shown)
+    if more:
+        message += f"\n- ... and {more} more"
+    raise BatchError(message)
+
+
+def _missing_parents(path):
+    """The directories above `path` that don't exist yet, outermost first."""
+    missing = []
+    parent = os.path.dirname(os.path.abspath(path))
+    while parent and not os.path.exists(parent):
+        missing.append(parent)
+        parent = os.path.dirname(parent)
+    return list(reversed(missing))
+
+
+def _blocking_file(path):
+    """The nearest existing ancestor of `path` if it is not a directory, else None."""
+    parent = os.path.dirname(os.path.abspath(path))
+    while parent and not os.path.lexists(parent):
+        parent = os.path.dirname(parent)
+    return parent if parent and not os.path.isdir(parent) else None
+
+
+def _remove_directories(created):
+    """Remove the directories created, innermost first. Returns the ones that couldn't be removed."""
+    left = []
+    for directory in reversed(created):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            left.append(os.path.relpath(directory))
+    return left
+
+
+def make_directories(paths):
+    """
+    Create directories (and their parents).
+
+    Returns:
+        dict: "created" and "existing" paths
+    """
+    problems = []
+    for path in paths:
+        if not isinstance(path, str) or not path:
+            problems.append(f"{path!r}: not a path")
+        elif os.path.exists(path) and not os.path.isdir(path):
+            problems.append(f"{path}: exists and is not a directory")
+        elif _blocking_file(path):
+            problems.append(f"{path}: {os.path.relpath(_blocking_file(path))} is not a directory")
+    if problems:
+        _reject(problems)
+
+    created, existing = [], []
+    made = []  # every directory created, including parents, for rollback
+    try:
+        for path in paths:
+            if os.path.isdir(path):
+                existing.append(path)
+                continue
+            for directory in _missing_parents(path) + [os.path.abspath(path)]:
+                if not os.path.isdir(directory):
+                    os.mkdir(directory)
+                    made.append(directory)
+            created.append(path)
+    except OSError as error:
+        left = _remove_directories(made)
+        message = f"Creating {path} failed: {error}; "
+        if left:
+            message += (f"removed {len(made) - len(left)} of the {len(made)} directories already created; "
+                        f"left in place: {', '.join(left)}")
+        else:
+            message += f"removed the {len(made)} directories already created"
+        raise BatchError(message)
+    return {"created": created, "existing": existing}
+
+
+def _validate_moves(moves):
+    problems, sources, destinations = [], set(), set()
+    for number, move in enumerate(moves, start=1):
+        if not isinstance(move, dict) or not isinstance(move.get("source"), str) \
+                or not isinstance(move.get("destination"), str):
+            problems.append(f"Move {number}: expected an object with 'source' and 'destination' paths")
+            continue
+        source, destination = move["source"], move["destination"]
+        source_path, destination_path = os.path.abspath(source), os.path.abspath(destination)
+        if source_path in sources:
+            problems.append(f"Move {number}: {source} is moved more than once")
+        if destination_path in destinations:
+            problems.append(f"Move {number}: {destination} is the destination of more than one move")
+        sources.add(source_path)
+        destinations.add(destination_path)
+
+        if not os.path.lexists(source):
+            problems.append(f"Move {number}: {source} does not exist")
+        if os.path.lexists(destination):
+            problems.append(f"Move {number}: {destination} already exists")
+        elif destination_path.startswith(os.path.join(source_path, "")):
+            problems.append(f"Move {number}: cannot move {source} into itself")
+        blocked = _blocking_file(destination_path)
+        if blocked:
+            problems.append(f"Move {number}: {os.path.relpath(blocked)} is not a directory")
+
+    # A destination that is also moved away would depend on the order of the moves
+    for number, move in enumerate(moves, start=1):
+        if isinstance(move, dict) and isinstance(move.get("destination"), str) \
+                and os.path.abspath(move["destination"]) in sources:
+            problems.append(f"Move {number}: {move['destination']} is also a source; move it in a separate call")
+    return problems
+
+
+def move_many(moves):
+    """
+    Move or rename many files or directories, creating missing destination folders.
+
+    Args:
+        moves: A list of {"source": path, "destination": path} dicts
+
+    Returns:
+        dict: "moved" (count) and "created_directories"
+    """
+    problems = _validate_moves(moves)
+    if problems:
+        _reject(problems)
+
+    made, done = [], []
+    try:
+        for source, destination in ((move["source"], move["destination"]) for move in moves):
+            for directory in _missing_parents(destination):
+                os.mkdir(directory)
+                made.append(directory)
+            os.rename(source, destination)
+            done.append((source, destination))
+    except OSError as error:
+        not_restored = []
+        for moved_from, moved_to in reversed(done):
+            try:
+                os.rename(moved_to, moved_from)
+            except OSError:
+                not_restored.append(f"{moved_to} (was {moved_from})")
+        left = _remove_directories(made)
+        message = f"Moving {source} to {destination} failed: {error}; "
+        if not_restored:
+            message += (f"rolled back {len(done) - len(not_restored)} of the {len(done)} moves already made; "
+                        f"could not move back: {', '.join(not_restored)}")
+        else:
+            message += f"rolled back the {len(done)} moves already made"
+        if left:
+            message += f"; directories left in place: {', '.join(left)}"
+        raise BatchError(message)
+    return {"moved": len(done), "created_directories": [os.path.relpath(directory) for directory in made]}
+
+
+def read_many(paths, max_file_bytes=READ_MANY_FILE_BYTES, max_total_bytes=READ_MANY_TOTAL_BYTES):
+    """
+    Read several files in one call. Each file is capped at max_file_bytes (with
+    read_file's truncation marker), and files after max_total_bytes is reached are
+    listed as skipped.
+
+    Returns:
+        dict: "files" (path -> text), and "errors" and "skipped" when there are any
+    """
+    files, errors, skipped, total = {}, {}, [], 0
+    for path in paths:
+        if not isinstance(path, str):
+            errors[repr(path)] = "not a path"
+            continue
+        if total >= max_total_bytes:
+            skipped.append(path)
+            continue
+        try:
+            text = read_range(path, max_bytes=min(max_file_bytes, max_total_bytes - total))
+        except Exception as error:
+            errors[path] = str(error)
+            continue
+        files[path] = text
+        total += len(text.encode("utf-8"))
+    result = {"files": files}
+    if errors:
+        result["errors"] = errors
+    if skipped:
+        result["skipped"] = skipped
+        result["note"] = f"Stopped after {total} bytes; read the skipped files in another call"
+    return result
@@ -0,0 +1,226 @@
+"""
+A compact summary of every text file in a folder, for the organizer's summarize_folder tool.
+
+Organizing a folder "based on the content of the files" used to mean a read_file
+call per file, so the tokens spent grew with the size of the folder. This pre-pass
+pulls what a reorganization is usually decided from out of each file locally:
+
+    - the title (the first Markdown heading, or the first line)
+    - up to MAX_HEADINGS further headings
+    - a keyword signature: the terms that are most frequent in the file and rare
+      in the rest of the folder (TF-IDF)
+
+and returns them as one table, so the model can plan every move from a single call
+and only read the files the table leaves unclear.
+
+Files are summarized in parallel in a process pool. Summaries are cached under
+CACHE_DIR by content hash, and a file whose path, size and modification time
+match the cache is not read again at all.
+"""
+
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from tree_snapshot import SKIP_DIRS
+
+
+# Where summaries are cached, relative to the current directory
+CACHE_DIR = ".agent_cache"
+CACHE_FILE = "content_index.json"
+
+# Bytes read from each file, headings kept per file, and terms kept per file for TF-IDF
+MAX_READ_BYTES = 256 * 1024
+MAX_HEADINGS = 4
+MAX_TERMS = 50
+
+# Keywords shown per file, and the most files in one table
+SIGNATURE_TERMS = 6
+MAX_TABLE_FILES = 500
+
+# Fewer files than this are summarized in this process; a pool isn't worth starting
+MIN_FILES_FOR_POOL = 16
+
+_WORD = re.compile(r"[a-z][a-z0-9']{2,}")
+_HEADING = re.compile(r"^\s{0,3}#{1,6}\s+(.+?)\s*#*\s*$")
+
+STOPWORDS = frozenset("""
+    about above after again all also and any are because been before being below between both but can
+    could did does doing down during each few for from further had has have having her here hers him his
+    how into its itself just more most not now off once only other our out over own same she should some
+    such than that the their them then there these they this those through too under until very was were
+    what when where which while who whom why will with would you your yours http https www com
+""".split())
+
+
+def _clean(line):
+    return re.sub(r"[*_`\[\]]", "", line).strip()[:80]
+
+
+def _summarize_file(path):
+    """
+    Title, headings and term counts of one file, read up to MAX_READ_BYTES.
+    Runs in the worker processes.
+
+    Returns:
+        tuple: (content hash, summary dict), or (None, None) for a binary or unreadable file
+    """
+    try:
+        digest = hashlib.blake2b(digest_size=8)
+        with open(path, "rb") as file:
+            data = file.read(MAX_READ_BYTES)
+            digest.update(data)
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+    except OSError:
+        return None, None
+    if b"\0" in data[:8192]:
+        return None, None
+
+    text = data.decode("utf-8", errors="replace")
+    headings, first_line = [], None
+    for line in text.splitlines():
+        heading = _HEADING.match(line)
+        if heading:
+            headings.append(_clean(heading.group(1)))
+            if len(headings) > MAX_HEADINGS:
+                break
+        elif first_line is None and line.strip():
+            first_line = _clean(line)
+    title = headings.pop(0) if headings else first_line or ""
+    terms = Counter(word.strip("'") for word in _WORD.findall(text.lower()) if word not in STOPWORDS)
+    return digest.hexdigest(), {"title": title, "headings": headings[:MAX_HEADINGS],
+                                "terms": dict(terms.most_common(MAX_TERMS))}
+
+
+def _load_cache():
+    try:
+        with open(os.path.join(CACHE_DIR, CACHE_FILE), encoding="utf-8") as file:
+            cache = json.load(file)
+        return cache["files"], cache["summaries"]
+    except (OSError, ValueError, KeyError):
+        return {}, {}
+
+
+def _save_cache(files, summaries):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Keep only summaries some file still has, so the cache doesn't grow forever
+    used = {entry[2] for entry in files.values() if entry[2]}
+    summaries = {digest: summary for digest, summary in summaries.items() if digest in used}
+    temporary_path = os.path.join(CACHE_DIR, f"{CACHE_FILE}.{os.getpid()}.tmp")
+    with open(temporary_path, "w", encoding="utf-8") as file:
+        json.dump({"files": files, "summaries": summaries}, file)
+    os.replace(temporary_path, os.path.join(CACHE_DIR, CACHE_FILE))
+
+
+def _list_files(root):
+    """(path, size, mtime_ns) of every regular file below root."""
+    found, stack = [], [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    found.append((entry.path, stat.st_size, stat.st_mtime_ns))
+    return sorted(found)
+
+
+def _summarize_all(paths, workers):
+    if len(paths) < MIN_FILES_FOR_POOL or workers == 1:
+        return [_summarize_file(path) for path in paths]
+    # Forked workers only: the agent scripts start the agent when imported, so a
+    # spawned worker re-importing __main__ would start another agent
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return [_summarize_file(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as pool:
+        return list(pool.map(_summarize_file, paths, chunksize=8))
+
+
+def _signatures(summaries):
+    """The SIGNATURE_TERMS highest TF-IDF terms of each summary, by content hash."""
+    document_frequency = Counter()
+    for summary in summaries.values():
+        document_frequency.update(summary["terms"].keys())
+    count = len(summaries)
+    signatures = {}
+    for digest, summary in summaries.items():
+        total = sum(summary["terms"].values()) or 1
+        scores = {term: frequency / total * (math.log((1 + count) / (1 + document_frequency[term])) + 1)
+                  for term, frequency in summary["terms"].items()}
+        signatures[digest] = sorted(scores, key=lambda term: (-scores[term], term))[:SIGNATURE_TERMS]
+    return signatures
+
+
+def summarize_folder(path=".", workers=None):
+    """
+    Summarize every text file below `path`.
+
+    Args:
+        path: The folder to summarize
+        workers: Worker processes (default: one per CPU; 1 summarizes in this process)
+
+    Returns:
+        dict: files, summarized (files read this time rather than taken from the
+        cache), skipped (binary or unreadable files), and "table": one
+        "path | title | headings | keywords" line per file
+    """
+    root = os.path.abspath(path)
+    if not os.path.isdir(root):
+        raise ValueError(f"Not a directory: {path}")
+    cached_files, summaries = _load_cache()
+
+    listed = _list_files(root)
+    digests, stale, skipped = {}, [], []
+    for file_path, size, mtime_ns in listed:
+        entry = cached_files.get(file_path)
+        if entry and entry[:2] == [size, mtime_ns] and (entry[2] is None or entry[2] in summaries):
+            if entry[2] is None:
+                skipped.append(file_path)
+            else:
+                digests[file_path] = entry[2]
+        else:
+            stale.append(file_path)
+
+    stats = {file_path: [size, mtime_ns] for file_path, size, mtime_ns in listed}
+    for file_path, (digest, summary) in zip(stale, _summarize_all(stale, workers)):
+        # Binary files are remembered too (with no hash), so they aren't read again
+        cached_files[file_path] = stats[file_path] + [digest]
+        if digest is None:
+            skipped.append(file_path)
+        else:
+            summaries.setdefault(digest, summary)
+            digests[file_path] = digest
+    prefix = os.path.join(root, "")
+    for file_path in [file_path for file_path in cached_files if file_path.startswith(prefix) and file_path not in stats]:
+        del cached_files[file_path]
+    _save_cache(cached_files, summaries)
+
+    present = {digest: summaries[digest] for digest in digests.values()}
+    signatures = _signatures(present)
+    rows = []
+    for file_path in sorted(digests)[:MAX_TABLE_FILES]:
+        summary = present[digests[file_path]]
+        rows.append(" | ".join([
+            os.path.relpath(file_path, root),
+            summary["title"],
+            "; ".join(summary["headings"]),
+            ", ".join(signatures[digests[file_path]]),
+        ]))
+    result = {
+        "files": len(digests),
+        "summarized": len(stale),
+        "table": "path | title | headings | keywords\n" + "\n".join(rows),
+    }
+    if len(digests) > MAX_TABLE_FILES:
+        result["omitted"] = f"Only the first {MAX_TABLE_FILES} files are in the table"
+    if skipped:
+        result["skipped"] = sorted(os.path.relpath(file_path, root) for file_path in skipped)[:MAX_TABLE_FILES]
+    return result
@@ -0,0 +1,467 @@
+"""
+Local stand-in for the OpenAI Responses and Chat Completions APIs.
+
+Runs scripted tool-call scenarios with configurable latency and token counts, so the
+agents can be exercised, load-tested and profiled with no network or API key.
+
+Point the existing clients at it through base_url:
+
+    python fake_llm_server.py --port 8765 --scenario scenario.json --latency-ms 200
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=local python agentic_agent.py
+
+or skip HTTP entirely with the in-process ScriptedClient (AsyncScriptedClient for
+AsyncAgent), which also streams:
+
+    agent = Agent(working_directory=..., client=ScriptedClient(scenario))
+
+A scenario is a JSON object:
+
+    {
+      "rules": [
+        {"when": "Is the goal achieved?", "text": "Yes"}
+      ],
+      "steps": [
+        {"tool_calls": [{"name": "read_file", "arguments": {"filepath": "README.md"}}]},
+        {"tool_calls": [{"name": "finish", "arguments": {"summary": "Done"}}]}
+      ],
+      "final": {"text": "Done."}
+    }
+
+A rule applies when its "when" text appears in the last input message and, if it sets
+"role", that message has that role (e.g. {"role": "tool", "text": ...} answers every
+tool result in a Chat Completions conversation). A rule with "replies" gives the
+next one each time it applies, and keeps giving the last once they run out:
+
+    {"when": "Is the goal achieved?", "replies": [{"text": "No"}, {"text": "Yes"}]}
+
+Otherwise the reply is steps[n], where n is the number of model turns already in
+the conversation (assistant messages and function calls), and "final" once the
+steps run out. Each reply may also set "output_tokens" to override the token count
+it reports.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DEFAULT_SCENARIO = {"rules": [], "steps": [], "final": {"text": "Done."}}
+
+# Rough size of a token when usage is estimated from text
+CHARS_PER_TOKEN = 4
+
+
+def _field(item, name, default=None):
+    if isinstance(item, dict):
+        return item.get(name, default)
+    return getattr(item, name, default)
+
+
+def _text_of(item):
+    content = _field(item, "content")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(str(_field(part, "text", "")) for part in content)
+    return ""
+
+
+def _encode_default(value):
+    if hasattr(value, "model_dump"):
+        return value.model_dump(exclude_none=True, mode="json")
+    if hasattr(value, "__dict__"):
+        return vars(value)
+    return str(value)
+
+
+def _jsonable(value):
+    if hasattr(value, "model_dump"):
+        return value.model_dump(exclude_none=True, mode="json")
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if hasattr(value, "__dict__"):
+        return _jsonable(vars(value))
+    return value
+
+
+class ScriptedModel:
+    """
+    Produces API response bodies (plain dicts) for a scenario.
+
+    Args:
+        scenario: The scenario dict (see the module docstring)
+        latency_ms: Delay before each reply
+        jitter_ms: Random extra delay of up to this many milliseconds
+        output_tokens: Output token count to report when a reply doesn't set one
+            (default: estimated from the reply)
+        item_delay_ms: In a streamed reply, the delay before each output item after
+            the first (as if the model were still producing it)
+    """
+
+    def __init__(self, scenario=None, latency_ms=0, jitter_ms=0, output_tokens=None, item_delay_ms=0):
+        self.scenario = dict(DEFAULT_SCENARIO, **(scenario or {}))
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.output_tokens = output_tokens
+        self.item_delay_ms = item_delay_ms
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._replies_used = {}  # rule index -> how many of its "replies" were given
+        self._in_flight = 0
+        self.stats = {
+            "requests": 0, "responses": 0, "chat_completions": 0,
+            "input_tokens": 0, "output_tokens": 0, "request_bytes": 0,
+            "peak_in_flight": 0,  # most requests being answered at once
+        }
+
+    def _next_id(self):
+        with self._lock:
+            return next(self._ids)
+
+    def delay(self):
+        """Seconds to wait before the next reply."""
+        return (self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)) / 1000
+
+    @contextlib.contextmanager
+    def answering(self):
+        """Count a request as in flight while it is being answered."""
+        with self._lock:
+            self._in_flight += 1
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self._in_flight)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _sleep(self):
+        delay = self.delay()
+        if delay:
+            with self.answering():
+                time.sleep(delay)
+
+    def _pick(self, items, model_turns):
+        last = items[-1] if items else {}
+        last_text = _text_of(last)
+        for number, rule in enumerate(self.scenario["rules"]):
+            if "role" in rule and _field(last, "role") != rule["role"]:
+                continue
+            if rule.get("when", "") in last_text:
+                if "replies" not in rule:
+                    return rule
+                with self._lock:
+                    used = self._replies_used.get(number, 0)
+                    self._replies_used[number] = used + 1
+                return rule["replies"][min(used, len(rule["replies"]) - 1)]
+        steps = self.scenario["steps"]
+        if model_turns < len(steps):
+            return steps[model_turns]
+        return self.scenario["final"]
+
+    def _usage(self, request, reply):
+        request_bytes = len(json.dumps(request, default=_encode_default).encode("utf-8"))
+        input_tokens = request_bytes // CHARS_PER_TOKEN
+        output_tokens = reply.get("output_tokens", self.output_tokens)
+        if output_tokens is None:
+            output_tokens = len(json.dumps(reply)) // CHARS_PER_TOKEN
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["request_bytes"] += request_bytes
+            self.stats["input_tokens"] += input_tokens
+            self.stats["output_tokens"] += output_tokens
+        return input_tokens, output_tokens
+
+    def respond(self, request, sleep=True):
+        """
+        Build a Responses API response body for a responses.create request.
+        With sleep=False the caller waits out delay() itself.
+        """
+        items = request.get("input") or []
+        if isinstance(items, str):
+            items = [{"role": "user", "content": items}]
+        # One model turn may emit several output items (text plus parallel function calls)
+        model_turns = 0
+        previous_was_model = False
+        for item in items:
+            is_model = _field(item, "type") == "function_call" or _field(item, "role") == "assistant"
+            if is_model and not previous_was_model:
+                model_turns += 1
+            previous_was_model = is_model
+        reply = self._pick(items, model_turns)
+        if sleep:
+            self._sleep()
+
+        number = self._next_id()
+        output = []
+        for index, call in enumerate(reply.get("tool_calls", [])):
+            output.append({
+                "type": "function_call",
+                "id": f"fc_{number}_{index}",
+                "call_id": f"call_{number}_{index}",
+                "name": call["name"],
+                "arguments": json.dumps(call.get("arguments", {})),
+                "status": "completed",
+            })
+        if reply.get("text"):
+            output.append({
+                "type": "message",
+                "id": f"msg_{number}",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": reply["text"], "annotations": []}],
+            })
+
+        input_tokens, output_tokens = self._usage(request, reply)
+        with self._lock:
+            self.stats["responses"] += 1
+        return {
+            "id": f"resp_{number}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": "completed",
+            "model": request.get("model", "fake-model"),
+            "output": output,
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": _jsonable(request.get("tools") or []),
+            "usage": {
+                "input_tokens": input_tokens,
+                "input_tokens_details": {"cached_tokens": 0, "cache_write_tokens": 0},
+                "output_tokens": output_tokens,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": input_tokens + output_tokens,
+            },
+        }
+
+    def respond_chat(self, request, sleep=True):
+        """Build a Chat Completions response body for a chat.completions.create request."""
+        messages = request.get("messages") or []
+        model_turns = sum(1 for message in messages if _field(message, "role") == "assistant")
+        reply = self._pick(messages, model_turns)
+        if sleep:
+            self._sleep()
+
+        number = self._next_id()
+        message = {"role": "assistant", "content": reply.get("text")}
+        tool_calls = [
+            {
+                "id": f"call_{number}_{index}",
+                "type": "function",
+                "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))},
+            }
+            for index, call in enumerate(reply.get("tool_calls", []))
+        ]
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+
+        input_tokens, output_tokens = self._usage(request, reply)
+        with self._lock:
+            self.stats["chat_completions"] += 1
+        return {
+            "id": f"chatcmpl_{number}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake-model"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if tool_calls else "stop",
+            }],
+            "usage": {
+                "prompt_tokens": input_tokens,
+                "completion_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        }
+
+
+def stream_events(body, item_delay_ms=0):
+    """
+    Server-sent events for a streamed Responses API call, ending with response.completed.
+    Waits item_delay_ms before each output item after the first.
+    """
+    sequence = itertools.count()
+    in_progress = dict(body, status="in_progress", output=[])
+    yield {"type": "response.created", "sequence_number": next(sequence), "response": in_progress}
+    for index, item in enumerate(body["output"]):
+        if index and item_delay_ms:
+            time.sleep(item_delay_ms / 1000)
+        if item["type"] == "message":
+            for part in item["content"]:
+                yield {"type": "response.output_text.delta", "sequence_number": next(sequence),
+                       "item_id": item["id"], "output_index": index, "content_index": 0,
+                       "delta": part["text"], "logprobs": []}
+        yield {"type": "response.output_item.done", "sequence_number": next(sequence),
+               "output_index": index, "item": item}
+    yield {"type": "response.completed", "sequence_number": next(sequence), "response": body}
+
+
+@functools.lru_cache(maxsize=None)
+def _stream_event_adapter():
+    # Built once: validating against the union of every stream event type is slow to set up
+    from openai.types.responses import ResponseStreamEvent
+    from pydantic import TypeAdapter
+
+    return TypeAdapter(ResponseStreamEvent)
+
+
+class _Endpoint:
+    def __init__(self, model, respond, response_class, stream_event_class=None):
+        self._model = model
+        self._respond = respond
+        self._response_class = response_class
+        self._stream_event_class = stream_event_class
+
+    def create(self, stream=False, **request):
+        if not stream:
+            return self._response_class().model_validate(self._respond(request))
+        if self._stream_event_class is None:
+            raise ValueError("Only responses.create streams")
+        body = self._respond(request)
+        adapter = self._stream_event_class()
+        return (adapter.validate_python(event) for event in stream_events(body, self._model.item_delay_ms))
+
+
+class _AsyncEndpoint(_Endpoint):
+    async def create(self, stream=False, **request):
+        if stream:
+            raise ValueError("AsyncScriptedClient does not stream")
+        with self._model.answering():
+            await asyncio.sleep(self._model.delay())
+        return self._response_class().model_validate(self._respond(request, sleep=False))
+
+
+class ScriptedClient:
+    """
+    In-process client with the same behavior as the server, returning SDK objects.
+
+    Exposes responses.create (which streams with stream=True) and
+    chat.completions.create; `model` is the underlying ScriptedModel (and its stats).
+    """
+
+    _endpoint_class = _Endpoint
+
+    def __init__(self, scenario=None, latency_ms=0, jitter_ms=0, output_tokens=None, item_delay_ms=0):
+        from openai.types.chat import ChatCompletion
+        from openai.types.responses import Response
+
+        self.model = ScriptedModel(scenario, latency_ms, jitter_ms, output_tokens, item_delay_ms)
+        self.responses = self._endpoint_class(self.model, self.model.respond, lambda: Response, _stream_event_adapter)
+        self.chat = type("Chat", (), {})()
+        self.chat.completions = self._endpoint_class(self.model, self.model.respond_chat, lambda: ChatCompletion)
+
+
+class AsyncScriptedClient(ScriptedClient):
+    """ScriptedClient for AsyncOpenAI callers: create() is a coroutine, and latency doesn't block the event loop."""
+
+    _endpoint_class = _AsyncEndpoint
+
+
+def make_handler(model):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") in ("/stats", "/v1/stats"):
+                self._send_json(200, model.stats)
+            elif self.path.rstrip("/") in ("/models", "/v1/models"):
+                self._send_json(200, {"object": "list", "data": [{"id": "fake-model", "object": "model"}]})
+            else:
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send_json(400, {"error": {"message": "Request body is not valid JSON"}})
+                return
+
+            path = self.path.split("?")[0].rstrip("/")
+            if path in ("/v1/responses", "/responses"):
+                body = model.respond(request)
+                if request.get("stream"):
+                    self._send_stream(body)
+                else:
+                    self._send_json(200, body)
+            elif path in ("/v1/chat/completions", "/chat/completions"):
+                self._send_json(200, model.respond_chat(request))
+            else:
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        def _send_stream(self, body):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for event in stream_events(body, model.item_delay_ms):
+                self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+
+def start_server(model, host="127.0.0.1", port=0):
+    """
+    Start the server on a background thread.
+
+    Returns:
+        tuple: (server, base_url). Call server.shutdown() to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(model))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI Responses/Chat Completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--scenario", help="Path to a scenario JSON file")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay before each reply")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Random extra delay up to this much")
+    parser.add_argument("--output-tokens", type=int, help="Output tokens to report per reply")
+    parser.add_argument("--item-delay-ms", type=float, default=0, help="Delay between output items of a streamed reply")
+    args = parser.parse_args()
+
+    scenario = None
+    if args.scenario:
+        with open(args.scenario, "r") as file:
+            scenario = json.load(file)
+
+    model = ScriptedModel(scenario, args.latency_ms, args.jitter_ms, args.output_tokens, args.item_delay_ms)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(model))
+    server.daemon_threads = True
+    print(f"Fake LLM server listening on http://{args.host}:{args.port}/v1")
+    print(f"  export OPENAI_BASE_URL=http://{args.host}:{args.port}/v1 OPENAI_API_KEY=local")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nStats: {json.dumps(model.stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Ranged, size-capped file reads for the agents' read_file tools.
+
+Files are memory-mapped, so reading a slice of a multi-gigabyte log only touches the
+pages that slice covers instead of loading the whole file into a string. Every read
+is capped (DEFAULT_MAX_READ_BYTES); when the cap cuts a read short, the text ends with
+a truncation marker giving the file's total size and the offset to continue from.
+
+    read_range("app.log")                           # first 64 KiB, cut at a line end
+    read_range("app.log", offset=100, limit=50)     # lines 101-150
+    read_range("app.log", tail=20)                  # last 20 lines
+    read_range("dump.sql", offset=4096, limit=1024, unit="bytes")
+"""
+
+import mmap
+import os
+
+
+# About 16k tokens: enough for most source files, small enough to keep context bounded
+DEFAULT_MAX_READ_BYTES = 64 * 1024
+
+UNITS = ("lines", "bytes")
+
+
+def _skip_lines(mm, position, count, size):
+    """The position after `count` more newlines from `position` (or the end of the file)."""
+    for _ in range(count):
+        newline = mm.find(b"\n", position)
+        if newline == -1:
+            return size
+        position = newline + 1
+    return position
+
+
+def _last_lines_start(mm, count, size):
+    """Where the last `count` lines begin (a trailing newline doesn't start a new line)."""
+    end = size - 1 if mm[size - 1:size] == b"\n" else size
+    position = end
+    for _ in range(count):
+        newline = mm.rfind(b"\n", 0, position)
+        if newline == -1:
+            return 0
+        position = newline
+    return position + 1
+
+
+def _format_size(size):
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def read_range(path, offset=0, limit=None, unit="lines", tail=None, max_bytes=DEFAULT_MAX_READ_BYTES,
+               opener=None):
+    """
+    Read part of a file as text.
+
+    Args:
+        path: The file to read
+        offset: Lines (or bytes) to skip from the start of the file
+        limit: Maximum lines (or bytes) to return (default: up to the cap)
+        unit: "lines" or "bytes", the unit of offset, limit and tail
+        tail: Return the last `tail` lines (or bytes) instead; offset is ignored
+        max_bytes: Hard cap on the bytes returned. Line reads are cut at the last
+            complete line that fits.
+        opener: Passed to open(), e.g. to open the file relative to a sandbox
+
+    Returns:
+        str: The text (decoded as UTF-8, undecodable bytes replaced), followed by a
+        truncation marker if the cap cut it short
+
+    Raises:
+        ValueError: For an unknown unit or a negative offset, limit or tail
+        OSError: If the file can't be opened
+    """
+    if unit not in UNITS:
+        raise ValueError(f"unit must be one of {', '.join(UNITS)}, got {unit!r}")
+    for name, value in (("offset", offset), ("limit", limit), ("tail", tail)):
+        if value is not None and value < 0:
+            raise ValueError(f"{name} must not be negative")
+    offset = offset or 0
+
+    with open(path, "rb", opener=opener) as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            # Empty, or not a regular file (a pipe or /proc entry): read up to the cap
+            data = file.read(max_bytes + 1)
+            truncated = len(data) > max_bytes
+            text = data[:max_bytes].decode("utf-8", errors="replace")
+            if truncated:
+                text += f"\n[Truncated at {max_bytes} bytes; the file has no fixed size]"
+            return text
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if unit == "bytes":
+                start = max(0, size - tail) if tail is not None else min(offset, size)
+                end = size if limit is None else min(size, start + limit)
+            else:
+                if tail is not None:
+                    start = _last_lines_start(mm, tail, size) if tail else size
+                else:
+                    start = _skip_lines(mm, 0, offset, size)
+                end = size if limit is None else _skip_lines(mm, start, limit, size)
+
+            truncated = end - start > max_bytes
+            if truncated and tail is not None:
+                # Keep the end of a tail read; drop the partial first line
+                start = end - max_bytes
+                if unit == "lines":
+                    newline = mm.find(b"\n", start, end)
+                    if newline != -1 and newline + 1 < end:
+                        start = newline + 1
+            elif truncated:
+                end = start + max_bytes
+                if unit == "lines":
+                    # Don't cut the last line in half unless it alone exceeds the cap
+                    newline = mm.rfind(b"\n", start, end)
+                    if newline != -1:
+                        end = newline + 1
+
+            text = mm[start:end].decode("utf-8", errors="replace")
+
+    if not truncated:
+        return text
+
+    if tail is not None:
+        where = f"the last {end - start} bytes"
+        hint = f"earlier content is before byte {start} (read it with unit='bytes')"
+    elif unit == "lines" and "\n" not in text:
+        where = f"the first {end - start} bytes of line {offset + 1}"
+        hint = f"continue with unit='bytes' and offset={end}"
+    elif unit == "lines":
+        shown = text.count("\n")
+        where = f"lines {offset + 1}-{offset + shown}"
+        hint = f"continue with offset={offset + shown}"
+    else:
+        where = f"bytes {start}-{end}"
+        hint = f"continue with offset={end}"
+    return (text if text.endswith("\n") else text + "\n") + (
+        f"[Truncated: showed {where} of a {_format_size(size)} ({size} byte) file; {hint}]"
+    )
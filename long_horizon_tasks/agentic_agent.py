@@ -1,13 +1,175 @@
 from openai import OpenAI
-client = OpenAI()
 import json 
 import os
+import re
 import subprocess
-import shlex
+import sys
+import threading
+import time
+import uuid
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tool_registry import ToolRegistry
+from context_compaction import ContextCompactor, Memory
+from prompt_layout import PromptLayout
+from code_search import TrigramIndex
+from symbol_index import SymbolIndex
+from import_graph import ImportGraph
+from pytest_runner import run_pytest
+from patching import PatchError, apply_edits, apply_unified_diff, compact_diff
+from shell_session import ShellSession
+from process_manager import ProcessManager
+from sandbox_fs import Sandbox, SandboxError
+from checkpoint import CheckpointLog, load_checkpoint
+from output_capture import OutputCapture, run_captured
+from replay_client import client_from_env, register_working_directory
+from tracing import default_tracer
+from file_ranges import DEFAULT_MAX_READ_BYTES, read_range
+
+# AGENT_REPLAY_MODE=record|replay wraps the client in the record/replay cache
+client = client_from_env(OpenAI)
+
+TOOLS = ToolRegistry()
+
+MODEL = "gpt-5.2"
+
+# Where execute_command writes output too long to return in full, relative to the working directory
+COMMAND_OUTPUT_DIR = ".agent_output"
+
+# Most of those files an agent keeps; the oldest is deleted when another is written,
+# and the rest when the agent is closed
+MAX_COMMAND_OUTPUT_FILES = 20
+
+# execute_command as described to agents whose commands each run in a new shell
+# (persistent_shell=False, and AsyncAgent), instead of the persistent session
+SEPARATE_SHELL_COMMAND_DESCRIPTION = (
+    "Execute a terminal command in a new bash shell that starts in the working directory. Every command runs in "
+    "its own shell, so cd, exported variables and activated virtualenvs do not carry over to later commands; "
+    "combine steps that depend on each other in one command (e.g. 'cd app && . venv/bin/activate && pytest'). "
+    "Returns stdout, stderr and exit code. Long output is cut to its first and last lines; the byte and line "
+    "counts are always reported, and the full output is saved to the file named in stdout_file/stderr_file "
+    "(read it with read_file). Use for commands that complete quickly (< 30 seconds)."
+)
+
+# Per-phase instructions. They are appended after the conversation so every request
+# starts with the same system prompt + tools prefix.
+PLAN_PROMPT = "Determine a plan to achieve the user's goal. "
+ACT_PROMPT = "Generate a sequence of tool calls to achieve the steps in the plan:\n"
+CHECK_PROMPT = "Is the goal achieved? Respond with 'Yes' or 'No'. "
+SUMMARY_PROMPT = "Summarize the results of the tool calls and the goal achievement."
+REFLECT_PROMPT = "Reflect on the actions taken and the results achieved. What is the next step to achieve the goal?"
+TOOL_RESULTS_INSTRUCTION = "Respond with the results from the tool calls."
+LOOP_INSTRUCTION = ("Work toward the user's goal by calling tools. "
+                    "When the goal is achieved, call the finish tool with a summary of the results.")
+
+# Span names for the phases of the plan/act/check cycle, by prompt prefix
+PHASES = (
+    (PLAN_PROMPT, "plan"),
+    (ACT_PROMPT, "act"),
+    (CHECK_PROMPT, "check"),
+    (SUMMARY_PROMPT, "summary"),
+    (REFLECT_PROMPT, "reflect"),
+)
+
+
+# Tools whose arguments name paths they modify. Calls that touch the same path
+# are serialized in their original order when tool calls run concurrently.
+MUTATING_TOOLS = {
+    "write_file": ("filepath",),
+    "edit_file": ("filepath",),
+    "move_file": ("source_path", "destination_path"),
+    "make_directory": ("path",),
+}
+
+# Tools that only read the paths they are given.
+READING_TOOLS = {
+    "read_file": ("filepath",),
+    "list_directory": ("path",),
+}
+
+
+_separate_shell_schemas = []
+
+
+def separate_shell_schemas():
+    """TOOLS.schemas with execute_command described by SEPARATE_SHELL_COMMAND_DESCRIPTION, built once."""
+    global _separate_shell_schemas
+    if len(_separate_shell_schemas) != len(TOOLS.schemas):
+        _separate_shell_schemas = [
+            dict(schema, description=SEPARATE_SHELL_COMMAND_DESCRIPTION) if schema["name"] == "execute_command" else schema
+            for schema in TOOLS.schemas
+        ]
+    return _separate_shell_schemas
+
+
+class ToolCallBatch:
+    """
+    The function calls of one model turn, started as soon as each one is known.
+    
+    With an executor, calls run concurrently on its bounded thread pool. A call waits
+    for every earlier call that writes a path it touches (and a write waits for
+    earlier reads of that path too), so mutations of the same path keep their
+    original order. Without an executor, each call runs as it is submitted.
+    Outputs are returned in the original call_id order either way.
+    """
+    
+    def __init__(self, agent, executor=None):
+        self.agent = agent
+        self.executor = executor
+        self._results = []      # futures, or outputs when running inline
+        self._submitted = set()
+        self._last_writer = {}  # path -> future of the latest call writing it
+        self._readers = {}      # path -> futures of calls reading it since that write
+    
+    def submit(self, item):
+        """Start a function_call item. Items already submitted are ignored."""
+        if item.call_id in self._submitted:
+            return
+        self._submitted.add(item.call_id)
+        
+        if self.executor is None:
+            self._results.append(self.agent._tool_output(item))
+            return
+        
+        dependencies = []
+        accesses = self.agent._path_accesses(item)
+        for key, is_write in accesses:
+            if key in self._last_writer:
+                dependencies.append(self._last_writer[key])
+            if is_write:
+                dependencies.extend(self._readers.get(key, []))
+        
+        # Earlier calls are always submitted (and started) first, so waiting on
+        # them inside a worker cannot deadlock the FIFO pool. The worker runs in a
+        # copy of this context so its tool span nests under the current span.
+        future = self.executor.submit(contextvars.copy_context().run, self._run_after, dependencies, item)
+        self._results.append(future)
+        
+        for key, is_write in accesses:
+            if is_write:
+                self._last_writer[key] = future
+                self._readers[key] = []
+            else:
+                self._readers.setdefault(key, []).append(future)
+    
+    def _run_after(self, dependencies, item):
+        if dependencies:
+            wait(dependencies)
+        return self.agent._tool_output(item)
+    
+    def outputs(self):
+        """Wait for every submitted call and return the function_call_output items in call order."""
+        outputs = [result.result() if isinstance(result, Future) else result for result in self._results]
+        return [output for output in outputs if output is not None]
 
 
 class Agent:
-    def __init__(self, working_directory=None):
+    def __init__(self, working_directory=None, parallel_tools=True, max_tool_workers=8,
+                 max_input_tokens=120_000, keep_recent_turns=4, client=None, stream=False,
+                 tracer=None, max_read_bytes=DEFAULT_MAX_READ_BYTES, persistent_shell=True,
+                 command_output_dir=COMMAND_OUTPUT_DIR, checkpoint_path=None):
         # Set the working directory - if None, use current directory
         if working_directory is None:
             self.working_directory = os.getcwd()
@@ -22,144 +184,70 @@ class Agent:
         
         print(f"[Agent initialized with restricted access to: {self.working_directory}]")
         
-        self.tools = [
-            {
-                "type": "function",
-                "name": "read_file",
-                "description": "Read the contents of a file at the specified filepath. Paths can be relative to the working directory or absolute (but must be within the allowed directory).",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "filepath": {
-                            "type": "string",
-                            "description": "The path to the file to read (relative or absolute)",
-                        },
-                    },
-                    "required": ["filepath"],
-                },
-            },
-            {
-                "type": "function",
-                "name": "write_file",
-                "description": "Write content to a file at the specified filepath. Paths can be relative to the working directory or absolute (but must be within the allowed directory).",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "filepath": {
-                            "type": "string",
-                            "description": "The path to the file to write to (relative or absolute)",
-                        },
-                        "content": {
-                            "type": "string",
-                            "description": "The content to write to the file",
-                        },
-                    },
-                    "required": ["filepath", "content"],
-                },
-            },
-            {
-                "type": "function",
-                "name": "list_directory",
-                "description": "List all files and directories in the specified path. Paths can be relative to the working directory or absolute (but must be within the allowed directory).",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "path": {
-                            "type": "string",
-                            "description": "The directory path to list contents from (relative or absolute)",
-                        },
-                    },
-                    "required": ["path"],
-                },
-            },
-            {
-                "type": "function",
-                "name": "move_file",
-                "description": "Move or rename a file from source path to destination path. Both paths must be within the allowed directory.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "source_path": {
-                            "type": "string",
-                            "description": "The current path of the file to move (relative or absolute)",
-                        },
-                        "destination_path": {
-                            "type": "string",
-                            "description": "The new path where the file should be moved to (relative or absolute)",
-                        },
-                    },
-                    "required": ["source_path", "destination_path"],
-                },
-            },
-            {
-                "type": "function",
-                "name": "contact_user",
-                "description": "Contact the user to request information or clarification. Use this when you need user input to proceed with the task.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "message": {
-                            "type": "string",
-                            "description": "The message or question to present to the user",
-                        },
-                    },
-                    "required": ["message"],
-                },
-            },
-            {
-                "type": "function",
-                "name": "make_directory",
-                "description": "Create a new directory at the specified path. Creates parent directories if they don't exist. Path must be within the allowed directory.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "path": {
-                            "type": "string",
-                            "description": "The path where the directory should be created (relative or absolute)",
-                        },
-                    },
-                    "required": ["path"],
-                },
-            },
-            {
-                "type": "function",
-                "name": "execute_command",
-                "description": "Execute a terminal command in the working directory. Returns stdout, stderr, and exit code. Use for commands that complete quickly (< 30 seconds).",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "command": {
-                            "type": "string",
-                            "description": "The command to execute (e.g., 'ls -la', 'python script.py', 'grep pattern file.txt')",
-                        },
-                        "timeout": {
-                            "type": "number",
-                            "description": "Maximum execution time in seconds (default: 30)",
-                        },
-                    },
-                    "required": ["command"],
-                },
-            },
-            {
-                "type": "function",
-                "name": "execute_background_command",
-                "description": "Execute a terminal command in the background (non-blocking). Use for long-running processes like web servers, watchers, etc. Returns immediately with the process ID.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "command": {
-                            "type": "string",
-                            "description": "The command to execute in the background (e.g., 'python -m http.server 8000', 'npm run dev')",
-                        },
-                        "log_file": {
-                            "type": "string",
-                            "description": "Optional path to redirect stdout/stderr (relative to working directory)",
-                        },
-                    },
-                    "required": ["command"],
-                },
-            }
-        ] # tools to use
+        # File tools resolve and open paths through the sandbox (see sandbox_fs.py),
+        # which keeps the working directory and recently validated directories open
+        self.sandbox = Sandbox(self.working_directory)
+        
+        # Independent tool calls from the same model turn run on a bounded thread pool
+        self.parallel_tools = parallel_tools
+        self.max_tool_workers = max_tool_workers
+        self._tool_executor = None
+        self._tool_executor_lock = threading.Lock()
+        
+        # Old tool outputs are stubbed and the oldest turns dropped to stay in budget
+        self.compactor = ContextCompactor(
+            max_input_tokens=max_input_tokens,
+            keep_recent_turns=keep_recent_turns
+        )
+        
+        # Every request shares the system prompt + tools prefix; phase text goes last
+        self.prompt_layout = PromptLayout(MODEL)
+        
+        # OpenAI-compatible client; None uses the module-level client
+        self.client = client
+        # Recorded requests replay from another checkout (see replay_client.py)
+        register_working_directory(self.working_directory)
+        self.finish_summary = None
+        
+        # Stream responses, printing text and starting tools as soon as they arrive
+        self.stream = stream
+        
+        # Spans for runs, phases, model calls and tool calls (see tracing.py);
+        # the default tracer writes to AGENT_TRACE_FILE and is off when it is unset
+        self.tracer = tracer if tracer is not None else default_tracer()
+        
+        # Cap on the bytes a single read_file call returns
+        self.max_read_bytes = max_read_bytes
+        
+        # Trigram index for search_code and symbol table for find_symbol/find_references,
+        # each built on first use
+        self._code_index = None
+        self._symbol_index = None
+        self._import_graph = None  # for run_tests' affected-test selection
+        self._index_lock = threading.Lock()
+        
+        # execute_command runs in one long-lived bash session (see shell_session.py), so
+        # cd, exports and activated virtualenvs carry over between calls
+        self.persistent_shell = persistent_shell
+        self._shell = None
+        self._shell_lock = threading.Lock()
+        
+        # Background processes, with their logs, for the process tools
+        self.processes = ProcessManager(self.working_directory)
+        
+        # Append-only log of the memory and run state after every phase (see
+        # checkpoint.py), so Agent.resume() can continue an interrupted run
+        self.checkpoints = CheckpointLog(checkpoint_path) if checkpoint_path else None
+        
+        # Command output is kept as a bounded head and tail (see output_capture.py); output
+        # that doesn't fit is written in full to this directory (None to drop it)
+        self.command_output_dir = command_output_dir
+        self._command_output_files = []  # written by this agent, oldest first
+        self._command_output_lock = threading.Lock()
+        
+        # tools to use, built once; without a persistent shell, execute_command mustn't
+        # promise that state carries over between commands
+        self.tools = TOOLS.schemas if persistent_shell else separate_shell_schemas()
         self.name = "Agent"
         self.system_prompt = f"""
         You are an agent with restricted access to: {self.working_directory}
@@ -190,15 +278,26 @@ class Agent:
         - All terminal commands execute in the working directory context
         
         AVAILABLE CAPABILITIES:
-        - File operations: read, write, move, list directories, create directories
+        - File operations: read, write, edit, move, list directories, create directories
+        - Code search: search_code finds a string or regex across the working directory
+        - Python symbols: find_symbol returns a definition's signature and line range,
+          find_references lists where a name is used
         - Terminal commands: execute commands synchronously or in the background
+        - Tests: run_tests runs pytest and returns structured results
+        - Background processes: list them, read their new log output, wait for a port, stop them
         - User interaction: contact user for clarification
+        - Completion: call finish with a summary once the goal is achieved
         
         Always check the current state of the file system before taking any action.
         If you need clarification or additional information from the user, use the contact_user tool.
         
         For commands that take a long time (web servers, dev servers, watchers), use execute_background_command.
-        For quick commands (ls, grep, python script.py), use execute_command.
+        For quick commands (ls, python script.py), use execute_command.
+        After starting a server, use wait_for_port and read_process_log instead of sleep commands.
+        To find code or text, use search_code rather than grep or reading files one by one.
+        To look up a function or class, use find_symbol and then read only its line range.
+        To change an existing file, use edit_file with small search/replace edits instead of rewriting it with write_file.
+        To run tests, use run_tests; after an edit, run_tests with affected=true reruns only the tests it can affect.
         
         You can use the following tools:
         {self.tools}
@@ -208,6 +307,15 @@ class Agent:
             
         ] # memory to use
     
+    @property
+    def memory(self):
+        return self._memory
+    
+    @memory.setter
+    def memory(self, items):
+        # Items are stored as MemoryItems, each serialized at most once (see context_compaction.py)
+        self._memory = items if isinstance(items, Memory) else Memory(items)
+    
     def _validate_path(self, filepath):
         """
         Validates that a filepath is within the allowed directory.
@@ -219,34 +327,32 @@ class Agent:
         Returns:
             tuple: (is_valid: bool, normalized_path: str or None, error_message: str or None)
         """
-        try:
-            # Resolve to absolute paths and normalize (removes .., symlinks, etc.)
-            abs_allowed_dir = os.path.realpath(self.working_directory)
-            
-            # If filepath is relative, join it with working_directory first
-            if not os.path.isabs(filepath):
-                filepath = os.path.join(self.working_directory, filepath)
-            
-            abs_filepath = os.path.realpath(filepath)
-            
-            # Check if the filepath is within the allowed directory
-            # os.path.commonpath returns the longest common sub-path
+        with self.tracer.span("validate_path"):
             try:
-                common_path = os.path.commonpath([abs_allowed_dir, abs_filepath])
-            except ValueError:
-                # Different drives on Windows
-                return False, None, f"Access denied: Path is outside allowed directory"
-            
-            if common_path != abs_allowed_dir:
+                # Relative paths are relative to the working directory; .. and
+                # symlinks are resolved, and the result must stay inside it
+                return True, self.sandbox.resolve(filepath), None
+            except SandboxError:
+                if not os.path.isabs(filepath):
+                    filepath = os.path.join(self.working_directory, filepath)
                 return False, None, f"Access denied: Path '{filepath}' is outside allowed directory '{self.working_directory}'"
-            
-            return True, abs_filepath, None
-            
-        except Exception as error:
-            return False, None, f"Path validation error: {str(error)}"
+            except Exception as error:
+                return False, None, f"Path validation error: {str(error)}"
     
-    def _read_file(self, filepath):
-        """Read the contents of a file at the specified filepath."""
+    @TOOLS.tool
+    def _read_file(self, filepath: str, offset: int = 0, limit: int = None, unit: str = "lines",
+                   tail: int = None):
+        """
+        Read the contents of a file at the specified filepath. Paths can be relative to the working directory or absolute (but must be within the allowed directory).
+        Large reads are capped; a truncated result ends with a marker giving the file size and the offset to continue from.
+        
+        Args:
+            filepath: The path to the file to read (relative or absolute)
+            offset: Number of lines (or bytes, see unit) to skip from the start of the file
+            limit: Maximum number of lines (or bytes) to return
+            unit: "lines" (default) or "bytes", the unit of offset, limit and tail
+            tail: Return the last N lines (or bytes) instead, e.g. the end of a log file
+        """
         print(f"Reading file: {filepath}")
         
         is_valid, normalized_path, error_msg = self._validate_path(filepath)
@@ -254,14 +360,20 @@ class Agent:
             return error_msg
         
         try:
-            with open(normalized_path, 'r') as file:
-                content = file.read()
-            return content
+            return read_range(normalized_path, offset, limit, unit, tail, self.max_read_bytes,
+                              opener=self.sandbox.opener)
         except Exception as error:
             return f"Error reading file: {str(error)}"
     
-    def _write_file(self, filepath, content):
-        """Write content to a file at the specified filepath."""
+    @TOOLS.tool
+    def _write_file(self, filepath: str, content: str):
+        """
+        Write content to a file at the specified filepath. Paths can be relative to the working directory or absolute (but must be within the allowed directory).
+        
+        Args:
+            filepath: The path to the file to write to (relative or absolute)
+            content: The content to write to the file
+        """
         print(f"Writing to file: {filepath}")
         
         is_valid, normalized_path, error_msg = self._validate_path(filepath)
@@ -270,18 +382,81 @@ class Agent:
         
         try:
             # Create parent directory if it doesn't exist
-            parent_dir = os.path.dirname(normalized_path)
-            if parent_dir and not os.path.exists(parent_dir):
-                os.makedirs(parent_dir, exist_ok=True)
+            self.sandbox.makedirs(os.path.dirname(normalized_path))
                 
-            with open(normalized_path, 'w') as file:
+            with open(normalized_path, 'w', opener=self.sandbox.opener) as file:
                 file.write(content)
+            self._files_changed(normalized_path)
             return f"Successfully wrote to {filepath}"
         except Exception as error:
             return f"Error writing file: {str(error)}"
     
-    def _list_directory(self, path):
-        """List all files and directories in the specified path."""
+    @TOOLS.tool
+    def _edit_file(self, filepath: str, edits: list[dict] = None, diff: str = None):
+        """
+        Change part of an existing file without rewriting it. Give either edits (exact search/replace pairs) or a unified diff. Prefer this over write_file for changes to existing files: only the changed text needs to be sent. Nothing is changed if any edit doesn't match. Returns a compact diff of the change.
+        
+        Args:
+            filepath: The path to the file to edit (relative or absolute)
+            edits: A list of {"search": "exact text to find", "replace": "text to put there"} objects. Each search text must occur exactly once in the file (include enough surrounding lines to make it unique), and edits must not overlap.
+            diff: A unified diff of the file ('@@ -start,count +start,count @@' hunks with ' ', '-' and '+' lines)
+        """
+        print(f"Editing file: {filepath}")
+        
+        if (edits is None) == (diff is None):
+            return "Error: Give either edits or diff"
+        
+        is_valid, normalized_path, error_msg = self._validate_path(filepath)
+        if not is_valid:
+            return error_msg
+        
+        try:
+            with open(normalized_path, "r", encoding="utf-8", newline="", opener=self.sandbox.opener) as file:
+                original = file.read()
+                permissions = os.fstat(file.fileno()).st_mode & 0o7777
+            if edits is not None:
+                updated = apply_edits(original, edits)
+            else:
+                updated = apply_unified_diff(original, diff)
+            if updated == original:
+                return f"No changes: the edit leaves {filepath} as it was"
+            
+            # Write a temporary file and rename it over the original, so a failed
+            # write never leaves the file half-edited
+            temporary_path = f"{normalized_path}.{uuid.uuid4().hex[:8]}.tmp"
+            try:
+                with open(temporary_path, "w", encoding="utf-8", newline="", opener=self.sandbox.opener) as file:
+                    file.write(updated)
+                    os.fchmod(file.fileno(), permissions)
+                self.sandbox.replace(temporary_path, normalized_path)
+            finally:
+                if os.path.lexists(temporary_path):
+                    self.sandbox.remove(temporary_path)
+            self._files_changed(normalized_path)
+            
+            relative_path = os.path.relpath(normalized_path, self.working_directory)
+            return {
+                "path": relative_path,
+                "diff": compact_diff(original, updated, relative_path),
+                "lines": updated.count("\n") + (0 if updated.endswith("\n") else 1),
+            }
+        except FileNotFoundError:
+            return f"Error: File not found: {filepath} (use write_file to create it)"
+        except PatchError as error:
+            return f"Error: Edit not applied: {str(error)}"
+        except UnicodeDecodeError:
+            return f"Error: {filepath} is not a UTF-8 text file"
+        except Exception as error:
+            return f"Error editing file: {str(error)}"
+    
+    @TOOLS.tool
+    def _list_directory(self, path: str):
+        """
+        List all files and directories in the specified path. Paths can be relative to the working directory or absolute (but must be within the allowed directory).
+        
+        Args:
+            path: The directory path to list contents from (relative or absolute)
+        """
         print(f"Listing directory: {path}")
         
         is_valid, normalized_path, error_msg = self._validate_path(path)
@@ -289,13 +464,24 @@ class Agent:
             return error_msg
         
         try:
-            entries = os.listdir(normalized_path)
+            entries = self.sandbox.listdir(normalized_path)
+            if self.command_output_dir:
+                # The agent's own scratch directory isn't part of the project
+                output_dir = os.path.join(self.working_directory, self.command_output_dir)
+                entries = [entry for entry in entries if os.path.join(normalized_path, entry) != output_dir]
             return {"entries": entries, "count": len(entries)}
         except Exception as error:
             return f"Error listing directory: {str(error)}"
     
-    def _move_file(self, source_path, destination_path):
-        """Move or rename a file from source path to destination path."""
+    @TOOLS.tool
+    def _move_file(self, source_path: str, destination_path: str):
+        """
+        Move or rename a file from source path to destination path. Both paths must be within the allowed directory.
+        
+        Args:
+            source_path: The current path of the file to move (relative or absolute)
+            destination_path: The new path where the file should be moved to (relative or absolute)
+        """
         print(f"Moving file from {source_path} to {destination_path}")
         
         # Validate both source and destination paths
@@ -309,23 +495,35 @@ class Agent:
         
         try:
             # Create parent directory for destination if it doesn't exist
-            dest_parent = os.path.dirname(normalized_dest)
-            if dest_parent and not os.path.exists(dest_parent):
-                os.makedirs(dest_parent, exist_ok=True)
+            self.sandbox.makedirs(os.path.dirname(normalized_dest))
                 
-            os.rename(normalized_source, normalized_dest)
+            self.sandbox.rename(normalized_source, normalized_dest)
+            # A moved directory changes every path under it, so re-check them all
+            self._files_changed()
             return f"Successfully moved {source_path} to {destination_path}"
         except Exception as error:
             return f"Error moving file: {str(error)}"
     
-    def _contact_user(self, message):
-        """Contact the user to request information or clarification."""
+    @TOOLS.tool
+    def _contact_user(self, message: str):
+        """
+        Contact the user to request information or clarification. Use this when you need user input to proceed with the task.
+        
+        Args:
+            message: The message or question to present to the user
+        """
         print(f"\n[Agent contacting user]: {message}")
         user_response = input("Your response: ")
         return user_response
     
-    def _make_directory(self, path):
-        """Create a new directory at the specified path."""
+    @TOOLS.tool
+    def _make_directory(self, path: str):
+        """
+        Create a new directory at the specified path. Creates parent directories if they don't exist. Path must be within the allowed directory.
+        
+        Args:
+            path: The path where the directory should be created (relative or absolute)
+        """
         print(f"Creating directory: {path}")
         
         is_valid, normalized_path, error_msg = self._validate_path(path)
@@ -333,42 +531,53 @@ class Agent:
             return error_msg
         
         try:
-            os.makedirs(normalized_path, exist_ok=True)
+            self.sandbox.makedirs(normalized_path)
             return f"Successfully created directory {path}"
         except Exception as error:
             return f"Error creating directory: {str(error)}"
     
-    def _execute_command(self, command, timeout=30):
-        """Execute a terminal command in the working directory."""
+    @TOOLS.tool
+    def _execute_command(self, command: str, timeout: float = 30):
+        """
+        Execute a terminal command in a persistent bash session that starts in the working directory, so cd, exported variables and activated virtualenvs carry over to later commands. Returns stdout, stderr, exit code, and the shell's current directory (cwd) when it is not the working directory. Long output is cut to its first and last lines; the byte and line counts are always reported, and the full output is saved to the file named in stdout_file/stderr_file (read it with read_file). Use for commands that complete quickly (< 30 seconds).
+        
+        Args:
+            command: The command to execute (e.g., 'ls -la', 'python script.py', 'grep pattern file.txt')
+            timeout: Maximum execution time in seconds (default: 30)
+        """
         print(f"Executing command: {command}")
         
+        if self.persistent_shell:
+            return self._execute_in_shell(command, timeout)
+        return self._execute_in_subprocess(command, timeout)
+    
+    def _execute_in_subprocess(self, command, timeout, cwd=None, stdout=None, stderr=None):
+        """Run execute_command in a new shell, in `cwd` (default: the working directory)."""
+        if stdout is None:
+            stdout, stderr = self._new_captures()
+        cwd = cwd or self.working_directory
         try:
-            # Execute the command in the working directory with a timeout
-            result = subprocess.run(
-                command,
-                shell=True,
-                cwd=self.working_directory,
-                capture_output=True,
-                text=True,
-                timeout=timeout
-            )
+            # Execute the command with a timeout
+            exit_code = run_captured(command, cwd, timeout, stdout, stderr)
+            self._files_changed()
             
-            output = {
+            output = self._with_output({
                 "command": command,
-                "exit_code": result.returncode,
-                "stdout": result.stdout,
-                "stderr": result.stderr,
-                "working_directory": self.working_directory
-            }
+                "exit_code": exit_code,
+            }, stdout, stderr)
+            output["working_directory"] = self.working_directory
+            if cwd != self.working_directory:
+                output["cwd"] = cwd
             
-            if result.returncode == 0:
+            if exit_code == 0:
                 print(f"✓ Command succeeded (exit code: 0)")
             else:
-                print(f"✗ Command failed (exit code: {result.returncode})")
+                print(f"✗ Command failed (exit code: {exit_code})")
             
             return output
             
         except subprocess.TimeoutExpired:
+            self._files_changed()
             return {
                 "command": command,
                 "error": f"Command timed out after {timeout} seconds",
@@ -381,49 +590,178 @@ class Agent:
                 "working_directory": self.working_directory
             }
     
-    def _execute_background_command(self, command, log_file=None):
-        """Execute a terminal command in the background."""
+    def _new_captures(self):
+        """OutputCaptures for a command's stdout and stderr, spilling into command_output_dir."""
+        if not self.command_output_dir:
+            return OutputCapture(), OutputCapture()
+        prefix = os.path.join(self.working_directory, self.command_output_dir,
+                              f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}")
+        return OutputCapture(spill_path=f"{prefix}.stdout.log"), OutputCapture(spill_path=f"{prefix}.stderr.log")
+    
+    def _with_output(self, output, stdout, stderr):
+        """Add the captured streams (excerpts, sizes and spill files) to a command result."""
+        for stream, capture in (("stdout", stdout), ("stderr", stderr)):
+            spill_name = None
+            if capture.spilled and capture.spill_path:
+                spill_name = os.path.relpath(capture.spill_path, self.working_directory)
+            output[stream] = capture.text(spill_name)
+            output[f"{stream}_bytes"] = capture.total_bytes
+            output[f"{stream}_lines"] = capture.lines
+            if spill_name:
+                output[f"{stream}_file"] = spill_name
+                self._keep_command_output(capture.spill_path)
+        return output
+    
+    def _keep_command_output(self, path):
+        """Remember a spill file, deleting the oldest beyond MAX_COMMAND_OUTPUT_FILES."""
+        with self._command_output_lock:
+            self._command_output_files.append(path)
+            expired = self._command_output_files[:-MAX_COMMAND_OUTPUT_FILES]
+            del self._command_output_files[:-MAX_COMMAND_OUTPUT_FILES]
+        for old_path in expired:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+    
+    def _get_shell(self):
+        with self._shell_lock:
+            if self._shell is None:
+                self._shell = ShellSession(self.working_directory)
+            return self._shell
+    
+    def _shell_environment(self):
+        """
+        This process's environment with PATH and VIRTUAL_ENV as the persistent shell
+        has them, so a virtualenv activated with execute_command is used by tools
+        that start their own processes. Unchanged when there is no live shell or it
+        is busy.
+        """
+        env = dict(os.environ)
+        shell = self._shell
+        if shell is None or not shell.alive:
+            return env
+        result = shell.run('printf "%s\\n%s" "$VIRTUAL_ENV" "$PATH"', timeout=5, wait=False)
+        if result is None or result["exit_code"] != 0:
+            return env
+        virtual_env, _, path = result["stdout"].text().partition("\n")
+        env["PATH"] = path
+        if virtual_env:
+            env["VIRTUAL_ENV"] = virtual_env
+        else:
+            env.pop("VIRTUAL_ENV", None)
+        return env
+    
+    def _execute_in_shell(self, command, timeout):
+        """
+        Run execute_command in the persistent shell session.
+        
+        The session runs one command at a time. When another call from the same
+        model turn is using it, the command runs in a new shell in the session's
+        directory instead of waiting: parallel calls stay parallel, but that one
+        command doesn't see the session's exported variables or activated
+        virtualenv, and its own cd/exports don't carry over.
+        """
+        stdout, stderr = self._new_captures()
+        shell = self._get_shell()
+        try:
+            result = shell.run(command, timeout=timeout, stdout=stdout, stderr=stderr, wait=False)
+        except Exception as error:
+            return {
+                "command": command,
+                "error": f"Error executing command: {str(error)}",
+                "working_directory": self.working_directory
+            }
+        if result is None:
+            output = self._execute_in_subprocess(command, timeout, shell.cwd, stdout, stderr)
+            output["note"] = ("The shell session was busy with another command, so this one ran in a "
+                              "separate shell without the session's exported variables or virtualenv")
+            return output
+        self._files_changed()
+        
+        if result["timed_out"]:
+            print(f"✗ Command timed out after {timeout} seconds")
+            output = self._with_output({
+                "command": command,
+                "error": f"Command timed out after {timeout} seconds",
+            }, stdout, stderr)
+            output["working_directory"] = self.working_directory
+            output["note"] = "The shell was restarted; earlier cd/export state is lost except the directory"
+            return output
+        
+        output = self._with_output({
+            "command": command,
+            "exit_code": result["exit_code"],
+        }, stdout, stderr)
+        output["working_directory"] = self.working_directory
+        if result["cwd"] != self.working_directory:
+            output["cwd"] = result["cwd"]
+        if result["restarted"]:
+            output["note"] = "Ran in a new shell; earlier cd/export state is lost except the directory"
+        
+        if result["exit_code"] == 0:
+            print(f"✓ Command succeeded (exit code: 0)")
+        else:
+            print(f"✗ Command failed (exit code: {result['exit_code']})")
+        return output
+    
+    def close(self):
+        """Stop the persistent shell session and the background processes (and anything they started), release the sandbox, and delete the command output files."""
+        with self._shell_lock:
+            if self._shell is not None:
+                self._shell.close()
+                self._shell = None
+        self.processes.close()
+        self.sandbox.close()
+        with self._command_output_lock:
+            spilled, self._command_output_files = self._command_output_files, []
+        for path in spilled:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if spilled:
+            try:
+                os.rmdir(os.path.dirname(spilled[0]))  # only if no other agent's files are left
+            except OSError:
+                pass
+    
+    @TOOLS.tool
+    def _execute_background_command(self, command: str, log_file: str = None):
+        """
+        Execute a terminal command in the background (non-blocking). Use for long-running processes like web servers, watchers, etc. Returns immediately with the process ID.
+        
+        Args:
+            command: The command to execute in the background (e.g., 'python -m http.server 8000', 'npm run dev')
+            log_file: Optional path to redirect stdout/stderr (relative to working directory)
+        """
         print(f"Starting background command: {command}")
         
         try:
             # Validate log file path if provided
+            log_path = None
             if log_file:
-                is_valid, normalized_log_path, error_msg = self._validate_path(log_file)
+                is_valid, log_path, error_msg = self._validate_path(log_file)
                 if not is_valid:
                     return {"error": error_msg}
                 
                 # Create parent directory for log file if needed
-                log_dir = os.path.dirname(normalized_log_path)
-                if log_dir and not os.path.exists(log_dir):
-                    os.makedirs(log_dir, exist_ok=True)
-                
-                # Open log file for writing
-                log_file_handle = open(normalized_log_path, 'w')
-                stdout_dest = log_file_handle
-                stderr_dest = log_file_handle
-            else:
-                log_file_handle = None
-                stdout_dest = subprocess.DEVNULL
-                stderr_dest = subprocess.DEVNULL
+                self.sandbox.makedirs(os.path.dirname(log_path))
             
-            # Start the process in the background
-            process = subprocess.Popen(
-                command,
-                shell=True,
-                cwd=self.working_directory,
-                stdout=stdout_dest,
-                stderr=stderr_dest,
-                start_new_session=True  # Detach from parent process
-            )
+            # Start the process in the background; the manager keeps its handle and log
+            process = self.processes.start(command, log_path=log_path, log_name=log_file,
+                                           opener=self.sandbox.opener)
             
             output = {
                 "command": command,
                 "pid": process.pid,
                 "working_directory": self.working_directory,
                 "log_file": log_file if log_file else None,
-                "message": f"Process started in background with PID {process.pid}"
+                "message": f"Process started in background with PID {process.pid}. "
+                           f"Use read_process_log, wait_for_port and stop_process with this PID."
             }
             
+            self._files_changed()
             print(f"✓ Background process started (PID: {process.pid})")
             if log_file:
                 print(f"  Output redirected to: {log_file}")
@@ -436,102 +774,599 @@ class Agent:
                 "error": f"Error starting background command: {str(error)}",
                 "working_directory": self.working_directory
             }
+    
+    @TOOLS.tool
+    def _list_processes(self):
+        """
+        List the background processes started with execute_background_command, with their status (running, exited or stopped), exit code, runtime and log size.
+        """
+        print("Listing background processes")
+        return {"processes": self.processes.list()}
+    
+    @TOOLS.tool
+    def _read_process_log(self, pid: int, since_offset: int = 0):
+        """
+        Read the output a background process has written since a byte offset. Returns the new output and the offset to pass next time, so repeated calls only return new lines.
         
+        Args:
+            pid: The PID returned by execute_background_command
+            since_offset: Byte offset to read from (default: 0, the start of the log)
+        """
+        print(f"Reading process log: {pid} (from byte {since_offset})")
         
-    def prompt(self, prompt):
-        self.memory.append({"role": "user", "content": prompt})
-        response = client.responses.create(
-            model="gpt-5.2",
-            tools=self.tools,
-            input=self.memory
-        )
+        try:
+            return self.processes.read_log(pid, since_offset)
+        except KeyError:
+            return f"Error: No background process with PID {pid}"
+        except Exception as error:
+            return f"Error reading process log: {str(error)}"
+    
+    @TOOLS.tool
+    def _wait_for_port(self, port: int, host: str = "127.0.0.1", timeout: float = 30, pid: int = None):
+        """
+        Wait until a server accepts connections on a port, e.g. after starting it with execute_background_command. Use this instead of sleep commands.
         
-        output = self.handle_tool_call(response.output)
-        return response.output_text
+        Args:
+            port: The TCP port to wait for
+            host: The host to connect to (default: 127.0.0.1)
+            timeout: Maximum seconds to wait (default: 30)
+            pid: Optional PID of the server process; waiting stops early if it exits
+        """
+        print(f"Waiting for port: {host}:{port}")
         
-    def handle_tool_call(self, output):
+        result = self.processes.wait_for_port(port, host, timeout, pid)
+        process = self.processes.get(pid) if pid is not None else None
+        if not result["ready"] and process is not None:
+            # Show the end of the log, which usually says why the server isn't up
+            log_bytes = process.describe()["log_bytes"]
+            result["log_tail"] = self.processes.read_log(pid, log_bytes - 2000)["output"]
+        return result
+    
+    @TOOLS.tool
+    def _stop_process(self, pid: int):
+        """
+        Stop a background process and its child processes (SIGTERM, then SIGKILL if it doesn't exit).
         
-        self.memory += output
+        Args:
+            pid: The PID returned by execute_background_command
+        """
+        print(f"Stopping process: {pid}")
+        
+        try:
+            result = self.processes.stop(pid)
+        except KeyError:
+            return f"Error: No background process with PID {pid}"
+        self._files_changed()
+        return result
+    
+    @TOOLS.tool
+    def _search_code(self, query: str, regex: bool = False, case_sensitive: bool = True, path: str = None,
+                     file_pattern: str = None, limit: int = 50):
+        """
+        Search the files in the working directory for a string or regular expression. Uses an index, so it is much faster than grep or reading files one by one. Returns matching lines with their file paths and line numbers.
+        
+        Args:
+            query: The text to search for (a regular expression if regex is true)
+            regex: Treat the query as a Python regular expression (default: false, a literal string)
+            case_sensitive: Match case exactly (default: true)
+            path: Only search under this directory (relative or absolute)
+            file_pattern: Only search files matching this glob, e.g. '*.py' or 'app/*/models.py'
+            limit: Maximum number of matching lines to return (default: 50)
+        """
+        print(f"Searching code: {query}")
+        
+        subdirectory = None
+        if path:
+            is_valid, subdirectory, error_msg = self._validate_path(path)
+            if not is_valid:
+                return error_msg
+        
+        try:
+            return self._get_code_index().search(query, regex, case_sensitive, subdirectory, file_pattern, limit)
+        except re.error as error:
+            return f"Error: Invalid regular expression: {str(error)}"
+        except Exception as error:
+            return f"Error searching code: {str(error)}"
+    
+    @TOOLS.tool
+    def _find_symbol(self, name: str, kind: str = None, limit: int = 20):
+        """
+        Find where a Python class, function, method or module-level variable is defined in the working directory. Returns each definition's file, line range and signature (plus the first line of its docstring) without reading the whole file; use read_file with offset/limit to see the body.
+        
+        Args:
+            name: The symbol name, optionally qualified (e.g. 'connect' or 'Database.connect')
+            kind: Only return this kind of symbol: 'class', 'function', 'method' or 'variable'
+            limit: Maximum number of definitions to return (default: 20)
+        """
+        print(f"Finding symbol: {name}")
+        
+        try:
+            definitions = self._get_symbol_index().find_symbol(name, kind, limit)
+            return {"definitions": definitions, "count": len(definitions)}
+        except Exception as error:
+            return f"Error finding symbol: {str(error)}"
+    
+    @TOOLS.tool
+    def _find_references(self, name: str, limit: int = 50):
+        """
+        Find the lines in the working directory's Python files that use a name (as a variable, attribute, call or import). Returns file, line number and the line's text.
+        
+        Args:
+            name: The name to look for (e.g. 'transfer_hours'; for 'Database.connect' the last part is used)
+            limit: Maximum number of references to return (default: 50)
+        """
+        print(f"Finding references: {name}")
         
-        for item in output:
-            print(item)
-            if item.type == "function_call":
+        try:
+            return self._get_symbol_index().find_references(name, limit)
+        except Exception as error:
+            return f"Error finding references: {str(error)}"
+    
+    @TOOLS.tool
+    def _run_tests(self, tests: list[str] = None, affected: bool = False, keyword: str = None,
+                   failed_first: bool = True, timeout: float = 600):
+        """
+        Run the project's tests with pytest and return structured results: pass/fail/error/skip counts, each failure with its short traceback, and the slowest tests. Use this instead of running pytest with execute_command.
+        
+        Args:
+            tests: Test files, directories or node IDs to run, e.g. ['tests/test_api.py::test_login'] (default: the project's configured test paths)
+            affected: Only run the test files that import (directly or indirectly) a Python file changed since the last run_tests call
+            keyword: Only run tests matching this pytest -k expression
+            failed_first: Run the tests that failed in the previous run first (default: true)
+            timeout: Maximum run time in seconds (default: 600)
+        """
+        print(f"Running tests: {', '.join(tests) if tests else 'all'}{' (affected)' if affected else ''}")
+        
+        targets = []
+        for target in tests or []:
+            path, separator, node = target.partition("::")
+            is_valid, normalized_path, error_msg = self._validate_path(path)
+            if not is_valid:
+                return error_msg
+            targets.append(os.path.relpath(normalized_path, self.working_directory) + separator + node)
+        
+        selection = None
+        try:
+            # Every run is the baseline for the next one's affected selection
+            graph = self._get_import_graph()
+            graph.mark_stale()
+            changed = graph.take_changed()
+            if affected:
+                selected = graph.affected_tests(changed)
+                if targets:
+                    # Only the affected files among the requested ones
+                    requested = [os.path.join(self.working_directory, target.split("::")[0]) for target in targets]
+                    selected = {path for path in selected
+                                if any(path == prefix or path.startswith(os.path.join(prefix, "")) for prefix in requested)}
+                selected = sorted(os.path.relpath(path, self.working_directory) for path in selected)
+                selection = {"changed_files": len(changed), "test_files": selected}
+                if not selected:
+                    return {"message": "No tests are affected by the files changed since the last run", **selection}
+                targets = selected
+            
+            result = run_pytest(self.working_directory, targets, keyword, failed_first, timeout,
+                                env=self._shell_environment())
+            # The tests may have created, moved or deleted files and directories
+            self._files_changed()
+        except Exception as error:
+            return f"Error running tests: {str(error)}"
+        
+        if selection is not None:
+            result["selection"] = selection
+        if result["failed"] or result["errors"]:
+            print(f"✗ Tests failed: {result['failed']} failed, {result['errors']} errors, {result['passed']} passed")
+        else:
+            print(f"✓ Tests passed: {result['passed']} passed, {result['skipped']} skipped")
+        return result
+    
+    def _get_code_index(self):
+        with self._index_lock:
+            if self._code_index is None:
+                self._code_index = TrigramIndex(self.working_directory)
+            return self._code_index
+    
+    def _get_symbol_index(self):
+        with self._index_lock:
+            if self._symbol_index is None:
+                self._symbol_index = SymbolIndex(self.working_directory)
+            return self._symbol_index
+    
+    def _get_import_graph(self):
+        with self._index_lock:
+            if self._import_graph is None:
+                self._import_graph = ImportGraph(self.working_directory)
+            return self._import_graph
+    
+    def _files_changed(self, path=None):
+        """Tell the workspace indexes about a file the agent changed, or (with no path) that any file may have."""
+        if path is None:
+            # Directories may have been moved or replaced, so validate them afresh
+            self.sandbox.invalidate()
+        for index in (self._code_index, self._symbol_index, self._import_graph):
+            if index is None:
+                continue
+            if path is None:
+                index.mark_stale()
+            else:
+                index.invalidate(path)
+    
+    @TOOLS.tool
+    def _finish(self, summary: str):
+        """
+        Finish the task. Call this once the user's goal is achieved (or cannot be achieved) with a summary of the results.
+        
+        Args:
+            summary: A summary of what was done and the final state of the work
+        """
+        print(f"Finishing: {summary}")
+        self.finish_summary = summary
+        return "Task finished."
+    
+    def _call_tool(self, name, args):
+        """Validate the arguments and execute a single tool by name."""
+        return TOOLS.dispatch(name, args, self)
+    
+    def _tool_output(self, item):
+        """Run one function_call item and build its function_call_output (or None)."""
+        with self.tracer.span(f"tool:{item.name}", call_id=item.call_id,
+                              arguments_bytes=len(item.arguments or "")) as span:
+            try:
                 args = json.loads(item.arguments)
-                result = None
-                
-                if item.name == "read_file":
-                    result = self._read_file(args.get("filepath"))
-                    
-                elif item.name == "write_file":
-                    result = self._write_file(args.get("filepath"), args.get("content"))
-                    
-                elif item.name == "list_directory":
-                    result = self._list_directory(args.get("path"))
-                
-                elif item.name == "move_file":
-                    result = self._move_file(args.get("source_path"), args.get("destination_path"))
-                
-                elif item.name == "contact_user":
-                    result = self._contact_user(args.get("message"))
-                
-                elif item.name == "make_directory":
-                    result = self._make_directory(args.get("path"))
-                
-                elif item.name == "execute_command":
-                    result = self._execute_command(
-                        args.get("command"),
-                        args.get("timeout", 30)
-                    )
-                
-                elif item.name == "execute_background_command":
-                    result = self._execute_background_command(
-                        args.get("command"),
-                        args.get("log_file")
-                    )
-                
-                # Provide function call results to the model
-                if result is not None:
-                    self.memory.append({
-                        "type": "function_call_output",
-                        "call_id": item.call_id,
-                        "output": json.dumps({"result": result})
-                    })
-                    
-            elif item.type == "text":
-                self.memory.append({"role": "assistant", "content": item.content})
-                
+                result = self._call_tool(item.name, args)
+            except Exception as error:
+                result = f"Error executing {item.name}: {str(error)}"
+            
+            if result is None:
+                return None
+            output = json.dumps({"result": result})
+            span.set(output_bytes=len(output))
+            if isinstance(result, dict) and "exit_code" in result:
+                span.set(exit_code=result["exit_code"])
+            if isinstance(result, str) and result.startswith("Error"):
+                span.set(tool_error=result[:200])
+            return {
+                "type": "function_call_output",
+                "call_id": item.call_id,
+                "output": output
+            }
+    
+    def _path_accesses(self, item):
+        """
+        Work out which paths a tool call reads or writes.
+        
+        Returns:
+            list: (key, is_write) pairs. Besides the path itself, a write adds a shared
+            access to its parent's listing and list_directory takes that listing
+            exclusively, so a listing waits for earlier writes into the directory
+            without serializing those writes against each other.
+        """
+        if item.name == "contact_user":
+            # Only one question to the user at a time, in order
+            return [(("user",), True)]
+        
+        if item.name in MUTATING_TOOLS:
+            arg_names, is_write = MUTATING_TOOLS[item.name], True
+        elif item.name in READING_TOOLS:
+            arg_names, is_write = READING_TOOLS[item.name], False
+        else:
+            return []
+        
+        try:
+            args = json.loads(item.arguments)
+        except (TypeError, ValueError):
+            return []
+        
+        accesses = []
+        for arg_name in arg_names:
+            path = args.get(arg_name)
+            if not isinstance(path, str):
+                continue
+            is_valid, normalized_path, _ = self._validate_path(path)
+            path = normalized_path if is_valid else path
+            accesses.append((("path", path), is_write))
+            if is_write:
+                accesses.append((("listing", os.path.dirname(path)), False))
+            elif item.name == "list_directory":
+                accesses.append((("listing", path), True))
+        return accesses
+    
+    def _get_tool_executor(self):
+        with self._tool_executor_lock:
+            if self._tool_executor is None:
+                self._tool_executor = ThreadPoolExecutor(
+                    max_workers=self.max_tool_workers,
+                    thread_name_prefix="agent-tool"
+                )
+            return self._tool_executor
+    
+    def _tool_batch(self):
+        """Start an empty batch for the function calls of one model turn."""
+        executor = self._get_tool_executor() if self.parallel_tools else None
+        return ToolCallBatch(self, executor)
+    
+    def _run_tool_calls(self, function_calls):
+        """Execute the function calls from one model turn and return their outputs in call order."""
+        batch = self._tool_batch()
+        for item in function_calls:
+            batch.submit(item)
+        return batch.outputs()
+        
+    def _compact_memory(self):
+        """Bring self.memory within the token budget before it is sent to the model."""
+        with self.tracer.span("compaction") as span:
+            self.memory, stats = self.compactor.compact(self.memory)
+            span.set(**stats)
+        if stats["stubbed"] or stats["dropped"]:
+            print(f"[Context compacted: {stats['stubbed']} items stubbed, {stats['dropped']} dropped, "
+                  f"~{stats['tokens_before']} -> ~{stats['tokens_after']} tokens]")
+        return stats
+    
+    def _create_response(self, instruction=None, tool_batch=None):
+        """
+        Send the memory to the model with the fixed prefix layout.
+        
+        Args:
+            instruction: Optional per-phase instruction sent after the conversation
+                without being stored in memory
+            tool_batch: When streaming, function calls are submitted to this batch as
+                soon as their arguments are complete
+        """
+        self._compact_memory()
+        with self.tracer.span("prepare_request"):
+            request = self.prompt_layout.build(self.tools, self.memory, instruction)
+            stats = self.prompt_layout.measure(request)
+        model_client = self.client if self.client is not None else client
+        with self.tracer.span("model_call", model=MODEL, stream=self.stream, input_items=len(request["input"]),
+                              payload_chars=stats["input_chars"],
+                              estimated_input_tokens=stats["input_tokens"]) as span:
+            if self.stream:
+                response = self._stream_response(model_client, request, tool_batch)
+            else:
+                response = model_client.responses.create(**request)
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                span.set(input_tokens=getattr(usage, "input_tokens", None),
+                         output_tokens=getattr(usage, "output_tokens", None))
+        self.prompt_layout.record_usage(stats, response)
+        
+        cached = stats.get("usage_cached_tokens")
+        print(f"[Prompt: ~{stats['input_tokens']} input tokens, ~{stats['cacheable_tokens']} prefix-cacheable"
+              + (f", {cached} cached by provider]" if cached is not None else "]"))
+        return response
+    
+    def _stream_response(self, model_client, request, tool_batch=None):
+        """
+        Consume a streamed response: print text deltas as they arrive and start each
+        function call as soon as its item is complete, while the model is still
+        producing later calls or text.
+        
+        Returns:
+            The final Response from the response.completed event
+        """
+        response = None
+        printed_text = False
+        for event in model_client.responses.create(stream=True, **request):
+            if event.type == "response.output_text.delta":
+                print(event.delta, end="", flush=True)
+                printed_text = True
+            elif event.type == "response.output_item.done":
+                if tool_batch is not None and event.item.type == "function_call":
+                    tool_batch.submit(event.item)
+            elif event.type in ("response.completed", "response.incomplete", "response.failed"):
+                response = event.response
+            elif event.type == "error":
+                raise RuntimeError(f"Streaming error from model: {event.message}")
+        
+        if printed_text:
+            print()
+        if response is None:
+            raise RuntimeError("Response stream ended without a final response")
+        return response
+    
+    def _phase_name(self, prompt):
+        for prefix, name in PHASES:
+            if prompt.startswith(prefix):
+                return name
+        return "prompt"
+    
+    def prompt(self, prompt):
+        with self.tracer.span(f"phase:{self._phase_name(prompt)}", prompt_chars=len(prompt)):
+            self.memory.append({"role": "user", "content": prompt})
+            tool_batch = self._tool_batch() if self.stream else None
+            response = self._create_response(tool_batch=tool_batch)
+            
+            output = self.handle_tool_call(response.output, tool_batch)
+            return response.output_text
+        
+    def handle_tool_call(self, output, tool_batch=None):
+        with self.tracer.span("handle_tool_call") as span:
+            self.memory += output
+            
+            # Calls already started while streaming are not run again
+            tool_batch = tool_batch or self._tool_batch()
+            function_calls = 0
+            for item in output:
+                print(item)
+                if item.type == "function_call":
+                    tool_batch.submit(item)
+                    function_calls += 1
+                        
+                elif item.type == "text":
+                    self.memory.append({"role": "assistant", "content": item.content})
+            span.set(function_calls=function_calls)
+            
+            # Provide function call results to the model, in the original call order
+            self.memory += tool_batch.outputs()
 
-        response = client.responses.create(
-            model="gpt-5.2",
-            instructions="Respond with the results from the tool calls.",
-            tools=self.tools,
-            input=self.memory,
-        )
+            response = self._create_response(TOOL_RESULTS_INSTRUCTION)
+            
+            self.memory.append({"role": "assistant", "content": response.output_text})
+            if not self.stream:
+                print(response.output_text)
+            return response.output_text
+    
+    def _checkpoint(self, **state):
+        if self.checkpoints is not None:
+            with self.tracer.span("checkpoint"):
+                self.checkpoints.record(self.memory, **state)
+    
+    def run(self, user_input, mode="plan"):
+        """
+        Work on the user's goal until it is achieved.
+        
+        Args:
+            user_input: The goal
+            mode: "plan" for the plan/act/check/summarize cycle, "loop" for the
+                single tool-calling loop in run_loop
+        """
+        if mode == "loop":
+            return self.run_loop(user_input)
         
-        self.memory.append({"role": "assistant", "content": response.output_text})
-        print(response.output_text)
-        return response.output_text
+        self._start_run(user_input, "plan")
+        return self._run_plan()
     
-    def run(self, user_input):
-        keep_going = True
+    def _start_run(self, user_input, mode, **settings):
+        """Take the user's goal and begin the checkpoint log of a new run."""
         self.goal = user_input
         self.memory.append({"role": "user", "content": user_input})
-        while keep_going:
-            ## interpret the user's request as the goal of the agent // orient
-            ## prompt the agent to come up with a plan to achieve the goal (to think) // decide
-            plan = self.prompt(self.system_prompt + "\n Determine a plan to achieve the user's goal. " + self.goal)
+        if self.checkpoints is not None:
+            self.checkpoints.start(self.memory, goal=user_input, mode=mode,
+                                   working_directory=self.working_directory, **settings)
+    
+    def _run_plan(self, iteration=1, results=None):
+        """Run the plan/act/check cycle (see _plan_cycle) and return its summary."""
+        cycle = self._plan_cycle(iteration, results)
+        try:
+            prompt = next(cycle)
+            while True:
+                try:
+                    reply = self.prompt(prompt)
+                except Exception as error:
+                    prompt = cycle.throw(error)
+                else:
+                    prompt = cycle.send(reply)
+        except StopIteration as stop:
+            return stop.value
+    
+    def _plan_cycle(self, iteration=1, results=None):
+        """
+        The plan/act/check cycle, starting at `iteration`. `results` holds the
+        results of that iteration's phases that already completed (when resuming);
+        they are not run again.
+        
+        A generator, so Agent and AsyncAgent share it: it yields each prompt to
+        send, is sent the reply, and returns the summary.
+        """
+        results = dict(results or {})
+        with self.tracer.span("run", mode="plan", goal_chars=len(self.goal)):
+            while True:
+                with self.tracer.span("iteration", number=iteration):
+                    ## interpret the user's request as the goal of the agent // orient
+                    ## prompt the agent to come up with a plan to achieve the goal (to think) // decide
+                    plan = yield from self._plan_phase(iteration, results, "plan", lambda: PLAN_PROMPT + self.goal)
+                    
+                    ## generate a sequence of tool calls to achieve the goal // act
+                    tool_calls = yield from self._plan_phase(iteration, results, "act", lambda: ACT_PROMPT + plan)
+                    ## is the goal achieved? if not, repeat the process
+                    is_goal_achieved = yield from self._plan_phase(iteration, results, "check",
+                                                                   lambda: CHECK_PROMPT + self.goal)
+                    if "yes" in is_goal_achieved.lower():
+                        return (yield from self._plan_phase(iteration, results, "summary", lambda: SUMMARY_PROMPT,
+                                                            done=True))
+                    if "no" in is_goal_achieved.lower() and "reflect" not in results:
+                        reflection = yield REFLECT_PROMPT
+                        self.memory.append({"role": "assistant", "content": reflection})
+                        self._checkpoint(iteration=iteration, phase="reflect", result=reflection)
+                iteration += 1
+                results = {}
+    
+    def _plan_phase(self, iteration, results, phase, prompt, done=False):
+        """Run one phase (unless it already completed) and checkpoint its result."""
+        if phase not in results:
+            results[phase] = yield prompt()
+            self._checkpoint(iteration=iteration, phase=phase, result=results[phase], **({"done": True} if done else {}))
+        return results[phase]
+    
+    def run_loop(self, user_input, max_turns=100):
+        """
+        Fast mode: one tool-calling loop instead of the four-phase cycle.
+        
+        Each turn is a single model call. The loop keeps going while the model emits
+        function calls and ends when it calls finish (or answers without calling any
+        tool), so an iteration costs one round trip instead of eight or more.
+        
+        Returns:
+            str: The summary passed to finish, or the model's final text
+        """
+        self._start_run(user_input, "loop", max_turns=max_turns)
+        return self._run_turns(0, max_turns)
+    
+    def _run_turns(self, first_turn, max_turns):
+        self.finish_summary = None
+        with self.tracer.span("run", mode="loop", goal_chars=len(self.goal)):
+            for turn in range(first_turn, max_turns):
+                with self.tracer.span("iteration", number=turn + 1):
+                    tool_batch = self._tool_batch()
+                    response = self._create_response(LOOP_INSTRUCTION, tool_batch)
+                    self.memory += response.output
+                    
+                    has_function_calls = False
+                    for item in response.output:
+                        print(item)
+                        if item.type == "function_call":
+                            tool_batch.submit(item)
+                            has_function_calls = True
+                    
+                    if not has_function_calls:
+                        if not self.stream:
+                            print(response.output_text)
+                        self._checkpoint(iteration=turn + 1, phase="turn", result=response.output_text, done=True)
+                        return response.output_text
+                    
+                    self.memory += tool_batch.outputs()
+                    if self.finish_summary is not None:
+                        self._checkpoint(iteration=turn + 1, phase="turn", result=self.finish_summary, done=True)
+                        return self.finish_summary
+                    self._checkpoint(iteration=turn + 1, phase="turn")
             
-            ## generate a sequence of tool calls to achieve the goal // act
-            tool_calls = self.prompt(self.system_prompt + "\n Generate a sequence of tool calls to achieve the steps in the plan:\n" + plan)
-            ## is the goal achieved? if not, repeat the process
-            is_goal_achieved = self.prompt(self.system_prompt + "\n Is the goal achieved? Respond with 'Yes' or 'No'. " + self.goal)
-            if "yes" in is_goal_achieved.lower():
-                keep_going = False
-                summary = self.prompt(self.system_prompt + "\n Summarize the results of the tool calls and the goal achievement.")
-                return summary
-            if "no" in is_goal_achieved.lower():
-                reflection = self.prompt(self.system_prompt + "\n Reflect on the actions taken and the results achieved. What is the next step to achieve the goal?")
-                self.memory.append({"role": "assistant", "content": reflection})
+            return f"Stopped after {max_turns} turns without calling finish."
+    
+    @classmethod
+    def resume(cls, checkpoint_path, **kwargs):
+        """
+        Rebuild an agent from a checkpoint log and continue its latest run from the
+        last completed phase. A run that already finished returns its result without
+        calling the model.
+        
+        Args:
+            checkpoint_path: The log written by an agent created with checkpoint_path
+            **kwargs: Agent settings (client, stream, ...); the working directory
+                defaults to the run's
+        
+        Returns:
+            str: The run's result, as run() would return it
+        """
+        state = load_checkpoint(checkpoint_path)
+        start, last = state["start"], state["last"]
+        kwargs.setdefault("working_directory", start["working_directory"])
+        agent = cls(checkpoint_path=checkpoint_path, **kwargs)
+        agent.goal = start["goal"]
+        agent.memory = state["memory"]
+        agent.checkpoints.adopt(agent.memory)
+        
+        if last is not None and last.get("done"):
+            return last.get("result")
+        print(f"[Resuming {start['mode']} run after "
+              + (f"iteration {last['iteration']} {last['phase']}]" if last else "its start]"))
+        if start["mode"] == "loop":
+            return agent._run_turns(last["iteration"] if last else 0, start["max_turns"])
+        if last is None:
+            return agent._run_plan()
+        results = state["results"]
+        if last["phase"] == "reflect" or ("check" in results and "no" not in results["check"].lower()
+                                          and "yes" not in results["check"].lower()):
+            return agent._run_plan(last["iteration"] + 1)  # the iteration was complete
+        return agent._run_plan(last["iteration"], results)
                 
        
         
@@ -0,0 +1,312 @@
+"""
+AsyncAgent: the long-horizon Agent on AsyncOpenAI and asyncio.
+
+Model calls go through AsyncOpenAI, terminal commands run through
+asyncio.create_subprocess_shell and the file tools run in worker threads, so one
+process can drive many agents (for example worker and reviewer pairs) in a single
+event loop. Agents that share an asyncio.Semaphore as their `limiter` never have
+more model calls in flight than the semaphore allows.
+
+Example:
+    limiter = asyncio.Semaphore(8)
+    results = asyncio.run(run_agents([
+        (AsyncAgent(working_directory="/work/a", limiter=limiter), "Implement the spec"),
+        (AsyncAgent(working_directory="/work/b", limiter=limiter), "Review the changes"),
+    ]))
+"""
+
+import asyncio
+import contextlib
+import inspect
+import json
+import os
+import signal
+
+from openai import AsyncOpenAI
+
+from agentic_agent import (
+    LOOP_INSTRUCTION,
+    MODEL,
+    TOOL_RESULTS_INSTRUCTION,
+    TOOLS,
+    Agent,
+)
+
+
+_default_client = None
+
+
+def default_async_client():
+    """The shared AsyncOpenAI client, created on first use."""
+    global _default_client
+    if _default_client is None:
+        _default_client = AsyncOpenAI()
+    return _default_client
+
+
+async def _pump(stream, capture):
+    """Copy a subprocess stream into an OutputCapture as it arrives."""
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            return
+        capture.write(chunk)
+
+
+class AsyncToolCallBatch:
+    """
+    The function calls of one model turn as asyncio tasks.
+
+    Uses the same ordering rules as ToolCallBatch: a call waits for earlier calls
+    that write a path it touches, and outputs come back in call order.
+    """
+
+    def __init__(self, agent):
+        self.agent = agent
+        self._tasks = []
+        self._last_writer = {}
+        self._readers = {}
+
+    def submit(self, item, accesses):
+        """Start a function_call item; `accesses` are its agent._path_accesses(item)."""
+        dependencies = []
+        for key, is_write in accesses:
+            if key in self._last_writer:
+                dependencies.append(self._last_writer[key])
+            if is_write:
+                dependencies.extend(self._readers.get(key, []))
+
+        task = asyncio.ensure_future(self._run_after(dependencies, item))
+        self._tasks.append(task)
+
+        for key, is_write in accesses:
+            if is_write:
+                self._last_writer[key] = task
+                self._readers[key] = []
+            else:
+                self._readers.setdefault(key, []).append(task)
+
+    async def _run_after(self, dependencies, item):
+        if dependencies:
+            await asyncio.wait(dependencies)
+        return await self.agent._tool_output(item)
+
+    async def outputs(self):
+        outputs = await asyncio.gather(*self._tasks)
+        return [output for output in outputs if output is not None]
+
+
+class AsyncAgent(Agent):
+    """
+    Async variant of Agent. prompt, handle_tool_call, run, run_loop and resume are
+    coroutines; everything else (tools, memory, compaction, prompt layout, the
+    plan/act/check cycle and checkpoints) is shared with Agent.
+
+    Args:
+        limiter: Optional asyncio.Semaphore shared between agents to bound the number
+            of concurrent model calls
+        client: Optional AsyncOpenAI-compatible client (defaults to a shared AsyncOpenAI)
+    """
+
+    def __init__(self, working_directory=None, limiter=None, client=None, **kwargs):
+        if kwargs.get("stream"):
+            raise ValueError("AsyncAgent does not support stream=True")
+        # Commands run in asyncio subprocesses; there is no persistent shell session
+        if kwargs.setdefault("persistent_shell", False):
+            raise ValueError("AsyncAgent does not support persistent_shell=True")
+        super().__init__(working_directory, client=client, **kwargs)
+        self.limiter = limiter
+
+    async def _create_response(self, instruction=None):
+        self._compact_memory()
+        with self.tracer.span("prepare_request"):
+            request = self.prompt_layout.build(self.tools, self.memory, instruction)
+            stats = self.prompt_layout.measure(request)
+        model_client = self.client if self.client is not None else default_async_client()
+
+        async with self.limiter if self.limiter is not None else contextlib.nullcontext():
+            with self.tracer.span("model_call", model=MODEL, input_items=len(request["input"]),
+                                  payload_chars=stats["input_chars"],
+                                  estimated_input_tokens=stats["input_tokens"]) as span:
+                response = await model_client.responses.create(**request)
+                usage = getattr(response, "usage", None)
+                if usage is not None:
+                    span.set(input_tokens=getattr(usage, "input_tokens", None),
+                             output_tokens=getattr(usage, "output_tokens", None))
+        self.prompt_layout.record_usage(stats, response)
+        return response
+
+    async def _tool_output(self, item):
+        with self.tracer.span(f"tool:{item.name}", call_id=item.call_id,
+                              arguments_bytes=len(item.arguments or "")) as span:
+            try:
+                args = json.loads(item.arguments)
+                result = await TOOLS.adispatch(item.name, args, self)
+            except Exception as error:
+                result = f"Error executing {item.name}: {str(error)}"
+
+            if result is None:
+                return None
+            output = json.dumps({"result": result})
+            span.set(output_bytes=len(output))
+            if isinstance(result, dict) and "exit_code" in result:
+                span.set(exit_code=result["exit_code"])
+            if isinstance(result, str) and result.startswith("Error"):
+                span.set(tool_error=result[:200])
+            return {
+                "type": "function_call_output",
+                "call_id": item.call_id,
+                "output": output
+            }
+
+    async def _run_tool_calls(self, function_calls):
+        # Working out the paths touches the file system, so it runs off the event loop
+        accesses = await asyncio.to_thread(lambda: [self._path_accesses(item) for item in function_calls])
+        batch = AsyncToolCallBatch(self)
+        for item, item_accesses in zip(function_calls, accesses):
+            batch.submit(item, item_accesses)
+        return await batch.outputs()
+
+    async def _execute_command(self, command, timeout=30):
+        """Execute a terminal command in the working directory without blocking the event loop."""
+        print(f"Executing command: {command}")
+
+        try:
+            process = await asyncio.create_subprocess_shell(
+                command,
+                cwd=self.working_directory,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,
+            )
+            stdout, stderr = self._new_captures()
+            try:
+                await asyncio.wait_for(asyncio.gather(
+                    _pump(process.stdout, stdout), _pump(process.stderr, stderr), process.wait()), timeout)
+            except asyncio.TimeoutError:
+                self._files_changed()
+                # Kill the whole process group so children of the shell don't hold the pipes open
+                with contextlib.suppress(ProcessLookupError):
+                    os.killpg(process.pid, signal.SIGKILL)
+                await process.wait()
+                return {
+                    "command": command,
+                    "error": f"Command timed out after {timeout} seconds",
+                    "working_directory": self.working_directory
+                }
+            finally:
+                stdout.close()
+                stderr.close()
+
+            self._files_changed()
+            if process.returncode == 0:
+                print(f"✓ Command succeeded (exit code: 0)")
+            else:
+                print(f"✗ Command failed (exit code: {process.returncode})")
+
+            output = self._with_output({
+                "command": command,
+                "exit_code": process.returncode,
+            }, stdout, stderr)
+            output["working_directory"] = self.working_directory
+            return output
+
+        except Exception as error:
+            return {
+                "command": command,
+                "error": f"Error executing command: {str(error)}",
+                "working_directory": self.working_directory
+            }
+
+    async def prompt(self, prompt):
+        with self.tracer.span(f"phase:{self._phase_name(prompt)}", prompt_chars=len(prompt)):
+            self.memory.append({"role": "user", "content": prompt})
+            response = await self._create_response()
+
+            await self.handle_tool_call(response.output)
+            return response.output_text
+
+    async def handle_tool_call(self, output):
+        with self.tracer.span("handle_tool_call") as span:
+            self.memory += output
+
+            function_calls = []
+            for item in output:
+                print(item)
+                if item.type == "function_call":
+                    function_calls.append(item)
+            span.set(function_calls=len(function_calls))
+
+            self.memory += await self._run_tool_calls(function_calls)
+
+            response = await self._create_response(TOOL_RESULTS_INSTRUCTION)
+
+            self.memory.append({"role": "assistant", "content": response.output_text})
+            print(response.output_text)
+            return response.output_text
+
+    async def run(self, user_input, mode="plan"):
+        if mode == "loop":
+            return await self.run_loop(user_input)
+
+        self._start_run(user_input, "plan")
+        return await self._run_plan()
+
+    async def _run_plan(self, iteration=1, results=None):
+        cycle = self._plan_cycle(iteration, results)
+        try:
+            prompt = next(cycle)
+            while True:
+                try:
+                    reply = await self.prompt(prompt)
+                except Exception as error:
+                    prompt = cycle.throw(error)
+                else:
+                    prompt = cycle.send(reply)
+        except StopIteration as stop:
+            return stop.value
+
+    async def run_loop(self, user_input, max_turns=100):
+        self._start_run(user_input, "loop", max_turns=max_turns)
+        return await self._run_turns(0, max_turns)
+
+    async def _run_turns(self, first_turn, max_turns):
+        self.finish_summary = None
+        with self.tracer.span("run", mode="loop", goal_chars=len(self.goal)):
+            for turn in range(first_turn, max_turns):
+                with self.tracer.span("iteration", number=turn + 1):
+                    response = await self._create_response(LOOP_INSTRUCTION)
+                    self.memory += response.output
+
+                    function_calls = [item for item in response.output if item.type == "function_call"]
+                    if not function_calls:
+                        self._checkpoint(iteration=turn + 1, phase="turn", result=response.output_text, done=True)
+                        return response.output_text
+
+                    self.memory += await self._run_tool_calls(function_calls)
+                    if self.finish_summary is not None:
+                        self._checkpoint(iteration=turn + 1, phase="turn", result=self.finish_summary, done=True)
+                        return self.finish_summary
+                    self._checkpoint(iteration=turn + 1, phase="turn")
+
+            return f"Stopped after {max_turns} turns without calling finish."
+
+    @classmethod
+    async def resume(cls, checkpoint_path, **kwargs):
+        """Agent.resume for an AsyncAgent: continue the latest run in a checkpoint log."""
+        result = super().resume(checkpoint_path, **kwargs)
+        return await result if inspect.isawaitable(result) else result
+
+
+async def run_agents(jobs, mode="plan"):
+    """
+    Run several (agent, goal) pairs concurrently in the current event loop.
+
+    Returns:
+        list: Each agent's final result, in the order of `jobs`. An agent that raised
+        returns its exception instead, so one failure doesn't cancel the others.
+    """
+    return await asyncio.gather(
+        *(agent.run(goal, mode=mode) for agent, goal in jobs),
+        return_exceptions=True,
+    )
@@ -0,0 +1,359 @@
+"""
+Benchmark: how the agent loop's own overhead scales with conversation length.
+
+Drives long_horizon_tasks' Agent (run_loop, one write_file + read_file turn per
+iteration) and MeetingNotesAgent (one chat turn with a list_all_todos call per
+iteration) against the in-process ScriptedClient from fake_llm_server.py, for 10,
+100 and 1000 iterations by default. For each run it reports:
+
+    latency       per-iteration wall time (mean, p50, p95, max)
+    overhead      per-iteration time spent in the agent itself: latency minus model
+                  time minus tool time (compaction, prompt layout, serialization)
+    tools         total tool time, and the part spent in _validate_path
+    compaction    total time in _compact_memory
+    memory        items in memory, and traced Python heap (current and peak)
+    payload       request bytes sent to the model (total, mean and last request)
+
+Results are saved as JSON; --compare flags metrics that regressed against an
+earlier results file.
+
+Usage:
+    python bench_agent_loop.py [--iterations 10 100 1000] [--agents agent meeting_notes]
+                               [--latency-ms 0] [--no-memory] [--json results.json]
+                               [--compare baseline.json] [--threshold 1.25]
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-key")
+
+import agentic_agent
+from fake_llm_server import ScriptedClient
+
+
+# Metrics compared by --compare: (path into a result, label). Higher is worse for all.
+COMPARED_METRICS = [
+    (("latency_ms", "mean"), "mean latency (ms)"),
+    (("latency_ms", "p95"), "p95 latency (ms)"),
+    (("overhead_ms", "mean"), "mean overhead (ms)"),
+    (("tools", "total_ms"), "tool time (ms)"),
+    (("memory", "peak_bytes"), "peak heap (bytes)"),
+    (("payload", "total_bytes"), "request bytes"),
+]
+
+
+class TimedClient:
+    """Wraps a client and records the time spent inside each model call."""
+
+    def __init__(self, client, on_call=None):
+        self._client = client
+        self._on_call = on_call
+        self.model_time = 0.0
+        self.calls = 0
+        self.responses = self._Endpoint(self, client.responses)
+        self.chat = type("Chat", (), {})()
+        self.chat.completions = self._Endpoint(self, client.chat.completions)
+
+    class _Endpoint:
+        def __init__(self, owner, endpoint):
+            self._owner = owner
+            self._endpoint = endpoint
+
+        def create(self, **request):
+            owner = self._owner
+            if owner._on_call is not None:
+                owner._on_call()
+            start = time.perf_counter()
+            try:
+                return self._endpoint.create(**request)
+            finally:
+                owner.model_time += time.perf_counter() - start
+                owner.calls += 1
+
+
+class InstrumentedAgent(agentic_agent.Agent):
+    """Agent that accumulates time spent in tools, _validate_path and compaction."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = {"tools": 0.0, "validate_path": 0.0, "compaction": 0.0}
+        self.validate_path_calls = 0
+
+    def _validate_path(self, filepath):
+        start = time.perf_counter()
+        try:
+            return super()._validate_path(filepath)
+        finally:
+            self.timings["validate_path"] += time.perf_counter() - start
+            self.validate_path_calls += 1
+
+    def _tool_output(self, item):
+        start = time.perf_counter()
+        try:
+            return super()._tool_output(item)
+        finally:
+            self.timings["tools"] += time.perf_counter() - start
+
+    def _compact_memory(self):
+        start = time.perf_counter()
+        try:
+            return super()._compact_memory()
+        finally:
+            self.timings["compaction"] += time.perf_counter() - start
+
+
+def _summarize(values):
+    if not values:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(values)
+    return {
+        "mean": round(statistics.fmean(ordered), 4),
+        "p50": round(ordered[len(ordered) // 2], 4),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        "max": round(ordered[-1], 4),
+    }
+
+
+def _heap():
+    return tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+
+
+def _serialized_bytes(items):
+    return len(json.dumps(items, default=lambda item: getattr(item, "__dict__", str(item))).encode("utf-8"))
+
+
+def bench_agent(iterations, latency_ms=0):
+    """Run Agent.run_loop for `iterations` tool turns followed by a finish turn."""
+    steps = []
+    for number in range(iterations):
+        path = f"notes/iteration_{number}.md"
+        steps.append({"tool_calls": [
+            {"name": "write_file", "arguments": {"filepath": path, "content": f"Iteration {number}\n" * 20}},
+            {"name": "read_file", "arguments": {"filepath": path}},
+        ]})
+    steps.append({"tool_calls": [{"name": "finish", "arguments": {"summary": "Done."}}]})
+    scripted = ScriptedClient({"steps": steps}, latency_ms=latency_ms)
+
+    # Each model call starts a new iteration; sample the running totals at that point
+    marks = []
+    def mark():
+        marks.append((time.perf_counter(), client.model_time, agent.timings["tools"],
+                      scripted.model.stats["request_bytes"], _heap()[0]))
+
+    client = TimedClient(scripted, on_call=mark)
+    agent = InstrumentedAgent(working_directory=tempfile.mkdtemp(prefix="bench_loop_"),
+                              parallel_tools=False, client=client)
+
+    start = time.perf_counter()
+    agent.run_loop("Write and read back one note per iteration.", max_turns=iterations + 1)
+    end = time.perf_counter()
+    marks.append((end, client.model_time, agent.timings["tools"],
+                  scripted.model.stats["request_bytes"], _heap()[0]))
+
+    latency, overhead, request_bytes, heap = [], [], [], []
+    for (t0, model0, tools0, bytes0, _), (t1, model1, tools1, bytes1, heap1) in zip(marks, marks[1:]):
+        latency.append((t1 - t0) * 1000)
+        overhead.append(((t1 - t0) - (model1 - model0) - (tools1 - tools0)) * 1000)
+        request_bytes.append(bytes1 - bytes0)
+        heap.append(heap1)
+
+    return _result("agent", iterations, end - start, client, latency, overhead, agent.timings,
+                   agent.validate_path_calls, len(agent.memory), _serialized_bytes(agent.memory),
+                   request_bytes, heap, scripted.model.stats)
+
+
+def bench_meeting_notes(iterations, latency_ms=0):
+    """Run MeetingNotesAgent.chat `iterations` times, each calling list_all_todos once."""
+    import meeting_notes_agent
+
+    scripted = ScriptedClient({
+        "rules": [{"role": "tool", "text": "You have 3 open to-dos."}],
+        "final": {"tool_calls": [{"name": "list_all_todos", "arguments": {}}]},
+    }, latency_ms=latency_ms)
+    client = TimedClient(scripted)
+
+    class InstrumentedMeetingNotesAgent(meeting_notes_agent.MeetingNotesAgent):
+        tool_time = 0.0
+
+        def execute_tool(self, tool_name, arguments):
+            start = time.perf_counter()
+            try:
+                return super().execute_tool(tool_name, arguments)
+            finally:
+                self.tool_time += time.perf_counter() - start
+
+    notes_dir = meeting_notes_agent.MEETING_NOTES_DIR
+    log_level = meeting_notes_agent.logger.level
+    meeting_notes_agent.MEETING_NOTES_DIR = Path(tempfile.mkdtemp(prefix="bench_notes_"))
+    meeting_notes_agent.logger.setLevel(logging.WARNING)
+    try:
+        for number in range(3):
+            meeting_notes_agent.save_meeting_notes(
+                f"Standup {number}", "2025-01-01", ["Ann"], "Summary", "Transcript", [f"Task {number}"])
+
+        agent = InstrumentedMeetingNotesAgent(client=client)
+        latency, overhead, request_bytes, heap = [], [], [], []
+        start = time.perf_counter()
+        for number in range(iterations):
+            t0, model0, tools0 = time.perf_counter(), client.model_time, agent.tool_time
+            bytes0 = scripted.model.stats["request_bytes"]
+            agent.chat(f"What are my open to-dos? ({number})")
+            elapsed = time.perf_counter() - t0
+            latency.append(elapsed * 1000)
+            overhead.append((elapsed - (client.model_time - model0) - (agent.tool_time - tools0)) * 1000)
+            request_bytes.append(scripted.model.stats["request_bytes"] - bytes0)
+            heap.append(_heap()[0])
+        end = time.perf_counter()
+    finally:
+        meeting_notes_agent.MEETING_NOTES_DIR = notes_dir
+        meeting_notes_agent.logger.setLevel(log_level)
+
+    timings = {"tools": agent.tool_time, "validate_path": 0.0, "compaction": 0.0}
+    return _result("meeting_notes", iterations, end - start, client, latency, overhead, timings, 0,
+                   len(agent.conversation_history), _serialized_bytes(agent.conversation_history),
+                   request_bytes, heap, scripted.model.stats)
+
+
+def _result(name, iterations, wall_time, client, latency, overhead, timings, validate_path_calls,
+            memory_items, memory_bytes, request_bytes, heap, model_stats):
+    current, peak = _heap()
+    return {
+        "agent": name,
+        "iterations": iterations,
+        "wall_time_s": round(wall_time, 4),
+        "model_calls": client.calls,
+        "model_time_ms": round(client.model_time * 1000, 3),
+        "latency_ms": _summarize(latency),
+        "overhead_ms": _summarize(overhead),
+        "tools": {
+            "total_ms": round(timings["tools"] * 1000, 3),
+            "validate_path_ms": round(timings["validate_path"] * 1000, 3),
+            "validate_path_calls": validate_path_calls,
+        },
+        "compaction_ms": round(timings["compaction"] * 1000, 3),
+        "memory": {
+            "items": memory_items,
+            "serialized_bytes": memory_bytes,
+            "current_bytes": current,
+            "peak_bytes": peak,
+        },
+        "payload": {
+            "total_bytes": model_stats["request_bytes"],
+            "mean_bytes": round(model_stats["request_bytes"] / max(1, client.calls)),
+            "last_iteration_bytes": request_bytes[-1] if request_bytes else 0,
+            "estimated_input_tokens": model_stats["input_tokens"],
+        },
+        "series": {
+            "latency_ms": [round(value, 3) for value in latency],
+            "request_bytes": request_bytes,
+            "heap_bytes": heap,
+        },
+    }
+
+
+BENCHMARKS = {"agent": bench_agent, "meeting_notes": bench_meeting_notes}
+
+
+def run(iterations=(10, 100, 1000), agents=tuple(BENCHMARKS), latency_ms=0, trace_memory=True):
+    """Run every (agent, iteration count) pair and return the results document."""
+    results = []
+    for name in agents:
+        for count in iterations:
+            if trace_memory:
+                tracemalloc.start()
+            try:
+                # Agents print every tool call and prompt; keep that out of the timings
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    results.append(BENCHMARKS[name](count, latency_ms))
+            finally:
+                if trace_memory:
+                    tracemalloc.stop()
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "latency_ms": latency_ms,
+            "trace_memory": trace_memory,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold=1.25):
+    """
+    Compare two results documents.
+
+    Returns:
+        list: (agent, iterations, label, old, new, ratio) for every metric whose new
+        value is more than `threshold` times the old one
+    """
+    old_results = {(result["agent"], result["iterations"]): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = old_results.get((result["agent"], result["iterations"]))
+        if old is None:
+            continue
+        for path, label in COMPARED_METRICS:
+            old_value, new_value = old, result
+            for key in path:
+                old_value, new_value = old_value[key], new_value[key]
+            if old_value and new_value / old_value > threshold:
+                regressions.append((result["agent"], result["iterations"], label, old_value, new_value,
+                                    round(new_value / old_value, 2)))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--agents", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--latency-ms", type=float, default=0, help="Simulated milliseconds per model call")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip tracemalloc (it slows every allocation, so latencies are lower without it)")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Earlier results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Ratio that counts as a regression")
+    args = parser.parse_args()
+
+    document = run(args.iterations, args.agents, args.latency_ms, trace_memory=not args.no_memory)
+
+    print("\n" + "=" * 100)
+    print(f"{'agent':<15}{'iters':>7}{'mean ms':>10}{'p95 ms':>10}{'overhead ms':>13}"
+          f"{'tools ms':>11}{'peak heap':>12}{'last req B':>12}{'total req B':>14}")
+    for result in document["results"]:
+        print(f"{result['agent']:<15}{result['iterations']:>7}{result['latency_ms']['mean']:>10}"
+              f"{result['latency_ms']['p95']:>10}{result['overhead_ms']['mean']:>13}"
+              f"{result['tools']['total_ms']:>11}{result['memory']['peak_bytes']:>12}"
+              f"{result['payload']['last_iteration_bytes']:>12}{result['payload']['total_bytes']:>14}")
+    print("=" * 100)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(document, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            regressions = compare(json.load(file), document, args.threshold)
+        for agent, iterations, label, old, new, ratio in regressions:
+            print(f"REGRESSION {agent} x{iterations}: {label} {old} -> {new} ({ratio}x)")
+        if regressions:
+            sys.exit(1)
+        print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
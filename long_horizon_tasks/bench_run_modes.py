@@ -0,0 +1,128 @@
+"""
+Benchmark: plan/act/check/summarize cycle vs the single-loop fast mode.
+
+Both modes drive the same scripted task against fake_llm_server's ScriptedClient,
+which answers after a fixed latency, so the numbers show model round trips and wall time caused by the
+loop structure itself. No API key or network is needed.
+
+With --content-bytes every file written carries that much content, so a long run
+shows whether compaction keeps each request within --max-input-tokens; the
+benchmark exits with status 1 if a request went over.
+
+Usage:
+    python bench_run_modes.py [--steps 5] [--latency 0.05] [--json results.json]
+    python bench_run_modes.py --steps 60 --content-bytes 5000 --max-input-tokens 8000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-key")
+
+import agentic_agent
+from context_compaction import estimate_tokens
+from fake_llm_server import ScriptedClient
+
+
+def step_files_scenario(steps, content_bytes=0):
+    """
+    A fake_llm_server scenario for a model that writes one file per tool turn until
+    the task is done.
+
+    The reply depends only on the trailing instruction of each request, so the same
+    scenario works for both run modes.
+    """
+    writes = [
+        {"tool_calls": [{"name": "write_file", "arguments": {
+            "filepath": f"notes/step_{number}.md", "content": f"Step {number}\n" + "." * content_bytes}}]}
+        for number in range(steps)
+    ]
+    finish = {"tool_calls": [{"name": "finish", "arguments": {"summary": "All steps written."}}]}
+    return {"rules": [
+        {"when": agentic_agent.TOOL_RESULTS_INSTRUCTION, "text": "Done."},
+        {"when": agentic_agent.LOOP_INSTRUCTION, "replies": writes + [finish]},
+        {"when": agentic_agent.CHECK_PROMPT, "replies": [{"text": "No"}] * (steps - 1) + [{"text": "Yes"}]},
+        {"when": agentic_agent.ACT_PROMPT, "replies": writes or [{"text": "Nothing to write."}]},
+        {"when": agentic_agent.SUMMARY_PROMPT, "text": "All steps written."},
+        {"when": "", "text": "Write the remaining files."},  # plan and reflect
+    ]}
+
+
+def record_memory_tokens(client):
+    """
+    Wrap client.responses.create to record the estimated tokens of the memory sent
+    with each request (the phase instruction excluded).
+
+    Returns:
+        list: Filled in as requests are made
+    """
+    memory_tokens = []
+    create = client.responses.create
+
+    def recording_create(**request):
+        memory_tokens.append(sum(estimate_tokens(item) for item in request["input"]
+                                 if not (isinstance(item, dict) and item.get("role") == "developer")))
+        return create(**request)
+
+    client.responses.create = recording_create
+    return memory_tokens
+
+
+def bench(mode, steps, latency, content_bytes=0, max_input_tokens=120_000):
+    client = ScriptedClient(step_files_scenario(steps, content_bytes), latency_ms=latency * 1000)
+    memory_tokens = record_memory_tokens(client)
+    agent = agentic_agent.Agent(
+        working_directory=tempfile.mkdtemp(prefix=f"bench_{mode}_"),
+        client=client,
+        max_input_tokens=max_input_tokens,
+    )
+    start = time.perf_counter()
+    agent.run(f"Write {steps} step files.", mode=mode)
+    elapsed = time.perf_counter() - start
+    totals = agent.prompt_layout.totals()
+    return {
+        "mode": mode,
+        "steps": steps,
+        "round_trips": client.model.stats["responses"],
+        "wall_time_s": round(elapsed, 4),
+        "estimated_input_tokens": totals["input_tokens"],
+        "largest_request_tokens": max(memory_tokens),
+        "within_budget": max(memory_tokens) <= max_input_tokens,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--steps", type=int, default=5, help="Tool steps the task needs")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per model call")
+    parser.add_argument("--content-bytes", type=int, default=0, help="Extra content in every file written")
+    parser.add_argument("--max-input-tokens", type=int, default=120_000, help="The agents' memory budget")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    results = [bench(mode, args.steps, args.latency, args.content_bytes, args.max_input_tokens)
+               for mode in ("plan", "loop")]
+
+    print("\n" + "=" * 76)
+    print(f"{'mode':<8}{'round trips':>14}{'wall time (s)':>16}{'input tokens':>16}{'largest request':>22}")
+    for result in results:
+        print(f"{result['mode']:<8}{result['round_trips']:>14}{result['wall_time_s']:>16}"
+              f"{result['estimated_input_tokens']:>16}{result['largest_request_tokens']:>22}")
+    print("=" * 76)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+    if not all(result["within_budget"] for result in results):
+        print(f"A request went over the {args.max_input_tokens} token budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
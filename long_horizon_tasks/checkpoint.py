@@ -0,0 +1,149 @@
+"""
+Append-only checkpoints of an agent run, so an interrupted run can be resumed.
+
+After every completed phase (plan, act, check, reflect, summary; or each turn in
+loop mode) the agent appends one JSON line to the checkpoint log:
+
+    {"start": {"goal": ..., "mode": "plan", ...}, "append": [...]}      # a new run
+    {"iteration": 2, "phase": "act", "result": "...", "append": [...]}  # a phase
+    {"iteration": 2, "phase": "summary", "result": "...", "done": true, "append": [...]}
+
+(in loop mode each turn is an iteration with phase "turn").
+
+"append" holds only the memory items added since the previous line, each
+serialized once, so a checkpoint costs about as much as the new items and never
+rewrites the history. When compaction has rewritten older items (or dropped
+turns) the line carries an "edit" instead: the new memory as ranges of the
+previous one and the items that are new (stubs, the dropped-turns note, and the
+items added since), in order:
+
+    {"iteration": 5, "phase": "turn", "edit": [[0, 1], {"role": "user", ...}, [9, 40], ...]}
+
+so the line costs about as much as the stubs, not the whole memory.
+
+load_checkpoint() replays the log of the latest run into the memory and run state
+as of the last completed phase; Agent.resume() continues from there. A line cut
+short by a crash mid-write is ignored.
+"""
+
+import json
+import os
+
+from context_compaction import serialize_item
+
+
+class CheckpointLog:
+    """
+    Writes checkpoints of one agent's runs to a JSONL file.
+
+    Args:
+        path: The log file; appended to, never truncated
+        fsync: Also fsync after every line (survives power loss, not just a crash)
+    """
+
+    def __init__(self, path, fsync=False):
+        self.path = os.path.abspath(path)
+        self.fsync = fsync
+        self._logged = []  # the memory items the log already holds, in order
+        # A line cut short by a crash must not run into the next one
+        self._partial_line = False
+        try:
+            with open(self.path, "rb") as file:
+                file.seek(-1, os.SEEK_END)
+                self._partial_line = file.read(1) != b"\n"
+        except OSError:
+            pass  # missing or empty
+
+    def _write(self, record, memory_fields):
+        # Items are spliced in as already-serialized JSON (cached on MemoryItems)
+        key, encoded = memory_fields
+        line = json.dumps(record, default=str)[:-1] + (", " if record else "") + f'"{key}": [' + ", ".join(encoded) + "]}\n"
+        if self._partial_line:
+            line, self._partial_line = "\n" + line, False
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(line)
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+
+    def _memory_fields(self, memory):
+        """The items added since the last line, or an edit of the logged memory if earlier items changed."""
+        logged = self._logged
+        if len(memory) >= len(logged) and all(item is old for item, old in zip(memory, logged)):
+            fields = "append", [serialize_item(item) for item in memory[len(logged):]]
+        else:
+            fields = "edit", self._edit(memory)
+        self._logged = list(memory)
+        return fields
+
+    def _edit(self, memory):
+        """memory as [start, end] ranges of the logged memory and serialized new items."""
+        positions = {id(item): index for index, item in enumerate(self._logged)}
+        pieces, run = [], None  # run: the [start, end] range being extended
+        for item in memory:
+            index = positions.get(id(item))
+            if index is None:
+                run = None
+                pieces.append(serialize_item(item))
+            elif run is not None and run[1] == index:
+                run[1] += 1
+            else:
+                run = [index, index + 1]
+                pieces.append(run)
+        return [piece if isinstance(piece, str) else json.dumps(piece) for piece in pieces]
+
+    def start(self, memory, **run):
+        """Begin a new run: its settings (goal, mode, ...) and the memory so far."""
+        self._logged = []
+        self._write({"start": run}, self._memory_fields(memory))
+
+    def record(self, memory, **state):
+        """Record a completed phase: its state (iteration, phase, result, ...) and the new memory items."""
+        self._write(state, self._memory_fields(memory))
+
+    def adopt(self, memory):
+        """Continue logging after `memory` was restored from this log."""
+        self._logged = list(memory)
+
+
+def load_checkpoint(path):
+    """
+    The latest run in a checkpoint log, as of its last completed phase.
+
+    Returns:
+        dict: "start" (the run's settings), "memory" (list of item dicts), "last"
+        (the last phase record without its memory fields, or None if no phase
+        completed) and "results" (phase -> result for the phases of that record's
+        iteration)
+
+    Raises:
+        ValueError: If the log holds no run
+    """
+    run = None
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line being written when a run was interrupted
+            if "start" in record:
+                run = {"start": record["start"], "memory": [], "last": None, "results": {}}
+            elif run is None:
+                continue
+            if "edit" in record:
+                edited = []
+                for piece in record["edit"]:
+                    if isinstance(piece, list):
+                        edited.extend(run["memory"][piece[0]:piece[1]])
+                    else:
+                        edited.append(piece)
+                run["memory"] = edited
+            run["memory"].extend(record.get("append", ()))
+            if "phase" in record:
+                if run["last"] is not None and run["last"].get("iteration") != record.get("iteration"):
+                    run["results"] = {}
+                run["last"] = {key: value for key, value in record.items() if key not in ("append", "edit")}
+                run["results"][record["phase"]] = record.get("result")
+    if run is None:
+        raise ValueError(f"No agent run recorded in {path}")
+    return run
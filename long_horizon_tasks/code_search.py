@@ -0,0 +1,280 @@
+"""
+Trigram index for searching the agent's working directory.
+
+Every text file under the root is broken into its (lowercased) three-character
+substrings, and the index maps each trigram to the files containing it. A query is
+reduced to the trigrams any match must contain, so only files holding all of them are
+opened and scanned line by line. Repeated searches cost a few set intersections
+instead of a walk over every file's contents.
+
+The index is built on the first search and kept current incrementally:
+    - invalidate(path) re-indexes one file (the agent calls it after write_file and
+      move_file)
+    - mark_stale() makes the next search re-check every file's mtime and size, and
+      re-index only the ones that changed (the agent calls it after shell commands)
+    - a search also re-checks mtimes once the last check is older than max_staleness
+      seconds, which catches files written by background processes
+"""
+
+import fnmatch
+import os
+import re
+import threading
+import time
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+
+SKIP_DIRS = {".git", ".hg", ".svn", "__pycache__", "node_modules", ".venv", "venv", ".mypy_cache",
+             ".pytest_cache", ".tox", ".model_cache", ".agent_output"}
+
+MAX_FILE_BYTES = 1024 * 1024
+MAX_LINE_CHARS = 200
+
+
+def trigrams(text):
+    """The set of lowercased three-character substrings of text."""
+    text = text.lower()
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+
+def _literal_runs(parsed):
+    runs, run = [], []
+    for op, value in parsed:
+        name = str(op)
+        if name == "LITERAL":
+            run.append(chr(value))
+            continue
+        if run:
+            runs.append("".join(run))
+            run = []
+        if name == "SUBPATTERN":
+            runs.extend(_literal_runs(value[-1]))
+        elif name in ("MAX_REPEAT", "MIN_REPEAT") and value[0] >= 1:
+            runs.extend(_literal_runs(value[2]))
+    if run:
+        runs.append("".join(run))
+    return runs
+
+
+def required_literals(pattern, flags=0):
+    """
+    Literal strings that every match of a regex must contain.
+
+    Runs of plain characters are collected from the pattern's sequence, including
+    groups and parts repeated at least once; alternations, optional parts and
+    character classes end a run. Returns an empty list if nothing is certain, and
+    the search then scans every file.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except Exception:
+        return []
+    return [run for run in _literal_runs(parsed) if len(run) >= 3]
+
+
+class WorkspaceIndex:
+    """
+    Base for indexes of the files under a directory that are kept current by mtime.
+
+    Subclasses record each indexed file as self._files[path] = (mtime_ns, size, ...)
+    and implement _index_file(path, stat) and _remove(path); wants(path) picks the
+    files to index.
+
+    Args:
+        root: The directory to index
+        max_staleness: Seconds after which a refresh re-checks file mtimes
+    """
+
+    def __init__(self, root, max_staleness=2.0):
+        self.root = os.path.realpath(root)
+        self.max_staleness = max_staleness
+        self._files = {}
+        self._pending = set()
+        self._stale = True
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+        self.stats = {"scans": 0, "indexed": 0}
+
+    def wants(self, path):
+        return True
+
+    def invalidate(self, path):
+        """Re-index one file (or drop it, if it is gone) on the next refresh."""
+        with self._lock:
+            self._pending.add(os.path.realpath(path))
+
+    def mark_stale(self):
+        """Re-check every file's mtime on the next refresh."""
+        with self._lock:
+            self._stale = True
+
+    def _index_file(self, path, stat):
+        raise NotImplementedError
+
+    def _remove(self, path):
+        raise NotImplementedError
+
+    def _walk(self):
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False) and self.wants(entry.path):
+                    yield entry
+
+    def refresh(self):
+        """Bring the index up to date: pending paths always, every mtime when stale."""
+        with self._lock:
+            if self._stale or time.monotonic() - self._checked_at > self.max_staleness:
+                self.stats["scans"] += 1
+                seen = set()
+                for entry in self._walk():
+                    path = entry.path
+                    seen.add(path)
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    known = self._files.get(path)
+                    if known is None or known[0] != stat.st_mtime_ns or known[1] != stat.st_size:
+                        self._index_file(path, stat)
+                for path in list(self._files):
+                    if path not in seen:
+                        self._remove(path)
+                self._pending.clear()
+                self._stale = False
+                self._checked_at = time.monotonic()
+            else:
+                for path in self._pending:
+                    if not self.wants(path):
+                        continue
+                    try:
+                        self._index_file(path, os.stat(path))
+                    except OSError:
+                        self._remove(path)
+                self._pending.clear()
+
+
+class TrigramIndex(WorkspaceIndex):
+    """
+    A trigram index of the text files under `root`.
+
+    Args:
+        root: The directory to index
+        max_file_bytes: Larger files are not indexed (or searched)
+        max_staleness: Seconds after which a search re-checks file mtimes
+    """
+
+    def __init__(self, root, max_file_bytes=MAX_FILE_BYTES, max_staleness=2.0):
+        super().__init__(root, max_staleness)
+        self.max_file_bytes = max_file_bytes
+        self._files = {}     # path -> (mtime_ns, size, trigrams)
+        self._postings = {}  # trigram -> set of paths
+        self.stats["searches"] = 0
+
+    def _remove(self, path):
+        entry = self._files.pop(path, None)
+        if entry is None:
+            return
+        for gram in entry[2]:
+            paths = self._postings.get(gram)
+            if paths is not None:
+                paths.discard(path)
+                if not paths:
+                    del self._postings[gram]
+
+    def _index_file(self, path, stat):
+        self._remove(path)
+        if stat.st_size > self.max_file_bytes:
+            return
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except OSError:
+            return
+        if b"\0" in data[:8192]:
+            return  # binary
+        grams = trigrams(data.decode("utf-8", errors="replace"))
+        self._files[path] = (stat.st_mtime_ns, stat.st_size, grams)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(path)
+        self.stats["indexed"] += 1
+
+    def candidates(self, literals):
+        """Indexed files containing every trigram of every literal (all files if none)."""
+        grams = set()
+        for literal in literals:
+            grams |= trigrams(literal)
+        if not grams:
+            return set(self._files)
+        # Intersect the rarest postings first
+        postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+        result = set(postings[0])
+        for paths in postings[1:]:
+            result &= paths
+            if not result:
+                break
+        return result
+
+    def search(self, query, regex=False, case_sensitive=True, subdirectory=None, file_pattern=None,
+               limit=50):
+        """
+        Find lines matching a literal string or a regular expression.
+
+        Returns:
+            dict: "matches" ({"path", "line", "text"} with paths relative to the root),
+            "count", "truncated" (more matches than limit), "files_scanned" and
+            "files_indexed"
+        """
+        flags = 0 if case_sensitive else re.IGNORECASE
+        compiled = re.compile(query if regex else re.escape(query), flags)
+        literals = required_literals(query, flags) if regex else [query]
+
+        with self._lock:
+            self.refresh()
+            self.stats["searches"] += 1
+            paths = self.candidates(literals)
+            files_indexed = len(self._files)
+
+        prefix = os.path.join(os.path.realpath(subdirectory), "") if subdirectory else None
+        matches, scanned, truncated = [], 0, False
+        for path in sorted(paths):
+            if prefix and not path.startswith(prefix):
+                continue
+            relative = os.path.relpath(path, self.root)
+            if file_pattern and not (fnmatch.fnmatch(relative, file_pattern)
+                                     or fnmatch.fnmatch(os.path.basename(path), file_pattern)):
+                continue
+            try:
+                with open(path, "r", encoding="utf-8", errors="replace") as file:
+                    lines = file.read().splitlines()
+            except OSError:
+                continue
+            scanned += 1
+            for number, line in enumerate(lines, start=1):
+                if compiled.search(line):
+                    if len(matches) >= limit:
+                        truncated = True
+                        break
+                    matches.append({"path": relative, "line": number, "text": line.strip()[:MAX_LINE_CHARS]})
+            if truncated:
+                break
+
+        return {
+            "matches": matches,
+            "count": len(matches),
+            "truncated": truncated,
+            "files_scanned": scanned,
+            "files_indexed": files_indexed,
+        }
@@ -0,0 +1,343 @@
+"""
+Token-budgeted compaction for an agent's memory.
+
+The long-horizon agent resends its whole memory on every model call, so raw tool
+outputs (whole files, full command output) and the long prompts of earlier phases
+would otherwise be paid for on every request until the task ends. The compactor:
+
+1. Keeps the system message and the latest `keep_recent_turns` turns verbatim.
+   A turn starts at each user message, and at each model step that calls tools
+   after earlier tool results, so a run_loop conversation (one user message and
+   then only function calls and their outputs) is split per step as well.
+2. Replaces large items in older turns with short stubs: tool outputs keep a short
+   excerpt, large tool-call arguments (e.g. write_file content) are elided and long
+   messages are trimmed.
+3. Drops the oldest turns entirely if the estimate is still over `max_input_tokens`.
+   A user message is kept while model steps of its turn remain: within a turn the
+   oldest function calls and their outputs go first.
+4. If the recent turns alone are over the budget, stubs their large tool calls
+   and outputs as well, oldest first, until the estimate fits.
+
+Compaction only rewrites items as they age out of the recent window, so the front
+of the memory stays byte-for-byte stable between calls.
+"""
+
+import json
+
+
+# Rough size of a token for the estimate; good enough to enforce a budget
+CHARS_PER_TOKEN = 4
+
+DROPPED_NOTE_PREFIX = "[Context compacted:"
+
+
+def item_field(item, name, default=None):
+    """Read a field from a memory item, whether it is a dict or an SDK object."""
+    if isinstance(item, dict):
+        return item.get(name, default)
+    return getattr(item, name, default)
+
+
+def item_to_dict(item):
+    """Convert a memory item into a plain dict that can be sent back as input."""
+    if isinstance(item, dict):
+        return dict(item)
+    if hasattr(item, "model_dump"):
+        return item.model_dump(exclude_none=True)
+    return dict(vars(item))
+
+
+class MemoryItem(dict):
+    """
+    A memory item as the plain dict the API accepts as input, with its serialized
+    form and token estimate cached.
+
+    SDK output objects are converted (with model_dump) once, when they enter the
+    memory, so nothing has to re-serialize them for every request, estimate, prefix
+    measurement or checkpoint. Items are treated as immutable: compaction builds
+    new ones, and changing a key drops the cache.
+    """
+
+    __slots__ = ("_json", "_tokens")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._json = None
+        self._tokens = None
+
+    @classmethod
+    def of(cls, item):
+        return item if isinstance(item, cls) else cls(item_to_dict(item))
+
+    def serialized(self):
+        if self._json is None:
+            self._json = json.dumps(self, default=str)
+        return self._json
+
+    def tokens(self):
+        if self._tokens is None:
+            self._tokens = len(self.serialized()) // CHARS_PER_TOKEN + 1
+        return self._tokens
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._json = self._tokens = None
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._json = self._tokens = None
+
+
+class Memory(list):
+    """An agent's memory: a list that stores every item added to it as a MemoryItem."""
+
+    def __init__(self, items=()):
+        super().__init__(MemoryItem.of(item) for item in items)
+
+    def append(self, item):
+        super().append(MemoryItem.of(item))
+
+    def insert(self, index, item):
+        super().insert(index, MemoryItem.of(item))
+
+    def extend(self, items):
+        super().extend(MemoryItem.of(item) for item in items)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+
+def serialize_item(item):
+    """Serialize a memory item the way it would be sent to the model."""
+    if isinstance(item, MemoryItem):
+        return item.serialized()
+    if isinstance(item, dict):
+        return json.dumps(item, default=str)
+    if hasattr(item, "model_dump_json"):
+        return item.model_dump_json(exclude_none=True)
+    return json.dumps(vars(item), default=str)
+
+
+def estimate_tokens(item):
+    if isinstance(item, MemoryItem):
+        return item.tokens()
+    return len(serialize_item(item)) // CHARS_PER_TOKEN + 1
+
+
+def excerpt(text, limit):
+    text = " ".join(str(text).split())
+    if len(text) <= limit:
+        return text
+    return text[:limit] + "..."
+
+
+class ContextCompactor:
+    """
+    Keeps an agent's memory under a token budget.
+
+    Args:
+        max_input_tokens: Hard cap for the estimated size of the memory
+        keep_recent_turns: Number of latest turns that are never compacted
+        stub_over_chars: Older items larger than this are replaced with stubs
+        excerpt_chars: How much of a compacted item to keep as an excerpt
+        summarize: Optional callable(tool_name, text) -> str used instead of the
+            default excerpt when a tool output is compacted
+    """
+
+    def __init__(self, max_input_tokens=120_000, keep_recent_turns=4, stub_over_chars=1_000,
+                 excerpt_chars=200, summarize=None):
+        self.max_input_tokens = max_input_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self.stub_over_chars = stub_over_chars
+        self.excerpt_chars = excerpt_chars
+        self.summarize = summarize
+
+    def compact(self, memory):
+        """
+        Compact a memory list.
+
+        Returns:
+            tuple: (new_memory: list, stats: dict). The input list is not modified.
+            stats has "stubbed" and "dropped" item counts and the estimated token
+            totals before and after.
+        """
+        tokens_before = sum(estimate_tokens(item) for item in memory)
+        stats = {"stubbed": 0, "dropped": 0, "tokens_before": tokens_before, "tokens_after": tokens_before}
+
+        head, body = self._split_head(memory)
+        turn_starts = self._turn_starts(body)
+        if len(turn_starts) > self.keep_recent_turns:
+            recent_start = turn_starts[-self.keep_recent_turns] if self.keep_recent_turns else len(body)
+        else:
+            recent_start = 0
+
+        tool_names = {
+            item_field(item, "call_id"): item_field(item, "name")
+            for item in body[:recent_start]
+            if item_field(item, "type") == "function_call"
+        }
+
+        compacted = []
+        for item in body[:recent_start]:
+            stub = self._stub(item, tool_names)
+            if stub is not None:
+                stats["stubbed"] += 1
+                compacted.append(stub)
+            else:
+                compacted.append(item)
+        body = compacted + list(body[recent_start:])
+
+        # Hard cap: drop the oldest whole turns until the estimate fits, counting
+        # the note that will replace them (it grows by at most a few digits)
+        total = sum(estimate_tokens(item) for item in head + body)
+        note_growth = 0
+        while total + note_growth > self.max_input_tokens:
+            turn_starts = self._turn_starts(body)
+            if len(turn_starts) < 2:
+                break
+            cut = turn_starts[1]
+            # The user message stays while its turn has later model steps (run_loop)
+            keep = 1 if item_field(body[0], "role") == "user" and item_field(body[cut], "role") != "user" else 0
+            if not stats["dropped"]:
+                note_growth = (estimate_tokens(self._with_dropped_note(head, 10 ** 9)[-1])
+                               - sum(estimate_tokens(item) for item in head if self._is_dropped_note(item)))
+            stats["dropped"] += cut - keep
+            total -= sum(estimate_tokens(item) for item in body[keep:cut])
+            body = body[:keep] + body[cut:]
+
+        # Still over (the recent turns alone are too large): stub their tool calls
+        # and outputs too, oldest first, so the newest stay whole the longest
+        if total + note_growth > self.max_input_tokens:
+            tool_names = {
+                item_field(item, "call_id"): item_field(item, "name")
+                for item in body
+                if item_field(item, "type") == "function_call"
+            }
+            for index, item in enumerate(body):
+                if total + note_growth <= self.max_input_tokens:
+                    break
+                if item_field(item, "type") not in ("function_call", "function_call_output"):
+                    continue
+                stub = self._stub(item, tool_names)
+                if stub is not None:
+                    stats["stubbed"] += 1
+                    total += estimate_tokens(stub) - estimate_tokens(item)
+                    body[index] = stub
+
+        if stats["dropped"]:
+            head = self._with_dropped_note(head, stats["dropped"])
+            total = sum(estimate_tokens(item) for item in head + body)
+
+        stats["tokens_after"] = total
+        return head + body, stats
+
+    @staticmethod
+    def _turn_starts(body):
+        """
+        Indexes where turns start: every user message, and every model step that
+        calls tools after the outputs of earlier calls. Function calls stay in the
+        same turn as their outputs, and a closing assistant message stays with the
+        calls it answers.
+        """
+        starts = []
+        step_start = None  # first item after a run of function call outputs
+        for index, item in enumerate(body):
+            item_type = item_field(item, "type")
+            if item_field(item, "role") == "user":
+                starts.append(index)
+                step_start = None
+            elif item_type == "function_call_output":
+                step_start = index + 1
+            elif item_type == "function_call" and step_start is not None:
+                starts.append(step_start)
+                step_start = None
+        return starts
+
+    def _split_head(self, memory):
+        """The system message and any earlier dropped-items note are never compacted."""
+        head_length = 0
+        for item in memory:
+            if item_field(item, "role") in ("system", "developer") or self._is_dropped_note(item):
+                head_length += 1
+            else:
+                break
+        return list(memory[:head_length]), list(memory[head_length:])
+
+    @staticmethod
+    def _is_dropped_note(item):
+        content = item_field(item, "content")
+        return item_field(item, "role") == "user" and isinstance(content, str) and content.startswith(DROPPED_NOTE_PREFIX)
+
+    def _with_dropped_note(self, head, dropped):
+        previously_dropped = 0
+        kept = []
+        for item in head:
+            content = item_field(item, "content")
+            if isinstance(content, str) and content.startswith(DROPPED_NOTE_PREFIX):
+                previously_dropped = int(content.split()[2])
+            else:
+                kept.append(item)
+        note = {
+            "role": "user",
+            "content": f"{DROPPED_NOTE_PREFIX} {previously_dropped + dropped} earlier items were "
+                       f"dropped to stay within the context budget.]",
+        }
+        return kept + [note]
+
+    def _stub(self, item, tool_names):
+        """Return a compact replacement for an old item, or None to keep it as is."""
+        item_type = item_field(item, "type")
+
+        if item_type == "function_call_output":
+            output = item_field(item, "output") or ""
+            if len(output) <= self.stub_over_chars:
+                return None
+            tool_name = tool_names.get(item_field(item, "call_id"), "tool")
+            try:
+                result = json.loads(output).get("result", output)
+            except (ValueError, AttributeError):
+                result = output
+            text = result if isinstance(result, str) else json.dumps(result)
+            if self.summarize is not None:
+                summary = self.summarize(tool_name, text)
+            else:
+                summary = excerpt(text, self.excerpt_chars)
+            stub = item_to_dict(item)
+            stub["output"] = json.dumps({
+                "result": f"[compacted {tool_name} output, {len(output)} chars] {summary}"
+            })
+            return stub
+
+        if item_type == "function_call":
+            arguments = item_field(item, "arguments") or ""
+            if len(arguments) <= self.stub_over_chars:
+                return None
+            try:
+                parsed = json.loads(arguments)
+            except ValueError:
+                parsed = None
+            if isinstance(parsed, dict):
+                parsed = {
+                    key: f"[compacted, {len(value)} chars]"
+                    if isinstance(value, str) and len(value) > self.excerpt_chars else value
+                    for key, value in parsed.items()
+                }
+                compact_arguments = json.dumps(parsed)
+            else:
+                compact_arguments = json.dumps({"compacted_arguments_chars": len(arguments)})
+            stub = item_to_dict(item)
+            stub["arguments"] = compact_arguments
+            return stub
+
+        content = item_field(item, "content")
+        role = item_field(item, "role")
+        if role in ("user", "assistant") and isinstance(content, str) and len(content) > self.stub_over_chars:
+            # Phase prompts end with the instruction, so keep the tail of user messages
+            if role == "user":
+                kept = "..." + content[-self.excerpt_chars:]
+            else:
+                kept = content[:self.excerpt_chars] + "..."
+            return {"role": role, "content": f"[compacted {role} message, {len(content)} chars] {kept}"}
+
+        return None
@@ -0,0 +1,161 @@
+"""
+Static import graph of the Python files in the agent's working directory.
+
+Each .py file is parsed with ast for its import statements (including imports
+inside functions), and each imported module is resolved to the workspace files it
+could refer to. Reversing the graph answers "which test files can a change to
+these files affect?", which run_tests uses to rerun only those tests.
+
+Module names are resolved by suffix: app/time_bank/service.py is known as
+"app.time_bank.service", "time_bank.service" and "service", so imports work
+whichever directory the tests put on sys.path. An ambiguous name maps to every
+file it could mean, which can only select extra tests, never miss one.
+"""
+
+import ast
+import os
+
+from code_search import WorkspaceIndex
+
+
+def is_test_file(path):
+    name = os.path.basename(path)
+    return name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py"))
+
+
+def _imported_modules(tree, package):
+    """Dotted names a module imports; `package` resolves relative imports."""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                parts = package.split(".") if package else []
+                parts = parts[:len(parts) - (node.level - 1)]
+                base = ".".join(parts + ([node.module] if node.module else []))
+            else:
+                base = node.module or ""
+            if base:
+                names.add(base)
+            # `from package import module` imports a module too
+            names.update(f"{base}.{alias.name}" if base else alias.name
+                         for alias in node.names if alias.name != "*")
+    return names
+
+
+class ImportGraph(WorkspaceIndex):
+    """
+    Which workspace files each Python file imports, kept current by mtime.
+
+    Every file (re-)indexed or removed since the last call to take_changed() is
+    remembered, so callers can ask what changed between two test runs.
+
+    Args:
+        root: The directory to index
+        max_staleness: Seconds after which a lookup re-checks file mtimes
+    """
+
+    def __init__(self, root, max_staleness=2.0):
+        super().__init__(root, max_staleness)
+        self._files = {}    # path -> (mtime_ns, size, imported module names)
+        self._modules = {}  # dotted name (and every dotted suffix) -> set of paths
+        self._changed = set()
+
+    def wants(self, path):
+        return path.endswith(".py")
+
+    def _module_names(self, path):
+        parts = os.path.relpath(path, self.root)[:-3].split(os.sep)
+        if parts[-1] == "__init__":
+            parts = parts[:-1]
+        return {".".join(parts[index:]) for index in range(len(parts))} if parts else set()
+
+    def _remove(self, path):
+        if self._files.pop(path, None) is not None:
+            for name in self._module_names(path):
+                paths = self._modules.get(name)
+                if paths is not None:
+                    paths.discard(path)
+                    if not paths:
+                        del self._modules[name]
+        self._changed.add(path)
+
+    def _index_file(self, path, stat):
+        try:
+            with open(path, "rb") as file:
+                tree = ast.parse(file.read(), filename=path)
+        except (OSError, SyntaxError, ValueError):
+            tree = None
+        package = ".".join(os.path.relpath(os.path.dirname(path), self.root).split(os.sep))
+        package = "" if package == "." else package
+        imports = _imported_modules(tree, package) if tree is not None else set()
+        if path not in self._files:
+            for name in self._module_names(path):
+                self._modules.setdefault(name, set()).add(path)
+        self._files[path] = (stat.st_mtime_ns, stat.st_size, imports)
+        self._changed.add(path)
+        self.stats["indexed"] += 1
+
+    def take_changed(self):
+        """Files added, changed or removed since the last call (all files on the first)."""
+        with self._lock:
+            self.refresh()
+            changed, self._changed = self._changed, set()
+            return changed
+
+    def dependencies(self, path):
+        """Workspace files `path` imports directly."""
+        with self._lock:
+            self.refresh()
+            return self._dependencies(os.path.realpath(path))
+
+    def _dependencies(self, path):
+        entry = self._files.get(path)
+        if entry is None:
+            return set()
+        found = set()
+        for name in entry[2]:
+            # Importing a.b.c runs a/__init__.py and a/b/__init__.py as well
+            parts = name.split(".")
+            for end in range(1, len(parts) + 1):
+                found |= self._modules.get(".".join(parts[:end]), set())
+        found.discard(path)
+        return found
+
+    def affected_tests(self, changed):
+        """
+        Test files that import (directly or through other workspace files) any of
+        `changed`, including changed test files themselves. A changed conftest.py
+        affects every test file below its directory.
+        """
+        with self._lock:
+            self.refresh()
+            importers = {}
+            for path in self._files:
+                for dependency in self._dependencies(path):
+                    importers.setdefault(dependency, set()).add(path)
+
+            stack = [os.path.realpath(path) for path in changed]
+            # A deleted module no longer resolves, so start from the files that imported it
+            deleted = set()
+            for path in stack:
+                if path not in self._files and path.endswith(".py"):
+                    deleted |= self._module_names(path)
+            if deleted:
+                stack += [path for path, entry in self._files.items() if entry[2] & deleted]
+
+            reached = set()
+            while stack:
+                path = stack.pop()
+                if path in reached:
+                    continue
+                reached.add(path)
+                stack.extend(importers.get(path, ()))
+
+            tests = {path for path in reached if is_test_file(path) and path in self._files}
+            for path in reached:
+                if os.path.basename(path) == "conftest.py":
+                    directory = os.path.join(os.path.dirname(path), "")
+                    tests.update(test for test in self._files if test.startswith(directory) and is_test_file(test))
+            return tests
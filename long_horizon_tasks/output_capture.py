@@ -0,0 +1,183 @@
+"""
+Bounded capture of command output.
+
+A command can print megabytes (a verbose test run, a build), and everything it
+prints used to sit in memory and then in the agent's context. OutputCapture keeps
+only the first `head_bytes` and the last `tail_bytes` of a stream as it arrives,
+counts the total bytes and lines, and hands the model a compact excerpt:
+
+    <first lines>
+    [... 48,113 lines (2,301,554 bytes) omitted; full output in .agent_output/...]
+    <last lines>
+
+With a `spill_path`, the full stream is also written to that file, but only once
+the output no longer fits in the excerpt, so short commands never create files.
+"""
+
+import os
+import signal
+import subprocess
+import threading
+import time
+
+
+DEFAULT_HEAD_BYTES = 4 * 1024
+DEFAULT_TAIL_BYTES = 12 * 1024
+
+
+class OutputCapture:
+    """
+    The head and tail of a byte stream, with its total size and line count.
+
+    Args:
+        head_bytes: Bytes kept from the start of the stream
+        tail_bytes: Bytes kept from the end of the stream
+        spill_path: File that receives the full stream once it overflows the excerpt
+            (its directory is created then)
+    """
+
+    def __init__(self, head_bytes=DEFAULT_HEAD_BYTES, tail_bytes=DEFAULT_TAIL_BYTES, spill_path=None):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.spill_path = spill_path
+        self.head = bytearray()
+        self.tail = bytearray()  # trimmed back to tail_bytes once it holds twice that
+        self.total_bytes = 0
+        self.newlines = 0
+        self.ends_with_newline = True
+        self.spilled = False
+        self._spill = None
+
+    def write(self, data):
+        if not data:
+            return
+        self.total_bytes += len(data)
+        self.newlines += data.count(b"\n")
+        self.ends_with_newline = data.endswith(b"\n")
+
+        if self._spill is not None:
+            self._spill.write(data)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        self.tail += data
+        if len(self.tail) > self.tail_bytes:
+            if self.spill_path is not None and not self.spilled:
+                # Nothing has been dropped yet, so the spill file starts complete
+                self._start_spill()
+            if len(self.tail) > 2 * self.tail_bytes:
+                del self.tail[:-self.tail_bytes]
+
+    def _start_spill(self):
+        self.spilled = True
+        try:
+            os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+            self._spill = open(self.spill_path, "wb")
+            self._spill.write(self.head)
+            self._spill.write(self.tail)
+        except OSError:
+            self._spill = None
+            self.spill_path = None
+
+    def close(self):
+        """Close the spill file (if any)."""
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    @property
+    def lines(self):
+        return self.newlines + (0 if self.ends_with_newline else 1)
+
+    @property
+    def truncated(self):
+        return self.total_bytes > len(self.head) + self.tail_bytes
+
+    def text(self, spill_name=None):
+        """
+        The captured output, or its head and tail around an omission marker if it
+        did not fit. The excerpt is cut at line ends where possible.
+
+        Args:
+            spill_name: How to refer to the spill file in the marker
+        """
+        if not self.truncated:
+            return bytes(self.head + self.tail).decode("utf-8", errors="replace")
+
+        head = bytes(self.head)
+        if b"\n" in head:
+            head = head[:head.rindex(b"\n") + 1]
+        tail = bytes(self.tail[-self.tail_bytes:])
+        if b"\n" in tail[:-1]:
+            tail = tail[tail.index(b"\n") + 1:]
+
+        omitted_bytes = self.total_bytes - len(head) - len(tail)
+        omitted_lines = self.newlines - head.count(b"\n") - tail.count(b"\n")
+        marker = f"[... {omitted_lines:,} lines ({omitted_bytes:,} bytes) omitted"
+        if self.spilled and self.spill_path is not None:
+            marker += f"; full output in {spill_name or self.spill_path}"
+        return (head.decode("utf-8", errors="replace") + marker + " ...]\n"
+                + tail.decode("utf-8", errors="replace"))
+
+    def stats(self):
+        return {"bytes": self.total_bytes, "lines": self.lines, "truncated": self.truncated}
+
+
+def _pump(pipe, capture):
+    fd = pipe.fileno()
+    while True:
+        try:
+            chunk = os.read(fd, 65536)
+        except OSError:
+            return
+        if not chunk:
+            return
+        capture.write(chunk)
+
+
+def run_captured(command, cwd, timeout, stdout, stderr, env=None):
+    """
+    Run a shell command, streaming its output into two OutputCaptures.
+
+    Returns the exit code, or raises subprocess.TimeoutExpired after killing the
+    command's whole process group.
+    """
+    process = subprocess.Popen(
+        command,
+        shell=True,
+        cwd=cwd,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+    readers = [threading.Thread(target=_pump, args=(pipe, capture), daemon=True)
+               for pipe, capture in ((process.stdout, stdout), (process.stderr, stderr))]
+    for reader in readers:
+        reader.start()
+    deadline = time.monotonic() + timeout
+    try:
+        process.wait(timeout)
+        # Children left running in the background can keep the pipes open
+        for reader in readers:
+            reader.join(max(0, deadline - time.monotonic()))
+        if any(reader.is_alive() for reader in readers):
+            raise subprocess.TimeoutExpired(command, timeout)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        process.wait()
+        for reader in readers:
+            reader.join(1)
+        raise
+    finally:
+        if not any(reader.is_alive() for reader in readers):
+            process.stdout.close()
+            process.stderr.close()
+            stdout.close()
+            stderr.close()
+    return process.returncode
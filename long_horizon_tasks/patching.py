@@ -0,0 +1,190 @@
+"""
+Small, exact edits to text files for the agent's edit_file tool.
+
+Two ways to describe a change, so the model only sends what changes instead of
+re-emitting the whole file:
+
+    - search/replace edits: each "search" string must occur exactly once in the
+      file and is replaced by its "replace" string. Edits are located in the
+      original text and must not overlap.
+    - a unified diff: each hunk's context and removed lines must match the file,
+      at the line number the hunk header gives or the nearest place they do (so a
+      diff made against a slightly older version still applies).
+
+Anything that doesn't match raises PatchError, and nothing is changed.
+"""
+
+import difflib
+import re
+
+
+# Longest diff returned after an edit
+MAX_DIFF_CHARS = 4000
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchError(ValueError):
+    """An edit that doesn't apply cleanly to the file."""
+
+
+def _closest_line(text, search):
+    """The file line most similar to the first line of a search string, for error messages."""
+    first = next((line.strip() for line in search.splitlines() if line.strip()), "")
+    if not first:
+        return None
+    lines = [line.strip() for line in text.splitlines()]
+    matches = difflib.get_close_matches(first, lines, n=1, cutoff=0.6)
+    if not matches:
+        return None
+    return lines.index(matches[0]) + 1, matches[0]
+
+
+def apply_edits(text, edits):
+    """
+    Apply search/replace edits to text.
+
+    Args:
+        text: The original text
+        edits: A list of {"search": str, "replace": str} dicts
+
+    Returns:
+        str: The edited text
+    """
+    located = []
+    for number, edit in enumerate(edits, start=1):
+        if not isinstance(edit, dict) or not isinstance(edit.get("search"), str) \
+                or not isinstance(edit.get("replace"), str):
+            raise PatchError(f"Edit {number}: expected an object with 'search' and 'replace' strings")
+        search = edit["search"]
+        if not search:
+            raise PatchError(f"Edit {number}: 'search' is empty")
+        count = text.count(search)
+        if count == 0:
+            message = f"Edit {number}: search text not found"
+            closest = _closest_line(text, search)
+            if closest:
+                message += f" (closest line {closest[0]}: {closest[1]!r})"
+            raise PatchError(message)
+        if count > 1:
+            raise PatchError(f"Edit {number}: search text occurs {count} times; include more surrounding lines")
+        start = text.index(search)
+        located.append((start, start + len(search), edit["replace"], number))
+
+    located.sort()
+    for (_, end, _, first), (start, _, _, second) in zip(located, located[1:]):
+        if start < end:
+            raise PatchError(f"Edits {first} and {second} overlap")
+
+    parts, position = [], 0
+    for start, end, replace, _ in located:
+        parts.append(text[position:start])
+        parts.append(replace)
+        position = end
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+def _parse_hunks(diff):
+    """
+    The hunks of a unified diff, as {"start", "old", "new"}. Each hunk is read up
+    to the line counts in its header; a hunk whose lines don't add up to them is
+    rejected rather than guessed at.
+    """
+    hunks, hunk = [], None
+    lines = re.split(r"\r?\n", diff)
+    if lines and not lines[-1]:
+        lines.pop()  # the diff's final newline
+
+    def check_complete():
+        if hunk is not None and (len(hunk["old"]), len(hunk["new"])) != hunk["counts"]:
+            raise PatchError(f"Hunk {len(hunks)} has {len(hunk['old'])} old and {len(hunk['new'])} new lines, "
+                             f"but its header says {hunk['counts'][0]} and {hunk['counts'][1]}")
+
+    for index, line in enumerate(lines):
+        header = _HUNK_HEADER.match(line)
+        if header:
+            check_complete()
+            # A pure insertion ("-5,0") goes after line 5 rather than at it
+            start = int(header.group(1)) - (0 if header.group(2) == "0" else 1)
+            counts = (int(header.group(2) or 1), int(header.group(4) or 1))
+            hunk = {"start": start, "old": [], "new": [], "counts": counts}
+            hunks.append(hunk)
+        elif line.startswith("--- ") and index + 1 < len(lines) and lines[index + 1].startswith("+++ "):
+            check_complete()
+            hunk = None  # file header
+        elif hunk is None or line.startswith("\\"):
+            continue  # text before the first hunk, or "\ No newline at end of file"
+        elif (len(hunk["old"]), len(hunk["new"])) == hunk["counts"]:
+            if line.strip():
+                check_complete()
+                raise PatchError(f"Hunk {len(hunks)} has more lines than its header says")
+            # A blank line between hunks
+        elif line.startswith("-"):
+            hunk["old"].append(line[1:])
+        elif line.startswith("+"):
+            hunk["new"].append(line[1:])
+        else:
+            # Context; a blank line inside a hunk is an empty context line
+            hunk["old"].append(line[1:])
+            hunk["new"].append(line[1:])
+    check_complete()
+    if not hunks:
+        raise PatchError("No hunks found; a unified diff needs '@@ -a,b +c,d @@' headers")
+    return hunks
+
+
+def _find_block(lines, block, expected, first=0):
+    """Index where `block` occurs in `lines` at or after `first`, nearest to `expected`, or None."""
+    if not block:
+        return min(max(expected, first), len(lines))
+    candidates = [index for index in range(first, len(lines) - len(block) + 1)
+                  if lines[index] == block[0] and lines[index:index + len(block)] == block]
+    if not candidates:
+        # Tolerate trailing whitespace differences before giving up
+        stripped = [line.rstrip() for line in lines]
+        target = [line.rstrip() for line in block]
+        candidates = [index for index in range(first, len(lines) - len(block) + 1)
+                      if stripped[index:index + len(block)] == target]
+    return min(candidates, key=lambda index: abs(index - expected)) if candidates else None
+
+
+def apply_unified_diff(text, diff):
+    """
+    Apply a unified diff (one file's hunks) to text.
+
+    Hunks apply in order: each one is matched after the lines the previous hunk
+    changed, nearest the line its header gives.
+
+    Returns:
+        str: The patched text
+    """
+    newline = "\r\n" if "\r\n" in text else "\n"
+    ends_with_newline = text.endswith(newline)
+    lines = text.split(newline) if text else []
+    if ends_with_newline:
+        lines.pop()
+    offset = 0  # how far earlier hunks moved the following lines
+    first = 0  # where the previous hunk's lines end
+    for number, hunk in enumerate(_parse_hunks(diff), start=1):
+        index = _find_block(lines, hunk["old"], hunk["start"] + offset, first)
+        if index is None:
+            preview = "\n".join(hunk["old"][:5])
+            raise PatchError(f"Hunk {number} does not match the file near line {hunk['start'] + 1}"
+                             f"{' after the previous hunk' if number > 1 else ''}; expected:\n{preview}")
+        lines[index:index + len(hunk["old"])] = hunk["new"]
+        offset = index - hunk["start"] + len(hunk["new"]) - len(hunk["old"])
+        first = index + len(hunk["new"])
+    patched = newline.join(lines)
+    return patched + newline if lines and (ends_with_newline or not text) else patched
+
+
+def compact_diff(old, new, path, context=1):
+    """A unified diff of the change with little context, cut to MAX_DIFF_CHARS."""
+    diff = "".join(difflib.unified_diff(
+        old.splitlines(keepends=True), new.splitlines(keepends=True),
+        fromfile=f"a/{path}", tofile=f"b/{path}", n=context,
+    ))
+    if len(diff) > MAX_DIFF_CHARS:
+        diff = diff[:MAX_DIFF_CHARS] + f"\n[... diff truncated, {len(diff) - MAX_DIFF_CHARS} more characters]"
+    return diff
@@ -0,0 +1,258 @@
+"""
+Bookkeeping for the background processes an agent starts.
+
+execute_background_command hands its processes to a ProcessManager, which keeps
+the Popen handle, the log file and the start time of each one so the agent can
+list them, read new log output by offset, wait for a server's port and stop them.
+
+Resources are released without the agent having to ask:
+    - the parent's copy of the log file is closed as soon as the child has it
+    - a daemon thread per process waits on it, so exited processes never linger
+      as zombies and their exit code and end time are recorded
+    - close() stops everything that is still running (Agent.close() calls it)
+
+Processes started without a log file write to one in a private temporary
+directory, so their output can still be read with read_log().
+"""
+
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+
+# Most bytes a single read_log call returns
+MAX_LOG_READ_BYTES = 32 * 1024
+
+
+def _group_alive(pgid):
+    """Whether a process group still has a member (exited ones count until they are reaped)."""
+    try:
+        os.killpg(pgid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class BackgroundProcess:
+    """One process started by a ProcessManager."""
+
+    def __init__(self, command, process, log_path, log_name, opener=None):
+        self.command = command
+        self.process = process
+        self.pid = process.pid
+        self.log_path = log_path
+        self.log_name = log_name  # as reported to the model: relative path, or None for a private log
+        self.opener = opener
+        self.started = time.time()
+        self.ended = None
+        self.exit_code = None
+        self.stopped = False
+
+    @property
+    def running(self):
+        return self.ended is None
+
+    def describe(self):
+        try:
+            log_bytes = os.path.getsize(self.log_path)
+        except OSError:
+            log_bytes = 0
+        return {
+            "pid": self.pid,
+            "command": self.command,
+            "status": "running" if self.running else ("stopped" if self.stopped else "exited"),
+            "exit_code": self.exit_code,
+            "runtime_seconds": round((self.ended or time.time()) - self.started, 1),
+            "log_file": self.log_name,
+            "log_bytes": log_bytes,
+        }
+
+
+class ProcessManager:
+    """
+    Starts, tracks and stops background processes.
+
+    Args:
+        cwd: Directory processes start in
+    """
+
+    def __init__(self, cwd):
+        self.cwd = cwd
+        self._processes = {}  # pid -> BackgroundProcess
+        self._lock = threading.Lock()
+        self._log_dir = None
+
+    def _private_log(self):
+        with self._lock:
+            if self._log_dir is None:
+                self._log_dir = tempfile.mkdtemp(prefix="agent_processes_")
+        return tempfile.mkstemp(suffix=".log", dir=self._log_dir)
+
+    def start(self, command, log_path=None, log_name=None, opener=None):
+        """
+        Start a shell command in its own session with stdout and stderr going to a log.
+
+        Args:
+            command: The shell command
+            log_path: File to write the output to (default: a private temporary file)
+            log_name: How the log is reported back (e.g. the path the model asked for)
+            opener: Opener for log_path, e.g. the agent's Sandbox.opener (default: os.open)
+
+        Returns:
+            BackgroundProcess
+        """
+        if log_path is None:
+            fd, log_path = self._private_log()
+            log_file, opener = os.fdopen(fd, "wb"), None
+        else:
+            log_file = open(log_path, "wb", opener=opener)
+        with log_file:  # the child keeps its own copy of the descriptor
+            process = subprocess.Popen(
+                command,
+                shell=True,
+                cwd=self.cwd,
+                stdin=subprocess.DEVNULL,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,  # its own process group, so stop() reaches its children
+            )
+        record = BackgroundProcess(command, process, log_path, log_name, opener)
+        with self._lock:
+            self._processes[record.pid] = record
+        threading.Thread(target=self._reap, args=(record,), daemon=True).start()
+        return record
+
+    def _reap(self, record):
+        record.process.wait()
+        self._record_exit(record)
+
+    def _record_exit(self, record):
+        with self._lock:
+            if record.ended is None:
+                record.exit_code = record.process.returncode
+                record.ended = time.time()
+
+    def get(self, pid):
+        """The process started with this PID, or None."""
+        with self._lock:
+            return self._processes.get(pid)
+
+    def list(self):
+        """Descriptions of every process started so far, oldest first."""
+        with self._lock:
+            records = list(self._processes.values())
+        return [record.describe() for record in records]
+
+    def read_log(self, pid, since_offset=0, max_bytes=MAX_LOG_READ_BYTES):
+        """
+        Output a process wrote to its log from byte `since_offset` on.
+
+        Returns:
+            dict: "output", "offset" (pass it as since_offset next time), "log_bytes",
+            "truncated" (more output follows offset), "status" and "exit_code"
+        """
+        record = self.get(pid)
+        if record is None:
+            raise KeyError(pid)
+        with open(record.log_path, "rb", opener=record.opener) as file:
+            size = os.fstat(file.fileno()).st_size
+            since_offset = min(max(0, since_offset), size)
+            file.seek(since_offset)
+            data = file.read(max_bytes)
+        truncated = since_offset + len(data) < size
+        if truncated and b"\n" in data:
+            data = data[:data.rindex(b"\n") + 1]  # stop at a line end so lines (and characters) aren't split
+        status = record.describe()
+        return {
+            "output": data.decode("utf-8", errors="replace"),
+            "offset": since_offset + len(data),
+            "log_bytes": size,
+            "truncated": truncated,
+            "status": status["status"],
+            "exit_code": status["exit_code"],
+        }
+
+    def wait_for_port(self, port, host="127.0.0.1", timeout=30, pid=None, interval=0.1):
+        """
+        Wait until something accepts TCP connections on host:port.
+
+        Stops early if the process `pid` (when given) exits first.
+
+        Returns:
+            dict: "ready", "waited_seconds", and "exit_code" if the process exited
+        """
+        started = time.monotonic()
+        record = self.get(pid) if pid is not None else None
+        while True:
+            try:
+                with socket.create_connection((host, port), timeout=max(interval, 0.5)):
+                    return {"ready": True, "waited_seconds": round(time.monotonic() - started, 2)}
+            except OSError:
+                pass
+            waited = time.monotonic() - started
+            if record is not None and not record.running:
+                return {"ready": False, "waited_seconds": round(waited, 2), "exit_code": record.exit_code}
+            if waited >= timeout:
+                return {"ready": False, "waited_seconds": round(waited, 2)}
+            time.sleep(interval)
+
+    def stop(self, pid, timeout=5):
+        """
+        Stop a process and its children: SIGTERM to its process group, then SIGKILL
+        if anything in the group is still running after `timeout` seconds.
+
+        Returns:
+            dict: the process's description after stopping
+        """
+        record = self.get(pid)
+        if record is None:
+            raise KeyError(pid)
+        if record.running:
+            record.stopped = True
+        for sig, grace in ((signal.SIGTERM, timeout), (signal.SIGKILL, 5)):
+            if self._group_stopped(record, 0):
+                break
+            try:
+                os.killpg(record.pid, sig)
+            except (ProcessLookupError, PermissionError):
+                pass
+            if self._group_stopped(record, grace):
+                break
+        return record.describe()
+
+    def _group_stopped(self, record, timeout):
+        deadline = time.monotonic() + timeout
+        try:
+            record.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            return False
+        self._record_exit(record)
+        # The shell can exit before the server it started, so wait for the whole
+        # group, polling less and less often
+        delay = 0.01
+        while _group_alive(record.pid):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.25)
+        return True
+
+    def close(self):
+        """Stop every running process and remove the private logs."""
+        with self._lock:
+            records = list(self._processes.values())
+        for record in records:
+            if record.running or _group_alive(record.pid):
+                self.stop(record.pid, timeout=1)
+        with self._lock:
+            if self._log_dir is not None:
+                shutil.rmtree(self._log_dir, ignore_errors=True)
+                self._log_dir = None
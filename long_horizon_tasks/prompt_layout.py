@@ -0,0 +1,115 @@
+"""
+Cache-friendly request assembly for the agent's model calls.
+
+Provider-side prompt caching reuses work for the longest prefix a request shares with
+an earlier one, in the order tools -> instructions -> input. To keep that prefix
+long, every request is laid out the same way:
+
+    tools | system message (with the tool list) | conversation | phase instruction
+
+The per-phase instruction ("Determine a plan...", "Respond with the results...") only
+ever goes at the end, instead of re-sending the system prompt with each phase or
+switching the `instructions` parameter between calls.
+
+PromptLayout also estimates, for each call, how many input tokens are shared with the
+previous request and are therefore prefix-cacheable.
+"""
+
+import json
+
+from context_compaction import CHARS_PER_TOKEN, serialize_item
+
+
+# Providers only cache prefixes of at least this many tokens, in fixed increments
+MIN_CACHEABLE_TOKENS = 1024
+CACHE_INCREMENT_TOKENS = 128
+
+
+class PromptLayout:
+    """
+    Builds request arguments with a fixed prefix and records prefix statistics.
+
+    Attributes:
+        calls: One stats dict per request built, in order
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.calls = []
+        self._previous_segments = []
+        self._tools_segment = None
+        self._tools_list = None
+
+    def build(self, tools, memory, instruction=None):
+        """
+        Assemble the keyword arguments for responses.create.
+
+        Args:
+            tools: The tool schemas (the same list on every call)
+            memory: The conversation, starting with the system message
+            instruction: Optional per-phase instruction, appended after the
+                conversation as a developer message that is not kept in memory
+        """
+        input_items = list(memory)
+        if instruction:
+            input_items.append({"role": "developer", "content": instruction})
+        return {"model": self.model, "tools": tools, "input": input_items}
+
+    def measure(self, request):
+        """
+        Estimate the size of a request and how much of it repeats the previous one.
+
+        Returns:
+            dict: input_chars (the serialized size), input_tokens, prefix_tokens (shared with the previous request),
+            cacheable_tokens (the part of that prefix a provider would cache) and
+            prefix_items (leading input items shared with the previous request)
+        """
+        if self._tools_list is not request["tools"]:
+            self._tools_list = request["tools"]
+            self._tools_segment = json.dumps(request["tools"], sort_keys=True)
+        segments = [self._tools_segment] + [serialize_item(item) for item in request["input"]]
+
+        prefix_chars = 0
+        prefix_items = 0
+        for index, segment in enumerate(segments):
+            if index >= len(self._previous_segments) or self._previous_segments[index] != segment:
+                break
+            prefix_chars += len(segment)
+            if index > 0:
+                prefix_items += 1
+
+        prefix_tokens = prefix_chars // CHARS_PER_TOKEN
+        if prefix_tokens >= MIN_CACHEABLE_TOKENS:
+            cacheable_tokens = prefix_tokens - prefix_tokens % CACHE_INCREMENT_TOKENS
+        else:
+            cacheable_tokens = 0
+
+        self._previous_segments = segments
+        input_chars = sum(len(segment) for segment in segments)
+        stats = {
+            "input_chars": input_chars,
+            "input_tokens": input_chars // CHARS_PER_TOKEN,
+            "prefix_tokens": prefix_tokens,
+            "cacheable_tokens": cacheable_tokens,
+            "prefix_items": prefix_items,
+        }
+        self.calls.append(stats)
+        return stats
+
+    def record_usage(self, stats, response):
+        """Add the provider's own input/cached token counts to a call's stats, when reported."""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return stats
+        stats["usage_input_tokens"] = getattr(usage, "input_tokens", None)
+        details = getattr(usage, "input_tokens_details", None)
+        stats["usage_cached_tokens"] = getattr(details, "cached_tokens", None) if details else None
+        return stats
+
+    def totals(self):
+        """Summed estimates over every call so far."""
+        return {
+            "calls": len(self.calls),
+            "input_tokens": sum(call["input_tokens"] for call in self.calls),
+            "cacheable_tokens": sum(call["cacheable_tokens"] for call in self.calls),
+        }
@@ -0,0 +1,45 @@
+"""
+pytest plugin for pytest_runner.run_pytest(), loaded with -p agent_pytest_report.
+
+Writes one JSON line per test phase report (and per failed collection) to the file
+named by AGENT_PYTEST_REPORT. It runs inside the project's own pytest process, so
+it only imports the standard library, and it is alone in its directory, which is
+the only one run_pytest() puts on the project's PYTHONPATH.
+"""
+
+import json
+import os
+
+
+# Keep in step with pytest_runner.REPORT_ENV
+REPORT_ENV = "AGENT_PYTEST_REPORT"
+
+
+def _record(entry):
+    path = os.environ.get(REPORT_ENV)
+    if path:
+        with open(path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry) + "\n")
+
+
+def pytest_runtest_logreport(report):
+    outcome = report.outcome
+    if hasattr(report, "wasxfail"):
+        outcome = "skipped" if report.skipped else "passed"  # xfailed, or a non-strict xpass
+    elif report.when != "call" and report.failed:
+        outcome = "error"  # a fixture failed in setup or teardown
+    elif report.when != "call" and not report.skipped:
+        return  # setup and teardown that passed
+    entry = {"test": report.nodeid, "when": report.when, "outcome": outcome,
+             "duration": round(report.duration, 4)}
+    if report.failed:
+        entry["message"] = report.longreprtext
+    elif report.skipped and isinstance(report.longrepr, tuple):
+        entry["message"] = report.longrepr[2]
+    _record(entry)
+
+
+def pytest_collectreport(report):
+    if report.failed:
+        _record({"test": report.nodeid, "when": "collect", "outcome": "error", "duration": 0,
+                 "message": report.longreprtext})
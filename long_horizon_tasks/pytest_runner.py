@@ -0,0 +1,155 @@
+"""
+Structured pytest results for the agent's run_tests tool.
+
+run_pytest() runs pytest in a subprocess (so every run imports the code under test
+afresh, and a hanging test can be killed) with pytest_plugin/agent_pytest_report.py
+loaded as a plugin. The plugin writes one JSON line per test phase report to the
+file named by AGENT_PYTEST_REPORT, and run_pytest() turns those into counts,
+failures with their short tracebacks, and the slowest tests, instead of making the
+model parse pytest's terminal output.
+
+pytest runs under the interpreter `python` names in the given environment (the
+agent passes its shell session's PATH and VIRTUAL_ENV), so tests run against
+the project's virtualenv rather than the one the agent itself runs in.
+
+Only the plugin's own directory is put on the project's PYTHONPATH, so none of the
+agent's modules can shadow the project's imports.
+"""
+
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from output_capture import OutputCapture, run_captured
+
+
+# The plugin reads the report path from this variable
+REPORT_ENV = "AGENT_PYTEST_REPORT"
+
+# The plugin's directory (alone, so nothing else of the agent's becomes importable) and module
+PLUGIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pytest_plugin")
+PLUGIN = "agent_pytest_report"
+
+# Most failures returned, and the most characters of each one's traceback
+MAX_FAILURES = 20
+MAX_FAILURE_CHARS = 2000
+
+
+# Outcome that wins when a test reports more than once (e.g. passed, then errored in teardown)
+_SEVERITY = {"passed": 0, "skipped": 1, "failed": 2, "error": 3}
+
+
+def _summarize(entries):
+    tests = {}
+    for entry in entries:
+        test = tests.setdefault(entry["test"], {"outcome": "passed", "duration": 0.0})
+        test["duration"] += entry["duration"]
+        if _SEVERITY[entry["outcome"]] >= _SEVERITY[test["outcome"]]:
+            test["outcome"] = entry["outcome"]
+            if "message" in entry:
+                test["message"] = entry["message"]
+                test["when"] = entry["when"]
+    return tests
+
+
+def _short(message):
+    # The assertion and the line that failed are at the end of the traceback
+    if len(message) <= MAX_FAILURE_CHARS:
+        return message
+    return "...\n" + message[-MAX_FAILURE_CHARS:]
+
+
+def find_python(env):
+    """
+    The interpreter `python` starts in environment `env`: the active virtualenv's,
+    else the first python (or python3) on its PATH, else this process's.
+    """
+    virtual_env = env.get("VIRTUAL_ENV")
+    if virtual_env:
+        for name in (os.path.join("bin", "python"), os.path.join("Scripts", "python.exe")):
+            candidate = os.path.join(virtual_env, name)
+            if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+                return candidate
+    path = env.get("PATH", os.defpath)
+    return shutil.which("python", path=path) or shutil.which("python3", path=path) or sys.executable
+
+
+def run_pytest(cwd, targets=(), keyword=None, failed_first=True, timeout=600, env=None):
+    """
+    Run pytest in `cwd` and collect structured results.
+
+    Args:
+        cwd: Directory to run pytest in (its configuration picks the default tests)
+        targets: Test files, directories or node IDs (default: pytest's own default)
+        keyword: A -k expression
+        failed_first: Run the tests that failed last time first (pytest's --ff)
+        timeout: Seconds before the run is killed
+        env: Environment to run pytest in, and to find its interpreter in (default: this process's)
+
+    Returns:
+        dict: python (the interpreter used), exit_code, passed, failed, errors, skipped, duration_seconds,
+        failures ({"test", "phase", "message"}), slowest ({"test", "seconds"}), and
+        "output" (the end of pytest's output) when no test results were reported
+    """
+    fd, report_path = tempfile.mkstemp(prefix="pytest_report_", suffix=".jsonl")
+    os.close(fd)
+    env = dict(env if env is not None else os.environ, **{REPORT_ENV: report_path})
+    python = find_python(env)
+    command = [python, "-m", "pytest", "-p", PLUGIN, "-q", "--tb=short", "-o",
+               "console_output_style=classic"]
+    if failed_first:
+        command.append("--ff")
+    if keyword:
+        command += ["-k", keyword]
+    command += list(targets)
+
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [PLUGIN_DIR, env.get("PYTHONPATH")]))
+    stdout, stderr = OutputCapture(head_bytes=1024, tail_bytes=3072), OutputCapture(head_bytes=1024, tail_bytes=3072)
+    started = time.monotonic()
+    try:
+        exit_code = run_captured(shlex.join(command), cwd, timeout, stdout, stderr, env=env)
+        timed_out = False
+    except subprocess.TimeoutExpired:
+        exit_code, timed_out = None, True
+    duration = time.monotonic() - started
+
+    try:
+        with open(report_path, encoding="utf-8") as file:
+            entries = [json.loads(line) for line in file if line.strip()]
+    finally:
+        os.remove(report_path)
+    tests = _summarize(entries)
+
+    counts = {"passed": 0, "failed": 0, "error": 0, "skipped": 0}
+    for test in tests.values():
+        counts[test["outcome"]] += 1
+    failures = [
+        {"test": name, "phase": test.get("when", "call"), "message": _short(test.get("message", ""))}
+        for name, test in tests.items() if test["outcome"] in ("failed", "error")
+    ]
+    slowest = sorted(tests.items(), key=lambda item: item[1]["duration"], reverse=True)[:5]
+
+    result = {
+        "python": python,
+        "exit_code": exit_code,
+        "passed": counts["passed"],
+        "failed": counts["failed"],
+        "errors": counts["error"],
+        "skipped": counts["skipped"],
+        "duration_seconds": round(duration, 2),
+        "failures": failures[:MAX_FAILURES],
+        "slowest": [{"test": name, "seconds": round(test["duration"], 3)} for name, test in slowest],
+    }
+    if len(failures) > MAX_FAILURES:
+        result["failures_omitted"] = len(failures) - MAX_FAILURES
+    if timed_out:
+        result["error"] = f"Test run timed out after {timeout} seconds"
+    if not tests or timed_out:
+        # Usage errors, no tests collected, or a hang: pytest's own output says why
+        result["output"] = (stdout.text() + stderr.text())[-4000:]
+    return result
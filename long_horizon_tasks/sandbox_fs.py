@@ -0,0 +1,271 @@
+"""
+File operations confined to the agent's working directory.
+
+Checking a path with os.path.realpath costs a system call per path component on
+every file operation, and it only checks the path: whatever the file system looks
+like a moment later, when the file is actually opened, is what the operation gets.
+A Sandbox resolves the root once and keeps it open, and then:
+
+    - resolve() checks a path without re-examining the directories it has already
+      validated (a small cache of open directory descriptors, keyed by real path);
+      only the uncached directories are opened, and the final component is looked
+      at with one lstat relative to its directory
+    - open(), listdir(), makedirs(), rename() and replace() work relative to those
+      directory descriptors and never follow a symlink (O_NOFOLLOW), so a
+      directory swapped for a symlink after validation is noticed instead of
+      followed. The path is then resolved again, which follows the symlink only if
+      it stays inside the root.
+
+Symlinks that stay inside the root keep working: resolve() returns the real path
+they point to, as realpath would.
+
+The cached descriptors stay on the directories they were opened on, so each one
+is checked before use: if the path no longer leads to that directory (something
+else deleted, recreated or moved it), the entry is dropped and the path walked
+again. invalidate() drops the whole cache at once (the agent does this after
+every command and move).
+
+Platforms without dir_fd support for os.open fall back to plain path operations.
+"""
+
+import errno
+import os
+import stat
+import threading
+from collections import OrderedDict
+
+
+# Open directory descriptors kept for validated directories
+MAX_CACHED_DIRECTORIES = 256
+
+HAVE_DIR_FD = ({os.open, os.mkdir, os.rename, os.unlink} <= os.supports_dir_fd
+               and hasattr(os, "O_NOFOLLOW") and hasattr(os, "O_DIRECTORY"))
+
+_DIRECTORY_FLAGS = os.O_RDONLY | getattr(os, "O_DIRECTORY", 0) | getattr(os, "O_NOFOLLOW", 0) \
+    | getattr(os, "O_CLOEXEC", 0)
+
+
+class SandboxError(PermissionError):
+    """A path that is, or has become, outside the sandbox root."""
+
+
+class Sandbox:
+    """
+    Resolves and opens paths inside `root`, which is resolved once.
+
+    Args:
+        root: The directory operations are confined to
+        max_cached_directories: Most validated directories kept open
+    """
+
+    def __init__(self, root, max_cached_directories=MAX_CACHED_DIRECTORIES):
+        self.root = os.path.realpath(root)
+        self.max_cached_directories = max_cached_directories
+        self.root_fd = os.open(self.root, _DIRECTORY_FLAGS) if HAVE_DIR_FD else None
+        self._directories = OrderedDict()  # real path -> open descriptor
+        self._lock = threading.Lock()
+        self.stats = {"resolved": 0, "cache_hits": 0, "opened": 0, "fallbacks": 0, "stale": 0}
+
+    def contains(self, path):
+        return path == self.root or path.startswith(os.path.join(self.root, ""))
+
+    def _check(self, real_path, path):
+        if not self.contains(real_path):
+            raise SandboxError(f"Path '{path}' is outside allowed directory '{self.root}'")
+        return real_path
+
+    def _cached(self, directory):
+        """
+        The nearest validated directory at or above `directory` (always under the root)
+        that is still at its path. Call with the lock held.
+        """
+        while directory != self.root:
+            if directory in self._directories:
+                if self._is_current(directory):
+                    return directory
+                os.close(self._directories.pop(directory))
+                self.stats["stale"] += 1
+            directory = os.path.dirname(directory)
+        return directory
+
+    def _is_current(self, directory):
+        """Whether the cached descriptor for `directory` is still on the directory at that path."""
+        try:
+            cached = os.fstat(self._directories[directory])
+            current = os.lstat(directory)
+        except OSError:
+            return False
+        return (cached.st_dev, cached.st_ino) == (current.st_dev, current.st_ino)
+
+    def resolve(self, path):
+        """
+        The real absolute path `path` refers to.
+
+        Raises:
+            SandboxError: If it is outside the root
+        """
+        self.stats["resolved"] += 1
+        absolute = os.path.normpath(path if os.path.isabs(path) else os.path.join(self.root, path))
+        if not HAVE_DIR_FD or not self.contains(absolute):
+            # Possibly a symlink elsewhere that points back in
+            return self._follow(absolute, path)
+        if absolute == self.root:
+            return absolute
+
+        parent, name = os.path.split(absolute)
+        try:
+            descriptor = self._directory_fd(parent)
+        except FileNotFoundError:
+            return absolute  # nothing below here exists yet, so nothing can be a symlink
+        except OSError as error:
+            if error.errno not in (errno.ELOOP, errno.ENOTDIR):
+                raise
+            return self._follow(absolute, path)  # a symlink (or a file) on the way
+        try:
+            mode = os.lstat(name, dir_fd=descriptor).st_mode
+        except FileNotFoundError:
+            return absolute
+        finally:
+            os.close(descriptor)
+        return self._follow(absolute, path) if stat.S_ISLNK(mode) else absolute
+
+    def _follow(self, absolute, path):
+        self.stats["fallbacks"] += 1
+        return self._check(os.path.realpath(absolute), path)
+
+    def invalidate(self):
+        """Forget every validated directory (after the tree may have changed outside the sandbox)."""
+        with self._lock:
+            descriptors = list(self._directories.values())
+            self._directories.clear()
+        for descriptor in descriptors:
+            os.close(descriptor)
+
+    def _remember(self, directory, descriptor):
+        with self._lock:
+            if directory in self._directories:
+                return
+            self._directories[directory] = os.dup(descriptor)
+            while len(self._directories) > self.max_cached_directories:
+                os.close(self._directories.popitem(last=False)[1])
+
+    def _directory_fd(self, directory):
+        """A new descriptor for `directory`, a real path inside the root, opened without following symlinks."""
+        with self._lock:
+            known = self._cached(directory)
+            if known != self.root:
+                self._directories.move_to_end(known)
+            descriptor = os.dup(self.root_fd if known == self.root else self._directories[known])
+        if known == directory:
+            self.stats["cache_hits"] += 1
+            return descriptor
+        current = known
+        try:
+            for part in os.path.relpath(directory, known).split(os.sep):
+                child = os.open(part, _DIRECTORY_FLAGS, dir_fd=descriptor)
+                self.stats["opened"] += 1
+                os.close(descriptor)
+                descriptor = child
+                current = os.path.join(current, part)
+                self._remember(current, descriptor)
+        except BaseException:
+            os.close(descriptor)
+            raise
+        return descriptor
+
+    def _at(self, path, operation):
+        """
+        Run operation(parent_fd, name) for `path`. Walking to it with O_NOFOLLOW is
+        itself the check for a path that is lexically inside the root; if a
+        component turns out to be a symlink, the path is resolved (which fails if
+        the symlink leads outside) and tried once more.
+        """
+        real_path = os.path.normpath(path if os.path.isabs(path) else os.path.join(self.root, path))
+        if not self.contains(real_path):
+            real_path = self.resolve(path)
+        for attempt in range(2):
+            if real_path == self.root:
+                raise IsADirectoryError(errno.EISDIR, "Is the sandbox root", path)
+            parent, name = os.path.split(real_path)
+            try:
+                parent_fd = self._directory_fd(parent)
+                try:
+                    return operation(parent_fd, name)
+                finally:
+                    os.close(parent_fd)
+            except OSError as error:
+                if attempt or error.errno not in (errno.ELOOP, errno.ENOTDIR):
+                    raise
+                # A symlink on the way: drop directories that may have been swapped, and follow it if it stays inside
+                self.invalidate()
+                real_path = self._follow(real_path, path)
+
+    def open(self, path, flags=os.O_RDONLY, mode=0o666):
+        """os.open for a path inside the root; the descriptor never reaches outside it."""
+        if not HAVE_DIR_FD:
+            return os.open(self.resolve(path), flags, mode)
+        return self._at(path, lambda parent_fd, name: os.open(
+            name, flags | os.O_NOFOLLOW | os.O_CLOEXEC, mode, dir_fd=parent_fd))
+
+    def opener(self, path, flags):
+        """For open(path, mode, opener=sandbox.opener)."""
+        return self.open(path, flags)
+
+    def listdir(self, path):
+        if not HAVE_DIR_FD:
+            return os.listdir(self.resolve(path))
+        real_path = self.resolve(path)
+        if real_path == self.root:
+            descriptor = os.dup(self.root_fd)
+        else:
+            descriptor = self.open(real_path, _DIRECTORY_FLAGS)
+        try:
+            return os.listdir(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def makedirs(self, path):
+        """Create `path` and any missing parents, like os.makedirs(exist_ok=True)."""
+        real_path = self.resolve(path)
+        if not HAVE_DIR_FD:
+            os.makedirs(real_path, exist_ok=True)
+            return
+        try:
+            os.close(self._directory_fd(real_path))
+            return
+        except FileNotFoundError:
+            pass
+        current = self.root
+        for part in os.path.relpath(real_path, self.root).split(os.sep):
+            current = os.path.join(current, part)
+            try:
+                self._at(current, lambda parent_fd, name: os.mkdir(name, dir_fd=parent_fd))
+            except FileExistsError:
+                pass
+        os.close(self._directory_fd(real_path))  # fails if a file was in the way
+
+    def rename(self, source, destination, replace=False):
+        """Move `source` to `destination`; with replace, an existing destination file is overwritten."""
+        move = os.replace if replace else os.rename
+        if not HAVE_DIR_FD:
+            move(self.resolve(source), self.resolve(destination))
+            return
+        self._at(source, lambda source_fd, source_name: self._at(
+            destination, lambda destination_fd, destination_name: move(
+                source_name, destination_name, src_dir_fd=source_fd, dst_dir_fd=destination_fd)))
+
+    def replace(self, source, destination):
+        self.rename(source, destination, replace=True)
+
+    def remove(self, path):
+        if not HAVE_DIR_FD:
+            os.remove(self.resolve(path))
+            return
+        self._at(path, lambda parent_fd, name: os.unlink(name, dir_fd=parent_fd))
+
+    def close(self):
+        self.invalidate()
+        if self.root_fd is not None:
+            os.close(self.root_fd)
+            self.root_fd = None
+
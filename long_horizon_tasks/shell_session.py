@@ -0,0 +1,265 @@
+"""
+A persistent bash session for the agent's execute_command tool.
+
+One long-lived bash process runs every command, so `cd`, exported variables and an
+activated virtualenv carry over from one call to the next, and there is no shell
+startup cost per call. Each command is framed by a random sentinel that the shell
+prints (with the exit code and current directory) on stdout and stderr once it
+finishes:
+
+    eval $'<command, escaped>' < /dev/null
+    printf '%s %d %s\\n' SENTINEL "$?" "$PWD"; printf '%s\\n' SENTINEL >&2
+
+If a command times out, its whole process group (the shell included) is killed. If
+a command exits the shell, the exit code is reported. Either way the next command
+starts a fresh shell in the last known directory, so state is lost but the session
+recovers on its own.
+"""
+
+import os
+import signal
+import subprocess
+import threading
+import time
+import uuid
+import weakref
+
+from output_capture import OutputCapture
+
+
+# Bytes passed through unescaped when a command is quoted for the shell
+_SAFE_BYTES = frozenset(b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 _-./:=,+@%")
+
+
+def ansi_c_quote(text):
+    """Quote text as a bash $'...' string, escaping every byte that isn't plainly safe."""
+    return "$'" + "".join(
+        chr(byte) if byte in _SAFE_BYTES else f"\\x{byte:02x}" for byte in text.encode("utf-8")
+    ) + "'"
+
+
+def _kill_group(process):
+    if process.poll() is None:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        process.wait()
+
+
+class _StreamReader:
+    """
+    Reads a pipe on a daemon thread, passing the current command's output to its
+    capture until the command's sentinel arrives.
+    """
+
+    def __init__(self, pipe, condition):
+        self.eof = False
+        self.done = False        # the current command's sentinel has arrived
+        self.status = bytearray()  # what follows the sentinel
+        self._capture = None
+        self._token = b""
+        self._pending = b""      # bytes that may be the start of the sentinel
+        self._pipe = pipe
+        self._condition = condition
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def expect(self, token, capture):
+        """Send output to `capture` until `token` arrives. Call with the condition held."""
+        self._token = token
+        self._capture = capture
+        self._pending = b""
+        self.done = False
+        self.status.clear()
+
+    def flush(self):
+        """Hand held-back bytes to the capture (the sentinel is not coming). Call with the condition held."""
+        if self._capture is not None and not self.done:
+            self._capture.write(self._pending)
+            self._pending = b""
+        self._capture = None
+
+    def _feed(self, chunk):
+        if self.done:
+            if b"\n" not in self.status:
+                self.status += chunk
+            return
+        if self._capture is None:
+            return  # printed between commands (e.g. by a job left running with &)
+        data = self._pending + chunk
+        index = data.find(self._token)
+        if index >= 0:
+            self._capture.write(data[:index])
+            self._pending = b""
+            self.status += data[index + len(self._token):]
+            self.done = True
+            return
+        # Hold back a tail that could be the start of a sentinel split across reads
+        split = max(0, len(data) - len(self._token) + 1)
+        self._capture.write(data[:split])
+        self._pending = data[split:]
+
+    def _read(self):
+        fd = self._pipe.fileno()
+        while True:
+            try:
+                chunk = os.read(fd, 65536)
+            except OSError:
+                chunk = b""
+            with self._condition:
+                if chunk:
+                    self._feed(chunk)
+                else:
+                    self.eof = True
+                self._condition.notify_all()
+            if not chunk:
+                return
+
+
+class ShellSession:
+    """
+    A long-lived bash process that runs one command at a time.
+
+    Args:
+        cwd: Directory the shell starts in (and restarts in if `cwd` is lost)
+        shell: The bash executable
+        env: Environment for the shell (default: this process's)
+    """
+
+    def __init__(self, cwd, shell="/bin/bash", env=None):
+        self.root = os.path.realpath(cwd)
+        self.cwd = self.root
+        self.shell = shell
+        self.env = env
+        self.process = None
+        self.restarts = 0
+        self._state_lost = False
+        self._lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._finalizer = None
+
+    def _start(self):
+        start_in = self.cwd if os.path.isdir(self.cwd) else self.root
+        self.process = subprocess.Popen(
+            [self.shell, "--noprofile", "--norc"],
+            cwd=start_in,
+            env=self.env,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0,
+            start_new_session=True,  # its own process group, so a timeout can kill everything it started
+        )
+        self.cwd = start_in
+        self._stdout = _StreamReader(self.process.stdout, self._condition)
+        self._stderr = _StreamReader(self.process.stderr, self._condition)
+        self._finalizer = weakref.finalize(self, _kill_group, self.process)
+
+    def _stop(self):
+        if self.process is not None:
+            _kill_group(self.process)
+            for pipe in (self.process.stdin, self.process.stdout, self.process.stderr):
+                pipe.close()
+            self._finalizer.detach()
+            self.process = None
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def run(self, command, timeout=30, stdout=None, stderr=None, wait=True):
+        """
+        Run a command in the session and wait for it to finish.
+
+        Args:
+            command: The shell command
+            timeout: Seconds before the command (and the shell) is killed
+            stdout: OutputCapture for the command's stdout (default: a new one)
+            stderr: OutputCapture for the command's stderr (default: a new one)
+            wait: If False and another command is running, return None at once
+                instead of waiting for the session
+
+        Returns:
+            dict: exit_code, stdout, stderr (the captures), cwd (the shell's directory
+            afterwards), timed_out, and restarted (the previous shell died or timed
+            out, so this command ran in a fresh one without earlier cd/export
+            state, apart from the directory); or None (see `wait`)
+        """
+        if not self._lock.acquire(blocking=wait):
+            return None
+        try:
+            return self._run(command, timeout,
+                             stdout if stdout is not None else OutputCapture(),
+                             stderr if stderr is not None else OutputCapture())
+        finally:
+            self._lock.release()
+
+    def _run(self, command, timeout, stdout, stderr):
+        if not self.alive:
+            if self.process is not None:
+                # Died between commands (killed from outside, or a job ended it)
+                self._stop()
+                self._state_lost = True
+            self._start()
+        restarted, self._state_lost = self._state_lost, False
+        if restarted:
+            self.restarts += 1
+
+        sentinel = f"__AGENT_SHELL_{uuid.uuid4().hex}__"
+        script = (
+            f"eval {ansi_c_quote(command)} < /dev/null\n"
+            f"printf '%s %d %s\\n' '{sentinel}' \"$?\" \"$PWD\"\n"
+            f"printf '%s\\n' '{sentinel}' >&2\n"
+        )
+        token = sentinel.encode()
+        with self._condition:
+            self._stdout.expect(token, stdout)
+            self._stderr.expect(token, stderr)
+        try:
+            self.process.stdin.write(script.encode("utf-8"))
+        except (BrokenPipeError, OSError):
+            pass  # the shell is gone; reported below as an exit
+
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                # stdout's sentinel is followed by the status line
+                if self._stdout.done and b"\n" in self._stdout.status and self._stderr.done:
+                    break
+                if self._stdout.eof and self._stderr.eof:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            finished = self._stdout.done and b"\n" in self._stdout.status and self._stderr.done
+            status = bytes(self._stdout.status)
+            self._stdout.flush()
+            self._stderr.flush()
+
+        result = {"exit_code": None, "timed_out": False, "restarted": restarted}
+        if finished:
+            exit_code, _, cwd = status.split(b"\n", 1)[0].strip().partition(b" ")
+            result["exit_code"] = int(exit_code)
+            self.cwd = cwd.decode("utf-8", errors="replace") or self.cwd
+        elif self._stdout.eof and self._stderr.eof:
+            # The command ended the shell (e.g. `exit 3`)
+            result["exit_code"] = self.process.wait()
+            self._stop()
+            self._state_lost = True
+        else:
+            result["timed_out"] = True
+            self._stop()
+            self._state_lost = True
+
+        stdout.close()
+        stderr.close()
+        result["stdout"] = stdout
+        result["stderr"] = stderr
+        result["cwd"] = self.cwd
+        return result
+
+    def close(self):
+        """Kill the shell and everything it started."""
+        with self._lock:
+            self._stop()
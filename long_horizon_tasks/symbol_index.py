@@ -0,0 +1,239 @@
+"""
+Symbol table of the Python files in the agent's working directory.
+
+Each .py file is parsed with ast into its definitions (classes, functions, methods
+and module-level assignments, with compact signatures and line ranges) and the
+names it references. Files are cached by mtime and size, and a changed mtime only
+triggers a re-parse when the content hash changed too, so lookups after the first
+one cost a stat walk and a dict scan instead of reading whole modules.
+"""
+
+import ast
+import hashlib
+
+from code_search import WorkspaceIndex
+
+
+# Longest signature returned; longer ones are cut with "..."
+MAX_SIGNATURE_CHARS = 200
+
+
+def _signature(node):
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(base) for base in node.bases]
+        bases += [ast.unparse(keyword) for keyword in node.keywords]
+        return f"class {node.name}({', '.join(bases)})" if bases else f"class {node.name}"
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    signature = f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+    decorators = [f"@{ast.unparse(decorator)}" for decorator in node.decorator_list]
+    return " ".join(decorators + [signature])
+
+
+def _summary(node):
+    docstring = ast.get_docstring(node)
+    return docstring.strip().splitlines()[0] if docstring else None
+
+
+class _Collector(ast.NodeVisitor):
+    def __init__(self):
+        self.definitions = []
+        self.references = {}  # name -> sorted line numbers
+        self._scope = []        # enclosing names
+        self._scope_kinds = []  # "class" or "function" for each of them
+
+    def _reference(self, name, line):
+        self.references.setdefault(name, []).append(line)
+
+    def _define(self, node, kind):
+        qualname = ".".join(self._scope + [node.name])
+        signature = _signature(node)
+        if len(signature) > MAX_SIGNATURE_CHARS:
+            signature = signature[:MAX_SIGNATURE_CHARS - 3] + "..."
+        entry = {
+            "name": node.name,
+            "qualname": qualname,
+            "kind": kind,
+            "line": node.lineno,
+            "end_line": node.end_lineno,
+            "signature": signature,
+        }
+        summary = _summary(node)
+        if summary:
+            entry["doc"] = summary
+        self.definitions.append(entry)
+
+    def visit_ClassDef(self, node):
+        self._define(node, "class")
+        for decorator in node.decorator_list + node.bases:
+            self.visit(decorator)
+        self._visit_body(node, "class")
+
+    def _visit_body(self, node, kind):
+        self._scope.append(node.name)
+        self._scope_kinds.append(kind)
+        for child in node.body:
+            self.visit(child)
+        self._scope.pop()
+        self._scope_kinds.pop()
+
+    def visit_FunctionDef(self, node):
+        in_class = bool(self._scope_kinds) and self._scope_kinds[-1] == "class"
+        self._define(node, "method" if in_class else "function")
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        self.visit(node.args)
+        if node.returns:
+            self.visit(node.returns)
+        self._visit_body(node, "function")
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Assign(self, node):
+        if not self._scope:
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if isinstance(target, ast.Name):
+                    self.definitions.append({
+                        "name": target.id,
+                        "qualname": target.id,
+                        "kind": "variable",
+                        "line": node.lineno,
+                        "end_line": node.end_lineno,
+                        "signature": f"{target.id} = ...",
+                    })
+        self.generic_visit(node)
+
+    visit_AnnAssign = visit_Assign
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self._reference(node.id, node.lineno)
+
+    def visit_Attribute(self, node):
+        self._reference(node.attr, node.lineno)
+        self.generic_visit(node)
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            self._reference(alias.name, node.lineno)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self._reference(alias.name.split(".")[-1], node.lineno)
+
+
+class SymbolIndex(WorkspaceIndex):
+    """
+    Definitions and references of every Python file under `root`.
+
+    Args:
+        root: The directory to index
+        max_staleness: Seconds after which a lookup re-checks file mtimes
+    """
+
+    def __init__(self, root, max_staleness=2.0):
+        super().__init__(root, max_staleness)
+        self._files = {}  # path -> (mtime_ns, size, sha1, definitions, references, error)
+        self.stats["parsed"] = 0
+
+    def wants(self, path):
+        return path.endswith(".py")
+
+    def _remove(self, path):
+        self._files.pop(path, None)
+
+    def _index_file(self, path, stat):
+        try:
+            with open(path, "rb") as file:
+                source = file.read()
+        except OSError:
+            self._remove(path)
+            return
+        digest = hashlib.sha1(source).hexdigest()
+        known = self._files.get(path)
+        if known is not None and known[2] == digest:
+            # Touched but unchanged: keep the parsed symbols
+            self._files[path] = (stat.st_mtime_ns, stat.st_size) + known[2:]
+            return
+
+        collector = _Collector()
+        error = None
+        try:
+            collector.visit(ast.parse(source, filename=path))
+        except (SyntaxError, ValueError) as exception:
+            error = f"{type(exception).__name__}: {exception}"
+        references = {name: sorted(set(lines)) for name, lines in collector.references.items()}
+        self._files[path] = (stat.st_mtime_ns, stat.st_size, digest, collector.definitions, references, error)
+        self.stats["indexed"] += 1
+        self.stats["parsed"] += 1
+
+    def _relative(self, path):
+        return path[len(self.root) + 1:]
+
+    def find_symbol(self, name, kind=None, limit=20):
+        """
+        Definitions whose name or qualified name is `name` (e.g. "connect" or
+        "Database.connect"), or ends with ".name".
+
+        Returns:
+            list: {"path", "qualname", "kind", "lines", "signature"[, "doc"]} entries,
+            classes and functions before variables
+        """
+        with self._lock:
+            self.refresh()
+            matches = []
+            for path in sorted(self._files):
+                for definition in self._files[path][3]:
+                    if kind and definition["kind"] != kind:
+                        continue
+                    qualname = definition["qualname"]
+                    if name in (definition["name"], qualname) or qualname.endswith("." + name):
+                        entry = {
+                            "path": self._relative(path),
+                            "qualname": qualname,
+                            "kind": definition["kind"],
+                            "lines": f"{definition['line']}-{definition['end_line']}",
+                            "signature": definition["signature"],
+                        }
+                        if "doc" in definition:
+                            entry["doc"] = definition["doc"]
+                        matches.append(entry)
+        matches.sort(key=lambda entry: entry["kind"] == "variable")
+        return matches[:limit]
+
+    def find_references(self, name, limit=50):
+        """
+        Lines that use `name` (as a variable, attribute or imported name).
+
+        Returns:
+            dict: "references" ({"path", "line", "text"}), "count" and "truncated"
+        """
+        name = name.rsplit(".", 1)[-1]
+        with self._lock:
+            self.refresh()
+            hits = [(path, self._files[path][4].get(name, ())) for path in sorted(self._files)]
+
+        references, truncated = [], False
+        for path, lines in hits:
+            if not lines:
+                continue
+            try:
+                with open(path, "r", encoding="utf-8", errors="replace") as file:
+                    source_lines = file.read().splitlines()
+            except OSError:
+                continue
+            for line in lines:
+                if len(references) >= limit:
+                    truncated = True
+                    break
+                text = source_lines[line - 1].strip() if line <= len(source_lines) else ""
+                references.append({"path": self._relative(path), "line": line, "text": text[:200]})
+            if truncated:
+                break
+        return {"references": references, "count": len(references), "truncated": truncated}
+
+    def errors(self):
+        """Files that failed to parse, with the error."""
+        with self._lock:
+            return {self._relative(path): entry[5] for path, entry in self._files.items() if entry[5]}
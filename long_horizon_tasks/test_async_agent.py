@@ -0,0 +1,150 @@
+"""
+Tests for AsyncAgent.
+
+This script tests:
+1. Several agents run concurrently in one event loop under a shared limiter
+2. Commands run through asyncio subprocesses and file tools still work
+3. A long run_loop keeps every request within max_input_tokens
+4. Plan mode shares Agent's cycle: it checkpoints, resumes, and checks paths off the event loop
+5. execute_command isn't described to the model as a persistent shell
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import agentic_agent
+from async_agent import AsyncAgent, run_agents
+from bench_run_modes import record_memory_tokens, step_files_scenario
+from checkpoint import load_checkpoint
+from fake_llm_server import AsyncScriptedClient
+
+
+SCENARIO = {"steps": [
+    {"tool_calls": [{"name": "write_file", "arguments": {"filepath": "out.txt", "content": "hello"}}]},
+    {"tool_calls": [{"name": "execute_command", "arguments": {"command": "cat out.txt"}}]},
+    {"tool_calls": [{"name": "finish", "arguments": {"summary": "done"}}]},
+]}
+
+
+def test_agents_share_one_event_loop():
+    client = AsyncScriptedClient(SCENARIO, latency_ms=50)
+
+    async def main():
+        limiter = asyncio.Semaphore(3)
+        agents = [
+            AsyncAgent(working_directory=tempfile.mkdtemp(prefix="agent_async_"), limiter=limiter, client=client)
+            for _ in range(6)
+        ]
+        results = await run_agents([(agent, "Write and check a file.") for agent in agents], mode="loop")
+        return agents, results
+
+    agents, results = asyncio.run(main())
+
+    assert results == ["done"] * 6
+    assert client.model.stats["peak_in_flight"] == 3
+    for agent in agents:
+        outputs = [item for item in agent.memory if isinstance(item, dict) and item.get("type") == "function_call_output"]
+        command_result = json.loads(outputs[1]["output"])["result"]
+        assert command_result["exit_code"] == 0
+        assert command_result["stdout"] == "hello"
+
+
+def test_command_tool_is_not_described_as_persistent():
+    def description(agent):
+        return next(schema["description"] for schema in agent.tools if schema["name"] == "execute_command")
+
+    agent = AsyncAgent(working_directory=tempfile.mkdtemp(prefix="agent_async_"))
+    assert "persistent" not in description(agent) and "do not carry over" in description(agent)
+    assert "persistent bash session" not in agent.system_prompt
+    # Only the description differs from what Agent sends
+    sync_agent = agentic_agent.Agent(working_directory=agent.working_directory)
+    assert "persistent bash session" in description(sync_agent)
+    assert [schema["name"] for schema in agent.tools] == [schema["name"] for schema in sync_agent.tools]
+    sync_agent.close()
+
+
+def test_async_command_timeout():
+    agent = AsyncAgent(working_directory=tempfile.mkdtemp(prefix="agent_async_"))
+
+    result = asyncio.run(agent._execute_command("sleep 5", timeout=0.2))
+
+    assert result["error"] == "Command timed out after 0.2 seconds"
+
+
+def test_long_loop_stays_within_budget():
+    client = AsyncScriptedClient(step_files_scenario(steps=60, content_bytes=5_000))
+    memory_tokens = record_memory_tokens(client)
+
+    agent = AsyncAgent(working_directory=tempfile.mkdtemp(prefix="agent_async_"), max_input_tokens=8_000,
+                       client=client)
+    assert asyncio.run(agent.run_loop("Write 60 step files.")) == "All steps written."
+    assert client.model.stats["responses"] == 61
+    assert max(memory_tokens) <= 8_000
+    assert len(os.listdir(os.path.join(agent.working_directory, "notes"))) == 60
+
+
+class Interrupted(Exception):
+    pass
+
+
+def test_plan_mode_checkpoints_and_resumes():
+    root = tempfile.mkdtemp(prefix="agent_async_")
+    log = os.path.join(root, ".agent_checkpoint.jsonl")
+    client = AsyncScriptedClient(step_files_scenario(steps=2))
+    create = client.responses.create
+
+    async def crash_in_second_act(**request):
+        if client.model.stats["responses"] == 10:  # iteration 2's act phase
+            client.responses.create = create
+            raise Interrupted()
+        return await create(**request)
+
+    client.responses.create = crash_in_second_act
+    agent = AsyncAgent(working_directory=root, checkpoint_path=log, client=client)
+    path_threads = []
+    path_accesses = agent._path_accesses
+
+    def record_thread(item):
+        path_threads.append(threading.current_thread())
+        return path_accesses(item)
+
+    agent._path_accesses = record_thread
+    with pytest.raises(Interrupted):
+        asyncio.run(agent.run("Write 2 step files."))
+    assert path_threads and threading.main_thread() not in path_threads
+    assert load_checkpoint(log)["last"] == {"iteration": 2, "phase": "plan", "result": "Write the remaining files."}
+
+    assert asyncio.run(AsyncAgent.resume(log, client=client)) == "All steps written."
+    assert sorted(os.listdir(os.path.join(root, "notes"))) == ["step_0.md", "step_1.md"]
+    assert load_checkpoint(log)["last"]["done"] is True
+    # A finished run returns its result without calling the model
+    calls = client.model.stats["responses"]
+    assert asyncio.run(AsyncAgent.resume(log, client=client)) == "All steps written."
+    assert client.model.stats["responses"] == calls
+
+
+def test_unsupported_options_are_rejected():
+    with pytest.raises(ValueError):
+        AsyncAgent(working_directory=tempfile.mkdtemp(prefix="agent_async_"), persistent_shell=True)
+    with pytest.raises(ValueError):
+        AsyncAgent(working_directory=tempfile.mkdtemp(prefix="agent_async_"), stream=True)
+
+
+if __name__ == "__main__":
+    test_agents_share_one_event_loop()
+    test_command_tool_is_not_described_as_persistent()
+    test_async_command_timeout()
+    test_long_loop_stays_within_budget()
+    test_plan_mode_checkpoints_and_resumes()
+    test_unsupported_options_are_rejected()
+    print("Async agent tests completed!")
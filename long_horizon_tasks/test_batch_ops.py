@@ -0,0 +1,154 @@
+"""
+Tests for the batch file tools (move_many, make_directories, read_many).
+
+This script tests:
+1. A batch of moves creates its folders and moves every file in one call
+2. Invalid batches are rejected up front with every problem listed
+3. A failure part-way through rolls back the moves and folders already made
+4. A move that can't be undone is reported, and only the folders it needs are kept
+"""
+
+import os
+import sys
+import tempfile
+from unittest import mock
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch_ops
+from batch_ops import BatchError, make_directories, move_many, read_many
+
+
+def make_folder(count=100):
+    root = tempfile.mkdtemp(prefix="batch_")
+    for number in range(count):
+        with open(os.path.join(root, f"note_{number}.md"), "w") as file:
+            file.write(f"# Note {number}\n")
+    return root
+
+
+def tree(root):
+    return sorted(os.path.relpath(os.path.join(directory, name), root)
+                  for directory, dirs, files in os.walk(root) for name in dirs + files)
+
+
+def test_move_many_and_make_directories(monkeypatch):
+    root = make_folder()
+    monkeypatch.chdir(root)
+
+    assert make_directories(["archive/2023", "archive"]) == {"created": ["archive/2023"], "existing": ["archive"]}
+
+    moves = [{"source": f"note_{number}.md", "destination": f"{'even' if number % 2 == 0 else 'odd'}/note_{number}.md"}
+             for number in range(100)]
+    result = move_many(moves)
+    assert result == {"moved": 100, "created_directories": ["even", "odd"]}
+    assert len(os.listdir("even")) == 50 and len(os.listdir("odd")) == 50
+
+    result = read_many(["even/note_0.md", "odd/note_1.md", "missing.md"])
+    assert result["files"] == {"even/note_0.md": "# Note 0\n", "odd/note_1.md": "# Note 1\n"}
+    assert list(result["errors"]) == ["missing.md"]
+
+    result = read_many([f"even/note_{number}.md" for number in range(0, 100, 2)], max_total_bytes=40)
+    # The fifth file gets the last few bytes of the budget, with a truncation marker
+    assert len(result["files"]) == 5 and len(result["skipped"]) == 45
+    assert "[Truncated" in result["files"]["even/note_8.md"]
+
+
+def test_invalid_batches_change_nothing(monkeypatch):
+    root = make_folder(3)
+    monkeypatch.chdir(root)
+    before = tree(root)
+
+    with pytest.raises(BatchError) as error:
+        move_many([
+            {"source": "note_0.md", "destination": "a/note_0.md"},
+            {"source": "missing.md", "destination": "a/missing.md"},
+            {"source": "note_1.md", "destination": "a/note_0.md"},
+            {"source": "note_2.md", "destination": "note_0.md/inside.md"},
+            {"from": "note_2.md"},
+        ])
+    message = str(error.value)
+    assert message.startswith("Nothing was changed; 4 problem(s):")
+    assert "Move 2: missing.md does not exist" in message
+    assert "Move 3: a/note_0.md is the destination of more than one move" in message
+    assert "Move 4: note_0.md is not a directory" in message
+    assert "Move 5: expected an object" in message
+
+    with pytest.raises(BatchError):
+        make_directories(["new", "note_0.md/sub"])
+    assert tree(root) == before
+
+
+def test_failure_part_way_rolls_back(monkeypatch):
+    root = make_folder(5)
+    monkeypatch.chdir(root)
+    before = tree(root)
+
+    real_rename = os.rename
+    calls = []
+
+    def flaky_rename(source, destination):
+        calls.append(source)
+        if len(calls) == 4:
+            raise OSError("disk full")
+        real_rename(source, destination)
+
+    moves = [{"source": f"note_{number}.md", "destination": f"group_{number % 2}/deep/note_{number}.md"}
+             for number in range(5)]
+    with mock.patch.object(batch_ops.os, "rename", flaky_rename):
+        with pytest.raises(BatchError) as error:
+            move_many(moves)
+    assert "Moving note_3.md to group_1/deep/note_3.md failed: disk full" in str(error.value)
+    assert "rolled back the 3 moves already made" in str(error.value)
+    assert tree(root) == before
+
+
+def test_rollback_reports_what_was_restored(monkeypatch):
+    root = make_folder(5)
+    monkeypatch.chdir(root)
+
+    real_rename = os.rename
+
+    def flaky_rename(source, destination):
+        if source == "note_3.md":
+            raise OSError("disk full")
+        if source == os.path.join("group_1", "deep", "note_1.md"):
+            raise OSError("permission denied")  # undoing the move of note_1.md
+        real_rename(source, destination)
+
+    moves = [{"source": f"note_{number}.md", "destination": os.path.join(f"group_{number % 2}", "deep", f"note_{number}.md")}
+             for number in range(5)]
+    with mock.patch.object(batch_ops.os, "rename", flaky_rename):
+        with pytest.raises(BatchError) as error:
+            move_many(moves)
+    message = str(error.value)
+    assert "rolled back 2 of the 3 moves already made" in message
+    assert f"could not move back: {os.path.join('group_1', 'deep', 'note_1.md')} (was note_1.md)" in message
+    assert f"directories left in place: {os.path.join('group_1', 'deep')}, group_1" in message
+    # group_0 and its folder are gone; note_1.md stays where it was moved, in the folders it needs
+    assert tree(root) == sorted(["group_1", os.path.join("group_1", "deep"), os.path.join("group_1", "deep", "note_1.md"),
+                                 "note_0.md", "note_2.md", "note_3.md", "note_4.md"])
+
+
+def test_make_directories_rolls_back(monkeypatch):
+    root = make_folder(0)
+    monkeypatch.chdir(root)
+
+    real_mkdir = os.mkdir
+
+    def flaky_mkdir(path, *args):
+        if os.path.basename(path) == "c":
+            raise OSError("disk full")
+        real_mkdir(path, *args)
+
+    with mock.patch.object(batch_ops.os, "mkdir", flaky_mkdir):
+        with pytest.raises(BatchError) as error:
+            make_directories(["a/b", "c"])
+    assert "Creating c failed: disk full; removed the 2 directories already created" in str(error.value)
+    assert tree(root) == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
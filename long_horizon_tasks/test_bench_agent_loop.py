@@ -0,0 +1,56 @@
+"""
+Tests for the agent loop benchmark suite.
+
+This script tests:
+1. Both agents run against the scripted client and report every metric
+2. Payload and memory grow with the number of iterations
+3. compare() flags regressions against an earlier results file
+"""
+
+import copy
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from bench_agent_loop import compare, run
+
+
+def test_run_reports_metrics_for_both_agents():
+    document = run(iterations=(2, 6))
+
+    assert [(result["agent"], result["iterations"]) for result in document["results"]] == [
+        ("agent", 2), ("agent", 6), ("meeting_notes", 2), ("meeting_notes", 6)]
+
+    agent_small, agent_large, notes_small, notes_large = document["results"]
+    # run_loop: one model call per tool turn plus the finish turn
+    assert agent_large["model_calls"] == 7
+    assert len(agent_large["series"]["latency_ms"]) == 7
+    assert agent_large["tools"]["validate_path_calls"] > 0
+    # chat: a tool call and a final answer per iteration
+    assert notes_large["model_calls"] == 12
+    assert notes_large["tools"]["total_ms"] > 0
+
+    for small, large in ((agent_small, agent_large), (notes_small, notes_large)):
+        assert large["payload"]["last_iteration_bytes"] > small["payload"]["last_iteration_bytes"]
+        assert large["memory"]["items"] > small["memory"]["items"]
+        assert large["memory"]["peak_bytes"] > 0
+
+
+def test_compare_flags_regressions():
+    baseline = run(iterations=(2,), agents=("agent",), trace_memory=False)
+
+    assert compare(baseline, baseline) == []
+
+    slower = copy.deepcopy(baseline)
+    slower["results"][0]["payload"]["total_bytes"] *= 2
+    regressions = compare(baseline, slower, threshold=1.5)
+    assert [(agent, iterations, label) for agent, iterations, label, *_ in regressions] == [
+        ("agent", 2, "request bytes")]
+
+
+if __name__ == "__main__":
+    test_run_reports_metrics_for_both_agents()
+    test_compare_flags_regressions()
+    print("Benchmark suite tests completed!")
@@ -0,0 +1,140 @@
+"""
+Tests for checkpointing and resuming agent runs.
+
+This script tests:
+1. An interrupted plan-mode run resumes after its last completed phase
+2. Loop-mode runs resume at the next turn, and finished runs aren't run again
+3. The log is appended to incrementally, and a line cut short by a crash is ignored
+4. Compaction is logged as an edit, so the log grows linearly over a compacting run
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import agentic_agent
+from bench_run_modes import step_files_scenario
+from checkpoint import load_checkpoint
+from fake_llm_server import ScriptedClient
+
+
+class Interrupted(Exception):
+    pass
+
+
+def crash_at(client, call):
+    """Make the `call`-th model call raise, like a crash mid-run."""
+    create = client.responses.create
+    calls = [0]
+
+    def crashing_create(**request):
+        calls[0] += 1
+        if calls[0] == call:
+            raise Interrupted()
+        return create(**request)
+
+    client.responses.create = crashing_create
+
+
+def start_run(mode, crash_call, steps=2):
+    root = tempfile.mkdtemp(prefix="checkpoint_")
+    log = os.path.join(root, ".agent_checkpoint.jsonl")
+    client = ScriptedClient(step_files_scenario(steps))
+    crash_at(client, crash_call)
+    agent = agentic_agent.Agent(working_directory=root, checkpoint_path=log, client=client)
+    with pytest.raises(Interrupted):
+        agent.run(f"Write {steps} step files.", mode=mode)
+    agent.close()
+    return root, log, client
+
+
+def resume(log, client):
+    # The same scripted model, so it goes on with the files the first run didn't get to
+    before = client.model.stats["responses"]
+    result = agentic_agent.Agent.resume(log, client=client)
+    return result, client.model.stats["responses"] - before
+
+
+def test_resume_plan_mode_after_last_phase():
+    # Iteration 1 is plan, act, check, reflect (two model calls each); crash in iteration 2's act
+    root, log, client = start_run("plan", crash_call=11)
+
+    state = load_checkpoint(log)
+    assert state["start"]["goal"] == "Write 2 step files." and state["start"]["mode"] == "plan"
+    assert state["last"] == {"iteration": 2, "phase": "plan", "result": "Write the remaining files."}
+    assert state["results"] == {"plan": "Write the remaining files."}
+    outputs = [item for item in state["memory"] if item.get("type") == "function_call_output"]
+    assert len(outputs) == 1 and "step_0.md" in outputs[0]["output"]
+
+    result, calls = resume(log, client)
+    assert result == "All steps written."
+    assert calls == 6  # act, check and summary of iteration 2; the plan isn't asked for again
+    assert sorted(os.listdir(os.path.join(root, "notes"))) == ["step_0.md", "step_1.md"]
+
+    # A finished run returns its result without calling the model
+    assert resume(log, client) == ("All steps written.", 0)
+
+
+def test_resume_loop_mode_at_next_turn():
+    root, log, client = start_run("loop", crash_call=3, steps=3)
+    assert load_checkpoint(log)["last"] == {"iteration": 2, "phase": "turn"}
+
+    result, calls = resume(log, client)
+    assert result == "All steps written."
+    assert calls == 2  # the last file, then finish
+    assert sorted(os.listdir(os.path.join(root, "notes"))) == ["step_0.md", "step_1.md", "step_2.md"]
+    assert load_checkpoint(log)["last"]["done"] is True
+
+
+def test_log_is_incremental():
+    root, log, client = start_run("plan", crash_call=11)
+    with open(log, encoding="utf-8") as file:
+        records = [json.loads(line) for line in file]
+    assert "start" in records[0]
+    assert [record["phase"] for record in records[1:]] == ["plan", "act", "check", "reflect", "plan"]
+    # Every line carries only its new memory items, and each item is logged once
+    assert all("memory" not in record for record in records)
+    logged = sum(len(record["append"]) for record in records)
+    assert logged == len(load_checkpoint(log)["memory"])
+
+    # A crash in the middle of writing a line loses only that line
+    with open(log, "a", encoding="utf-8") as file:
+        file.write('{"iteration": 2, "phase": "act", "append": [{"role": "us')
+    assert load_checkpoint(log)["last"]["phase"] == "plan"
+    result, _ = resume(log, client)
+    assert result == "All steps written."
+    assert load_checkpoint(log)["last"]["phase"] == "summary"
+
+
+def compacting_run(mode, steps):
+    root = tempfile.mkdtemp(prefix="checkpoint_")
+    log = os.path.join(root, ".agent_checkpoint.jsonl")
+    agent = agentic_agent.Agent(working_directory=root, checkpoint_path=log, max_input_tokens=20_000,
+                                client=ScriptedClient(step_files_scenario(steps, content_bytes=5_000)))
+    assert agent.run(f"Write {steps} step files.", mode=mode) == "All steps written."
+    agent.close()
+    with open(log, encoding="utf-8") as file:
+        records = [json.loads(line) for line in file]
+    assert any("edit" in record for record in records)
+    # Replaying the edits gives the memory the agent ended with
+    assert load_checkpoint(log)["memory"] == json.loads(json.dumps(list(agent.memory), default=str))
+    return os.path.getsize(log)
+
+
+@pytest.mark.parametrize("mode", ["plan", "loop"])
+def test_compacting_run_log_is_linear(mode):
+    shorter, longer = compacting_run(mode, 20), compacting_run(mode, 40)
+    # Rewriting the whole memory after every compaction made it quadratic (about 2 MB at 40 steps)
+    assert longer < 2.2 * shorter
+    assert longer < 2 * 40 * 5_000
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,100 @@
+"""
+Tests for the search_code tool and its trigram index.
+
+This script tests:
+1. Literal and regex searches return file/line matches and respect the limit
+2. Repeated searches only open candidate files, without re-indexing
+3. write_file, move_file and shell commands keep the index current
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import agentic_agent
+from code_search import TrigramIndex, required_literals
+
+
+def make_workspace():
+    root = tempfile.mkdtemp(prefix="search_")
+    os.makedirs(os.path.join(root, "app", "storage"))
+    os.makedirs(os.path.join(root, ".git"))
+    files = {
+        "app/service.py": "def transfer_hours(sender, receiver, hours):\n    return ledger.add(hours)\n",
+        "app/storage/db.py": "class Database:\n    def connect(self):\n        pass\n",
+        "README.md": "Time bank: members trade hours.\n",
+        ".git/config": "def transfer_hours should be skipped\n",
+    }
+    for name, content in files.items():
+        with open(os.path.join(root, name), "w") as file:
+            file.write(content)
+    for number in range(50):
+        with open(os.path.join(root, "app", f"module_{number}.py"), "w") as file:
+            file.write(f"VALUE_{number} = {number}\n")
+    return root
+
+
+def test_literal_and_regex_search():
+    index = TrigramIndex(make_workspace())
+
+    result = index.search("transfer_hours")
+    assert result["matches"] == [{"path": os.path.join("app", "service.py"), "line": 1,
+                                  "text": "def transfer_hours(sender, receiver, hours):"}]
+    assert result["files_scanned"] == 1
+
+    result = index.search(r"def \w+\(self", regex=True)
+    assert [(match["path"], match["line"]) for match in result["matches"]] == [
+        (os.path.join("app", "storage", "db.py"), 2)]
+
+    assert index.search("database", case_sensitive=False)["count"] == 1
+    assert index.search("database")["count"] == 0
+
+    result = index.search(r"VALUE_\d+", regex=True, limit=5)
+    assert result["count"] == 5 and result["truncated"]
+    assert index.search("VALUE_1 ", file_pattern="module_1.py")["count"] == 1
+
+    assert required_literals(r"class\s+Data(base)?") == ["class", "Data"]
+    assert required_literals("foo|bar") == []
+
+
+def test_repeated_searches_use_the_index():
+    index = TrigramIndex(make_workspace(), max_staleness=60)
+
+    index.search("transfer_hours")
+    indexed = index.stats["indexed"]
+    for _ in range(5):
+        assert index.search("ledger")["files_scanned"] == 1
+    assert index.stats["indexed"] == indexed
+    assert index.stats["scans"] == 1
+
+
+def test_agent_tool_tracks_changes():
+    root = make_workspace()
+    agent = agentic_agent.Agent(working_directory=root)
+
+    assert agent._search_code("transfer_hours")["count"] == 1
+    agent._code_index.max_staleness = 60
+
+    agent._write_file("app/new.py", "def transfer_hours_v2():\n    pass\n")
+    assert agent._search_code("transfer_hours")["count"] == 2
+
+    agent._move_file("app/new.py", "app/renamed.py")
+    paths = {match["path"] for match in agent._search_code("transfer_hours")["matches"]}
+    assert paths == {os.path.join("app", "service.py"), os.path.join("app", "renamed.py")}
+
+    agent._execute_command("echo 'transfer_hours()' > shell.py")
+    assert agent._search_code("transfer_hours", path="app")["count"] == 2
+    assert agent._search_code("transfer_hours")["count"] == 3
+
+    assert agent._search_code("(", regex=True).startswith("Error: Invalid regular expression")
+    assert agent._search_code("x", path="../").startswith("Access denied")
+
+
+if __name__ == "__main__":
+    test_literal_and_regex_search()
+    test_repeated_searches_use_the_index()
+    test_agent_tool_tracks_changes()
+    print("Code search tests completed!")
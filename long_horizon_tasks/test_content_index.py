@@ -0,0 +1,91 @@
+"""
+Tests for the summarize_folder tool's content index.
+
+This script tests:
+1. The table gives each file's title, headings and distinguishing keywords
+2. Unchanged files come from the cache; edited files are summarized again
+3. Large folders are summarized in a process pool with the same results
+"""
+
+import os
+import sys
+import tempfile
+from unittest import mock
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import content_index
+from content_index import summarize_folder
+
+
+def make_folder(monkeypatch, copies=1):
+    root = tempfile.mkdtemp(prefix="content_")
+    monkeypatch.chdir(root)
+    os.makedirs("inbox")
+    for number in range(copies):
+        with open(f"inbox/bread_{number}.md", "w") as file:
+            file.write(f"# Sourdough Bread {number}\n\n## Ingredients\nflour, water, salt, starter\n\n"
+                       "## Method\nKnead the dough, proof the dough overnight, bake the dough.\nNotes for the week\n")
+        with open(f"inbox/standup_{number}.md", "w") as file:
+            file.write(f"# Standup {number}\n\n## Attendees\nAna, Ben\n\n## Action items\n"
+                       "Ship the release, fix the release pipeline. Notes for the week\n")
+        with open(f"todo_{number}.txt", "w") as file:
+            file.write("Call the plumber\nRenew passport before the trip\nNotes for the week\n")
+    with open("photo.jpg", "wb") as file:
+        file.write(b"\xff\xd8\xff\xe0\0\0JFIF\0" + bytes(range(256)))
+    return root
+
+
+def rows(result):
+    lines = result["table"].splitlines()
+    assert lines[0] == "path | title | headings | keywords"
+    return {row.split(" | ")[0]: row.split(" | ")[1:] for row in lines[1:]}
+
+
+def test_summary_table(monkeypatch):
+    make_folder(monkeypatch)
+
+    result = summarize_folder(".")
+    assert result["files"] == 3 and result["skipped"] == ["photo.jpg"]
+    table = rows(result)
+    title, headings, keywords = table[os.path.join("inbox", "bread_0.md")]
+    assert title == "Sourdough Bread 0" and headings == "Ingredients; Method"
+    assert keywords.split(", ")[0] == "dough"
+    # Words every file shares don't distinguish anything
+    assert "week" not in keywords and "notes" not in keywords
+    assert table[os.path.join("inbox", "standup_0.md")][2].startswith("release")
+    assert table["todo_0.txt"][:2] == ["Call the plumber", ""]
+
+
+def test_cache(monkeypatch):
+    make_folder(monkeypatch)
+    assert summarize_folder(".")["summarized"] == 4
+
+    assert summarize_folder(".")["summarized"] == 0
+    # A second call gives the same table from the cache alone
+    with mock.patch.object(content_index, "_summarize_file", side_effect=AssertionError("read again")):
+        cached = summarize_folder(".")
+
+    with open("todo_0.txt", "a") as file:
+        file.write("Book the dentist\n")
+    os.rename(os.path.join("inbox", "standup_0.md"), "standup.md")
+    again = summarize_folder(".")
+    assert again["summarized"] == 2  # the edited file and the moved one
+    assert rows(again)["standup.md"] == rows(cached)[os.path.join("inbox", "standup_0.md")]
+    assert os.path.join("inbox", "standup_0.md") not in rows(again)
+
+
+def test_process_pool(monkeypatch):
+    make_folder(monkeypatch, copies=10)
+
+    parallel = summarize_folder(".", workers=2)
+    assert parallel["files"] == 30 and parallel["summarized"] == 31
+    os.remove(os.path.join(content_index.CACHE_DIR, content_index.CACHE_FILE))
+    serial = summarize_folder(".", workers=1)
+    assert serial["table"] == parallel["table"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,216 @@
+"""
+Tests for token-budgeted compaction of the agent's memory.
+
+This script tests:
+1. Recent turns are kept verbatim while old tool outputs become stubs
+2. Large tool-call arguments and long messages in old turns are trimmed
+3. The hard cap drops the oldest turns and leaves a note in their place
+4. Memory items are converted from SDK objects once and serialized once
+5. run_loop memory (one user message, then only tool calls) is split per model step
+6. Recent turns that are over the budget on their own are stubbed until it fits
+"""
+
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from unittest import mock
+
+from openai.types.responses import ResponseFunctionToolCall
+
+from context_compaction import ContextCompactor, Memory, MemoryItem, estimate_tokens, item_field, serialize_item
+
+
+def make_turn(number, output_size=5_000):
+    return [
+        {"role": "user", "content": f"Step {number}"},
+        SimpleNamespace(type="function_call", call_id=f"call_{number}", name="read_file",
+                        arguments=json.dumps({"filepath": f"file_{number}.py"})),
+        {"type": "function_call_output", "call_id": f"call_{number}",
+         "output": json.dumps({"result": "x" * output_size})},
+        {"role": "assistant", "content": f"Read file {number}"},
+    ]
+
+
+def test_old_tool_outputs_are_stubbed():
+    memory = [{"role": "system", "content": "You are an agent."}]
+    for number in range(5):
+        memory += make_turn(number)
+
+    compactor = ContextCompactor(keep_recent_turns=2)
+    compacted, stats = compactor.compact(memory)
+
+    assert stats["stubbed"] == 3
+    assert len(compacted) == len(memory)
+    assert compacted[0] == memory[0]
+    stub = json.loads(compacted[3]["output"])["result"]
+    assert stub.startswith("[compacted read_file output,")
+    assert compacted[3]["call_id"] == "call_0"
+    # The last two turns are untouched
+    assert compacted[-8:] == memory[-8:]
+    assert stats["tokens_after"] < stats["tokens_before"]
+
+    # Compacting again changes nothing, so the prefix stays stable
+    again, stats = compactor.compact(compacted)
+    assert again == compacted
+    assert stats["stubbed"] == 0
+
+
+def test_large_arguments_and_messages_are_trimmed():
+    memory = [
+        {"role": "system", "content": "You are an agent."},
+        {"role": "user", "content": "system prompt " * 200 + "Determine a plan."},
+        SimpleNamespace(type="function_call", call_id="call_w", name="write_file",
+                        arguments=json.dumps({"filepath": "app.py", "content": "y" * 5_000})),
+        {"type": "function_call_output", "call_id": "call_w", "output": json.dumps({"result": "ok"})},
+        {"role": "user", "content": "Next step"},
+    ]
+
+    compacted, stats = ContextCompactor(keep_recent_turns=1).compact(memory)
+
+    assert stats["stubbed"] == 2
+    assert compacted[1]["content"].endswith("Determine a plan.")
+    assert compacted[1]["content"].startswith("[compacted user message,")
+    arguments = json.loads(compacted[2]["arguments"])
+    assert arguments == {"filepath": "app.py", "content": "[compacted, 5000 chars]"}
+
+
+def test_hard_cap_drops_oldest_turns():
+    memory = [{"role": "system", "content": "You are an agent."}]
+    for number in range(10):
+        memory += make_turn(number, output_size=800)
+
+    compactor = ContextCompactor(max_input_tokens=600, keep_recent_turns=3)
+    compacted, stats = compactor.compact(memory)
+
+    assert stats["dropped"] > 0
+    assert stats["tokens_after"] <= 600
+    assert sum(estimate_tokens(item) for item in compacted) == stats["tokens_after"]
+    assert compacted[0] == memory[0]
+    assert compacted[1]["content"].startswith("[Context compacted:")
+    assert compacted[-1] == memory[-1]
+
+    # A second pass keeps one running note
+    compacted.extend(make_turn(10, output_size=800))
+    compacted, more = compactor.compact(compacted)
+    notes = [item for item in compacted if str(item_field(item, "content", "")).startswith("[Context compacted:")]
+    assert len(notes) == 1
+    assert str(stats["dropped"] + more["dropped"]) in notes[0]["content"]
+
+
+def test_memory_items_are_encoded_once():
+    call = ResponseFunctionToolCall(type="function_call", call_id="call_1", name="read_file",
+                                    arguments='{"filepath": "a.py"}', status="completed")
+    memory = Memory([{"role": "system", "content": "You are an agent."}])
+    with mock.patch.object(ResponseFunctionToolCall, "model_dump", wraps=call.model_dump) as model_dump:
+        memory += [call]
+    memory.append({"type": "function_call_output", "call_id": "call_1", "output": "{}"})
+    assert model_dump.call_count == 1
+    assert all(isinstance(item, MemoryItem) for item in memory)
+    assert memory[1] == {"type": "function_call", "call_id": "call_1", "name": "read_file",
+                         "arguments": '{"filepath": "a.py"}', "status": "completed"}
+
+    # Serialized once, then reused by every estimate and request measurement
+    with mock.patch("context_compaction.json.dumps", wraps=json.dumps) as dumps:
+        first = [serialize_item(item) for item in memory]
+        tokens = sum(estimate_tokens(item) for item in memory)
+        ContextCompactor().compact(memory)
+        assert [serialize_item(item) for item in memory] == first
+    assert dumps.call_count == 3
+    assert json.loads(first[1])["name"] == "read_file"
+    assert tokens == sum(len(text) // 4 + 1 for text in first)
+
+    # Changing an item drops its cached form
+    memory[2]["output"] = '{"result": "changed"}'
+    assert "changed" in serialize_item(memory[2])
+
+
+def make_step(number, output_size=5_000):
+    return [
+        SimpleNamespace(type="function_call", call_id=f"call_{number}", name="read_file",
+                        arguments=json.dumps({"filepath": f"file_{number}.py"})),
+        {"type": "function_call_output", "call_id": f"call_{number}",
+         "output": json.dumps({"result": "x" * output_size})},
+    ]
+
+
+def test_loop_memory_is_compacted_per_step():
+    memory = [{"role": "system", "content": "You are an agent."}, {"role": "user", "content": "Read every file."}]
+    for number in range(50):
+        memory += make_step(number)
+
+    compactor = ContextCompactor(keep_recent_turns=2)
+    compacted, stats = compactor.compact(memory)
+    assert stats["stubbed"] == 48
+    assert compacted[-4:] == memory[-4:]
+
+    # The hard cap drops the oldest call/output pairs but keeps the goal
+    compactor = ContextCompactor(max_input_tokens=2_000, keep_recent_turns=2)
+    compacted, stats = compactor.compact(memory)
+    assert stats["tokens_after"] <= 2_000
+    assert stats["dropped"] > 0 and stats["dropped"] % 2 == 0
+    assert compacted[0] == memory[0]
+    assert compacted[1]["content"].startswith("[Context compacted:")
+    assert compacted[2] == memory[1]
+    assert compacted[-2:] == memory[-2:]
+    # Every remaining output still follows its call
+    calls = {item_field(item, "call_id") for item in compacted if item_field(item, "type") == "function_call"}
+    outputs = [item_field(item, "call_id") for item in compacted if item_field(item, "type") == "function_call_output"]
+    assert calls == set(outputs)
+
+
+def test_loop_memory_with_parallel_calls():
+    # Two calls per step, a closing message, then a new user message
+    memory = [{"role": "user", "content": "Compare the files."}]
+    for number in range(0, 6, 2):
+        step = make_step(number, output_size=400) + make_step(number + 1, output_size=400)
+        memory += [step[0], step[2], step[1], step[3]]
+    memory += [{"role": "assistant", "content": "They match."}, {"role": "user", "content": "Thanks"}]
+
+    assert ContextCompactor._turn_starts(memory) == [0, 5, 9, 14]
+    # Whole steps go, oldest first, and the user message with the last of them
+    compacted, stats = ContextCompactor(max_input_tokens=450, keep_recent_turns=1).compact(memory)
+    assert stats["dropped"] == 8
+    assert compacted[1] == memory[0] and compacted[2:] == memory[9:]
+    compacted, stats = ContextCompactor(max_input_tokens=100, keep_recent_turns=1).compact(memory)
+    assert stats["dropped"] == 14
+    assert compacted[1:] == memory[14:]
+
+
+def test_recent_turns_over_budget_are_stubbed():
+    # Three turns of 40 KB reads, all inside the recent window
+    memory = [{"role": "system", "content": "You are an agent."}]
+    for number in range(3):
+        memory += make_turn(number, output_size=40_000)
+
+    compacted, stats = ContextCompactor(max_input_tokens=5_000).compact(memory)
+    assert stats["tokens_after"] <= 5_000
+    assert stats["tokens_after"] == sum(estimate_tokens(item) for item in compacted)
+    # The two older turns are dropped, then the last one's output is stubbed
+    assert stats["dropped"] == 8 and stats["stubbed"] == 1
+    assert json.loads(compacted[-2]["output"])["result"].startswith("[compacted read_file output,")
+    assert compacted[-1] == memory[-1]
+
+    # One step of parallel reads over the default budget: the oldest outputs are
+    # stubbed and the newest kept whole
+    memory = [{"role": "user", "content": "Read every file."}]
+    steps = [make_step(number, output_size=64 * 1024) for number in range(8)]
+    memory += [step[0] for step in steps] + [step[1] for step in steps]
+    compacted, stats = ContextCompactor().compact(memory)
+    assert stats["tokens_before"] > 120_000 >= stats["tokens_after"]
+    assert stats["stubbed"] == 1
+    assert compacted[-7:] == memory[-7:]
+
+
+if __name__ == "__main__":
+    test_old_tool_outputs_are_stubbed()
+    test_large_arguments_and_messages_are_trimmed()
+    test_hard_cap_drops_oldest_turns()
+    test_memory_items_are_encoded_once()
+    test_loop_memory_is_compacted_per_step()
+    test_loop_memory_with_parallel_calls()
+    test_recent_turns_over_budget_are_stubbed()
+    print("Context compaction tests completed!")
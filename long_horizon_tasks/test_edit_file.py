@@ -0,0 +1,144 @@
+"""
+Tests for the edit_file tool.
+
+This script tests:
+1. Search/replace edits apply together and return a compact diff
+2. Unified diffs apply at the right place, even when lines have shifted
+3. Conflicts (missing, ambiguous or overlapping edits) leave the file unchanged
+4. Hunks apply in order and must match the line counts in their headers
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import agentic_agent
+from patching import PatchError, apply_edits, apply_unified_diff
+
+
+SERVICE = """class LedgerService:
+    def transfer(self, sender, receiver, hours):
+        if hours <= 0:
+            raise ValueError("hours must be positive")
+        self.db.move(sender, receiver, hours)
+
+    def balance(self, member):
+        return self.db.balance(member)
+"""
+
+
+def make_agent():
+    root = tempfile.mkdtemp(prefix="edit_")
+    os.makedirs(os.path.join(root, "app"))
+    with open(os.path.join(root, "app", "service.py"), "w") as file:
+        file.write(SERVICE)
+    return agentic_agent.Agent(working_directory=root), os.path.join(root, "app", "service.py")
+
+
+def read(path):
+    with open(path) as file:
+        return file.read()
+
+
+def test_search_replace_edits():
+    agent, path = make_agent()
+
+    result = agent._edit_file("app/service.py", edits=[
+        {"search": "if hours <= 0:", "replace": "if hours <= 0 or hours > 24:"},
+        {"search": "        return self.db.balance(member)\n",
+         "replace": "        return round(self.db.balance(member), 2)\n"},
+    ])
+    assert read(path) == SERVICE.replace("if hours <= 0:", "if hours <= 0 or hours > 24:").replace(
+        "return self.db.balance(member)", "return round(self.db.balance(member), 2)")
+    assert result["path"] == os.path.join("app", "service.py") and result["lines"] == 8
+    assert "-        if hours <= 0:\n+        if hours <= 0 or hours > 24:\n" in result["diff"]
+    assert "class LedgerService" not in result["diff"]
+
+    # Through the tool call path, with the arguments as the model sends them
+    arguments = {"filepath": "app/service.py", "edits": [{"search": "balance(self, member)", "replace": "balance(self, member_id)"}]}
+    assert "member_id" in agent._call_tool("edit_file", arguments)["diff"]
+    assert "def balance(self, member_id):" in read(path)
+
+
+def test_unified_diff():
+    agent, path = make_agent()
+    diff = """--- a/app/service.py
++++ b/app/service.py
+@@ -4,2 +4,3 @@
+             raise ValueError("hours must be positive")
++        self.audit(sender, receiver, hours)
+         self.db.move(sender, receiver, hours)
+"""
+    result = agent._edit_file("app/service.py", diff=diff)
+    assert "+        self.audit(sender, receiver, hours)" in result["diff"]
+    lines = read(path).splitlines()
+    assert lines[4] == "        self.audit(sender, receiver, hours)"
+
+    # The same kind of hunk still applies after lines above it moved
+    shifted = "# header\n# more\n" + SERVICE
+    diff = "@@ -7,2 +7,2 @@\n     def balance(self, member):\n-        return self.db.balance(member)\n+        return 0\n"
+    assert apply_unified_diff(shifted, diff) == shifted.replace("return self.db.balance(member)", "return 0")
+    assert apply_unified_diff("a\r\nb\r\n", "@@ -2 +2 @@\n-b\n+c\n") == "a\r\nc\r\n"
+
+
+def test_conflicts_leave_file_unchanged():
+    agent, path = make_agent()
+
+    result = agent._edit_file("app/service.py", edits=[{"search": "def transfer(self, src", "replace": "x"}])
+    assert result.startswith("Error: Edit not applied: Edit 1: search text not found (closest line 2:")
+    result = agent._edit_file("app/service.py", edits=[{"search": "self.db", "replace": "self.store"}])
+    assert "occurs 2 times" in result
+    result = agent._edit_file("app/service.py", diff="@@ -3,1 +3,1 @@\n-        if hours < 0:\n+        pass\n")
+    assert "Hunk 1 does not match the file near line 3" in result
+    assert read(path) == SERVICE
+
+    try:
+        apply_edits("abcdef", [{"search": "abc", "replace": "x"}, {"search": "cde", "replace": "y"}])
+        raise AssertionError("overlapping edits applied")
+    except PatchError as error:
+        assert str(error) == "Edits 1 and 2 overlap"
+
+    assert agent._edit_file("app/service.py").startswith("Error: Give either edits or diff")
+    assert agent._edit_file("../outside.py", diff="@@ -1 +1 @@\n-a\n+b\n").startswith("Access denied")
+    assert "use write_file" in agent._edit_file("app/missing.py", edits=[{"search": "a", "replace": "b"}])
+    assert os.listdir(os.path.dirname(path)) == ["service.py"]
+
+
+def test_hunks_apply_in_order():
+    text = "def a():\n    return 1\n\ndef b():\n    return 1\n\ndef c():\n    return 1\n"
+    # The second hunk's header points back at a(); it still applies after the first hunk
+    diff = "@@ -5 +5 @@\n-    return 1\n+    return 2\n\n@@ -2 +2 @@\n-    return 1\n+    return 3\n"
+    assert apply_unified_diff(text, diff) == text.replace("b():\n    return 1", "b():\n    return 2").replace(
+        "c():\n    return 1", "c():\n    return 3")
+
+    # A hunk with nothing left to match after the previous one is rejected
+    diff = "@@ -8 +8 @@\n-    return 1\n+    return 2\n@@ -2 +2 @@\n-    return 1\n+    return 3\n"
+    try:
+        apply_unified_diff(text, diff)
+        raise AssertionError("hunk applied before the previous one")
+    except PatchError as error:
+        assert str(error).startswith("Hunk 2 does not match the file near line 2 after the previous hunk")
+
+    # Line counts must match the header
+    for diff, message in [
+        ("@@ -1,2 +1,2 @@\n-def a():\n+def z():\n", "Hunk 1 has 1 old and 1 new lines, but its header says 2 and 2"),
+        ("@@ -1 +1 @@\n-def a():\n+def z():\n+    pass\n", "Hunk 1 has more lines than its header says"),
+        ("@@ -1 +1,2 @@\n-def a():\n+def z():\n@@ -5 +6 @@\n-    return 1\n+    return 2\n",
+         "Hunk 1 has 1 old and 1 new lines, but its header says 1 and 2"),
+    ]:
+        try:
+            apply_unified_diff(text, diff)
+            raise AssertionError(f"applied: {diff!r}")
+        except PatchError as error:
+            assert str(error) == message
+
+
+if __name__ == "__main__":
+    test_search_replace_edits()
+    test_unified_diff()
+    test_conflicts_leave_file_unchanged()
+    test_hunks_apply_in_order()
+    print("Edit file tests completed!")
@@ -0,0 +1,109 @@
+"""
+Tests for the local fake LLM server and scripted client.
+
+This script tests:
+1. Agent.run_loop against the HTTP server through OpenAI(base_url=...), with and without streaming
+2. MeetingNotesAgent.chat against the server's Chat Completions endpoint
+3. ScriptedClient rules, latency and reported token counts
+4. Rules with a list of replies, and ScriptedClient streaming with a delay between items
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from openai import OpenAI
+
+import agentic_agent
+from fake_llm_server import ScriptedClient, ScriptedModel, start_server
+
+
+SCENARIO = {
+    "steps": [
+        {"tool_calls": [{"name": "write_file", "arguments": {"filepath": "a.txt", "content": "hi"}},
+                        {"name": "read_file", "arguments": {"filepath": "a.txt"}}]},
+        {"tool_calls": [{"name": "finish", "arguments": {"summary": "Wrote a.txt"}}]},
+    ],
+}
+
+
+def test_agent_over_http():
+    model = ScriptedModel(SCENARIO)
+    server, base_url = start_server(model)
+    try:
+        for stream in (False, True):
+            workdir = tempfile.mkdtemp(prefix="fake_llm_")
+            client = OpenAI(base_url=base_url, api_key="local")
+            agent = agentic_agent.Agent(working_directory=workdir, client=client, stream=stream)
+
+            assert agent.run_loop("Write a.txt") == "Wrote a.txt"
+            with open(os.path.join(workdir, "a.txt")) as file:
+                assert file.read() == "hi"
+    finally:
+        server.shutdown()
+
+    assert model.stats["responses"] == 4
+    assert model.stats["input_tokens"] > 0
+
+
+def test_meeting_notes_over_http():
+    import meeting_notes_agent
+
+    scenario = {"steps": [{"tool_calls": [{"name": "list_all_todos", "arguments": {}}]}],
+                "final": {"text": "You have no open to-dos."}}
+    model = ScriptedModel(scenario)
+    server, base_url = start_server(model)
+    try:
+        client = OpenAI(base_url=base_url, api_key="local")
+        agent = meeting_notes_agent.MeetingNotesAgent(client=client)
+        assert agent.chat("What are my to-dos?") == "You have no open to-dos."
+    finally:
+        server.shutdown()
+
+    assert model.stats["chat_completions"] == 2
+    assert [message["role"] for message in agent.conversation_history if isinstance(message, dict)][-1] == "tool"
+
+
+def test_scripted_client_rules_latency_and_tokens():
+    client = ScriptedClient({"rules": [{"when": "Is the goal achieved?", "text": "Yes"}]},
+                            latency_ms=50, output_tokens=7)
+
+    started = time.perf_counter()
+    response = client.responses.create(model="m", input=[{"role": "user", "content": "Is the goal achieved?"}])
+    assert time.perf_counter() - started >= 0.05
+
+    assert response.output_text == "Yes"
+    assert response.usage.output_tokens == 7
+    assert response.usage.input_tokens > 0
+    assert client.responses.create(model="m", input=[{"role": "user", "content": "Hello"}]).output_text == "Done."
+
+
+def test_scripted_client_replies_and_streaming():
+    client = ScriptedClient({"rules": [{"when": "Is the goal achieved?",
+                                        "replies": [{"text": "No"}, {"text": "Yes"}]}]}, item_delay_ms=100)
+    question = [{"role": "user", "content": "Is the goal achieved?"}]
+    assert [client.responses.create(model="m", input=question).output_text for _ in range(3)] == ["No", "Yes", "Yes"]
+
+    client = ScriptedClient(SCENARIO, item_delay_ms=100)
+    done = []
+    started = time.perf_counter()
+    for event in client.responses.create(model="m", input=[{"role": "user", "content": "Go"}], stream=True):
+        if event.type == "response.output_item.done":
+            done.append((event.item.name, time.perf_counter() - started))
+        last = event
+    assert [name for name, _ in done] == ["write_file", "read_file"]
+    assert done[1][1] - done[0][1] >= 0.1
+    assert last.type == "response.completed" and len(last.response.output) == 2
+
+
+if __name__ == "__main__":
+    test_agent_over_http()
+    test_meeting_notes_over_http()
+    test_scripted_client_rules_latency_and_tokens()
+    test_scripted_client_replies_and_streaming()
+    print("Fake LLM server tests completed!")
@@ -0,0 +1,102 @@
+"""
+Tests for ranged, size-capped file reads.
+
+This script tests:
+1. offset/limit/tail by line and by byte
+2. Reads over the cap end with a truncation marker and can be continued
+3. The agent's read_file tool passes ranges through and stays within the cap
+"""
+
+import json
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import agentic_agent
+from file_ranges import read_range
+
+
+def write_lines(count):
+    path = os.path.join(tempfile.mkdtemp(prefix="ranges_"), "log.txt")
+    with open(path, "w") as file:
+        file.writelines(f"line {number}\n" for number in range(1, count + 1))
+    return path
+
+
+def test_lines_and_bytes():
+    path = write_lines(100)
+
+    assert read_range(path, offset=10, limit=3) == "line 11\nline 12\nline 13\n"
+    assert read_range(path, tail=2) == "line 99\nline 100\n"
+    assert read_range(path, offset=98) == "line 99\nline 100\n"
+    assert read_range(path, offset=500) == ""
+    assert read_range(path, offset=0, limit=7, unit="bytes") == "line 1\n"
+    assert read_range(path, tail=4, unit="bytes") == "100\n"
+
+    empty = os.path.join(os.path.dirname(path), "empty.txt")
+    open(empty, "w").close()
+    assert read_range(empty) == ""
+
+    with pytest.raises(ValueError):
+        read_range(path, unit="pages")
+    with pytest.raises(ValueError):
+        read_range(path, limit=-1)
+
+
+def test_cap_and_continue():
+    path = write_lines(10_000)
+    size = os.path.getsize(path)
+
+    first = read_range(path, max_bytes=1000)
+    text, marker = first.rsplit("[Truncated", 1)
+    assert len(text) <= 1000
+    assert text.endswith("\n")
+    assert f"({size} byte) file" in marker
+    shown = text.count("\n")
+    assert f"continue with offset={shown}" in marker
+
+    second = read_range(path, offset=shown, limit=1)
+    assert second == f"line {shown + 1}\n"
+
+    last = read_range(path, tail=5000, max_bytes=1000)
+    assert "line 10000\n[Truncated: showed the last" in last
+    assert last.split("\n", 1)[0].startswith("line ")
+
+    # A single line longer than the cap is cut mid-line and continued by bytes
+    long_line = os.path.join(os.path.dirname(path), "long.txt")
+    with open(long_line, "w") as file:
+        file.write("x" * 5000)
+    cut = read_range(long_line, max_bytes=100)
+    assert cut.startswith("x" * 100 + "\n[Truncated")
+    assert "unit='bytes' and offset=100" in cut
+
+
+def test_agent_read_file_tool():
+    workdir = tempfile.mkdtemp(prefix="ranges_work_")
+    with open(os.path.join(workdir, "big.log"), "w") as file:
+        file.writelines(f"event {number}\n" for number in range(50_000))
+
+    agent = agentic_agent.Agent(working_directory=workdir, max_read_bytes=4096)
+    call = SimpleNamespace(type="function_call", call_id="c1", name="read_file",
+                           arguments=json.dumps({"filepath": "big.log", "tail": 2}))
+    assert json.loads(agent._tool_output(call)["output"])["result"] == "event 49998\nevent 49999\n"
+
+    whole = agent._read_file("big.log")
+    assert len(whole.encode()) < 4096 + 200
+    assert "[Truncated" in whole
+
+    assert agent._read_file("../outside.txt").startswith("Access denied")
+
+
+if __name__ == "__main__":
+    test_lines_and_bytes()
+    test_cap_and_continue()
+    test_agent_read_file_tool()
+    print("File range tests completed!")
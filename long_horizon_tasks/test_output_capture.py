@@ -0,0 +1,96 @@
+"""
+Tests for bounded command output capture.
+
+This script tests:
+1. Short output is returned unchanged with its byte and line counts
+2. Long output keeps its head and tail, and memory stays bounded while it streams
+3. execute_command spills long output to a file in the working directory
+4. Only the latest spill files are kept, none after the agent closes, and list_directory hides them
+"""
+
+import os
+import sys
+import tempfile
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import agentic_agent
+from output_capture import OutputCapture
+
+
+def test_short_output_unchanged():
+    capture = OutputCapture(head_bytes=16, tail_bytes=32)
+    capture.write(b"one\ntwo\n")
+    capture.write(b"three")
+    assert capture.text() == "one\ntwo\nthree"
+    assert capture.stats() == {"bytes": 13, "lines": 3, "truncated": False}
+
+
+def test_head_and_tail_of_long_output():
+    capture = OutputCapture(head_bytes=20, tail_bytes=30)
+    for number in range(10_000):
+        capture.write(f"line {number}\n".encode())
+        assert len(capture.head) + len(capture.tail) <= 20 + 2 * 30 + 16
+
+    text = capture.text()
+    assert text.startswith("line 0\nline 1\n")
+    assert text.endswith("line 9998\nline 9999\n")
+    head, marker, tail = text.partition("[... ")
+    omitted_lines = int(tail.split(" lines")[0].replace(",", ""))
+    kept = head.count("\n") + tail.split("...]\n", 1)[1].count("\n")
+    assert kept + omitted_lines == capture.lines == 10_000
+    assert capture.stats()["truncated"] and capture.total_bytes == sum(len(f"line {n}\n") for n in range(10_000))
+
+
+def test_execute_command_spills_long_output():
+    root = tempfile.mkdtemp(prefix="capture_")
+    for persistent_shell in (True, False):
+        agent = agentic_agent.Agent(working_directory=root, persistent_shell=persistent_shell)
+        try:
+            result = agent._execute_command("seq 1 200000; echo done >&2")
+            assert result["exit_code"] == 0
+            assert result["stdout_lines"] == 200_000
+            assert result["stdout_bytes"] == len("".join(f"{n}\n" for n in range(1, 200_001)))
+            assert len(result["stdout"]) < 20_000
+            assert result["stdout"].startswith("1\n2\n") and result["stdout"].endswith("199999\n200000\n")
+            assert result["stdout_file"] in result["stdout"]
+            assert result["stderr"] == "done\n" and "stderr_file" not in result
+
+            spilled = os.path.join(root, result["stdout_file"])
+            assert result["stdout_file"].startswith(".agent_output" + os.sep)
+            with open(spilled) as file:
+                assert file.read() == "".join(f"{n}\n" for n in range(1, 200_001))
+
+            result = agent._execute_command("printf 'a\\nb'")
+            assert (result["stdout"], result["stdout_bytes"], result["stdout_lines"]) == ("a\nb", 3, 2)
+            assert "stdout_file" not in result
+            assert os.path.exists(spilled)
+        finally:
+            agent.close()
+        # Closing deletes the agent's spill files
+        assert not os.path.exists(os.path.join(root, ".agent_output"))
+
+
+def test_spill_files_are_rotated_and_hidden():
+    root = tempfile.mkdtemp(prefix="capture_")
+    agent = agentic_agent.Agent(working_directory=root, persistent_shell=False)
+    try:
+        with mock.patch.object(agentic_agent, "MAX_COMMAND_OUTPUT_FILES", 2):
+            files = [agent._execute_command(f"seq {number} 100000")["stdout_file"] for number in range(1, 4)]
+        assert sorted(os.listdir(os.path.join(root, ".agent_output"))) == sorted(os.path.basename(path)
+                                                                               for path in files[1:])
+        assert agent._list_directory(".")["entries"] == []
+        assert agent._search_code("99999")["matches"] == []
+    finally:
+        agent.close()
+    assert os.listdir(root) == []
+
+
+if __name__ == "__main__":
+    test_short_output_unchanged()
+    test_head_and_tail_of_long_output()
+    test_execute_command_spills_long_output()
+    test_spill_files_are_rotated_and_hidden()
+    print("Output capture tests completed!")
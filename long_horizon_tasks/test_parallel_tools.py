@@ -0,0 +1,131 @@
+"""
+Tests for concurrent dispatch of the tool calls in a single model turn.
+
+This script tests:
+1. Independent calls run concurrently and outputs keep the original call order
+2. Calls that touch the same path keep their original order
+3. Sequential mode still works when parallel_tools is disabled
+4. Concurrent execute_command calls don't queue behind the persistent shell session
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from agentic_agent import Agent
+
+
+def function_call(call_id, name, **arguments):
+    return SimpleNamespace(
+        type="function_call",
+        call_id=call_id,
+        name=name,
+        arguments=json.dumps(arguments),
+    )
+
+
+def test_independent_calls_run_concurrently_in_call_order():
+    agent = Agent(working_directory=tempfile.mkdtemp(prefix="agent_parallel_"))
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def slow_command(command, timeout=30):
+        with lock:
+            running.append(command)
+            peak.append(len(running))
+        time.sleep(0.2)
+        with lock:
+            running.remove(command)
+        return {"command": command, "exit_code": 0}
+
+    agent._execute_command = slow_command
+    calls = [function_call(f"call_{i}", "execute_command", command=f"cmd {i}") for i in range(5)]
+
+    start = time.perf_counter()
+    outputs = agent._run_tool_calls(calls)
+    elapsed = time.perf_counter() - start
+
+    assert [output["call_id"] for output in outputs] == [f"call_{i}" for i in range(5)]
+    assert json.loads(outputs[3]["output"])["result"]["command"] == "cmd 3"
+    assert max(peak) > 1
+    assert elapsed < 0.8
+
+
+def test_same_path_calls_keep_their_order():
+    agent = Agent(working_directory=tempfile.mkdtemp(prefix="agent_parallel_"))
+    calls = [
+        function_call("call_1", "write_file", filepath="notes/a.txt", content="first"),
+        function_call("call_2", "write_file", filepath="notes/a.txt", content="second"),
+        function_call("call_3", "read_file", filepath="notes/a.txt"),
+        function_call("call_4", "move_file", source_path="notes/a.txt", destination_path="notes/b.txt"),
+        function_call("call_5", "list_directory", path="notes"),
+    ]
+
+    outputs = agent._run_tool_calls(calls)
+    results = [json.loads(output["output"])["result"] for output in outputs]
+
+    assert results[2] == "second"
+    assert results[4]["entries"] == ["b.txt"]
+
+
+def test_sequential_mode():
+    agent = Agent(working_directory=tempfile.mkdtemp(prefix="agent_parallel_"), parallel_tools=False)
+    calls = [
+        function_call("call_1", "make_directory", path="docs"),
+        function_call("call_2", "list_directory", path="."),
+        function_call("call_3", "unknown_tool"),
+    ]
+
+    outputs = agent._run_tool_calls(calls)
+
+    assert [output["call_id"] for output in outputs] == ["call_1", "call_2", "call_3"]
+    assert json.loads(outputs[1]["output"])["result"]["entries"] == ["docs"]
+    assert json.loads(outputs[2]["output"])["result"] == "Error: Unknown tool unknown_tool"
+
+
+def test_concurrent_commands_share_the_shell_session():
+    root = os.path.realpath(tempfile.mkdtemp(prefix="agent_parallel_"))
+    os.makedirs(os.path.join(root, "src"))
+    agent = Agent(working_directory=root)
+    try:
+        agent._execute_command("cd src && export STAGE=build")
+        calls = [function_call(f"call_{i}", "execute_command", command=f"sleep 0.5; echo {i} $STAGE; pwd")
+                 for i in range(3)]
+
+        start = time.perf_counter()
+        outputs = agent._run_tool_calls(calls)
+        elapsed = time.perf_counter() - start
+        results = [json.loads(output["output"])["result"] for output in outputs]
+
+        assert elapsed < 1.2
+        assert [output["call_id"] for output in outputs] == ["call_0", "call_1", "call_2"]
+        # One call ran in the session; the others ran beside it in the session's directory
+        in_session = [result for result in results if "note" not in result]
+        assert len(in_session) == 1 and in_session[0]["stdout"].split("\n")[0].endswith(" build")
+        for result in results:
+            assert result["exit_code"] == 0
+            assert result["cwd"] == os.path.join(root, "src")
+            assert result["stdout"].endswith(os.path.join(root, "src") + "\n")
+            if result is not in_session[0]:
+                assert "busy" in result["note"] and "build" not in result["stdout"]
+
+        # The session itself kept its state
+        assert agent._execute_command("echo $STAGE")["stdout"] == "build\n"
+    finally:
+        agent.close()
+
+
+if __name__ == "__main__":
+    test_independent_calls_run_concurrently_in_call_order()
+    test_same_path_calls_keep_their_order()
+    test_sequential_mode()
+    test_concurrent_commands_share_the_shell_session()
+    print("Parallel tool tests completed!")
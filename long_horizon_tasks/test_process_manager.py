@@ -0,0 +1,144 @@
+"""
+Tests for the background process tools.
+
+This script tests:
+1. Logs are read incrementally by offset and exited processes are reaped
+2. wait_for_port returns once a server listens, or early when it dies
+3. stop_process stops the whole process group and close() stops the rest
+4. Stopping waits on the process itself, then probes only its group, less and less often
+"""
+
+import os
+import socket
+import sys
+import tempfile
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import agentic_agent
+import process_manager
+from process_manager import ProcessManager, _group_alive
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_incremental_logs_and_reaping():
+    root = tempfile.mkdtemp(prefix="processes_")
+    agent = agentic_agent.Agent(working_directory=root)
+    try:
+        script = "echo first; sleep 0.3; echo second; exit 4"
+        started = agent._execute_background_command(script, log_file="logs/job.log")
+        pid = started["pid"]
+
+        assert wait_until(lambda: agent._read_process_log(pid)["output"] == "first\n")
+        first = agent._read_process_log(pid)
+        assert first["status"] == "running"
+
+        assert wait_until(lambda: agent.processes.get(pid).ended is not None)
+        rest = agent._read_process_log(pid, since_offset=first["offset"])
+        assert rest["output"] == "second\n"
+        assert rest["status"] == "exited" and rest["exit_code"] == 4
+
+        # Reaped: no zombie is left behind for the PID
+        assert not os.path.exists(f"/proc/{pid}") or open(f"/proc/{pid}/stat").read().split()[2] != "Z"
+        assert os.path.exists(os.path.join(root, "logs", "job.log"))
+
+        # Without a log file the output goes to a private log
+        quiet = agent._execute_background_command("printf 'line %s\\n' 1 2 3")["pid"]
+        assert wait_until(lambda: agent.processes.get(quiet).ended is not None)
+        assert agent._read_process_log(quiet)["output"] == "line 1\nline 2\nline 3\n"
+        assert [entry["pid"] for entry in agent._list_processes()["processes"]] == [pid, quiet]
+        assert agent._read_process_log(1).startswith("Error: No background process")
+    finally:
+        agent.close()
+
+
+def test_read_log_stops_at_line_end():
+    manager = ProcessManager(tempfile.mkdtemp(prefix="processes_"))
+    try:
+        pid = manager.start("printf 'aaaa\\nbbbb\\ncccc\\n'").pid
+        assert wait_until(lambda: manager.get(pid).ended is not None)
+        chunk = manager.read_log(pid, 0, max_bytes=12)
+        assert chunk["output"] == "aaaa\nbbbb\n" and chunk["truncated"]
+        assert manager.read_log(pid, chunk["offset"])["output"] == "cccc\n"
+    finally:
+        manager.close()
+
+
+def test_wait_for_port_and_stop():
+    root = tempfile.mkdtemp(prefix="processes_")
+    agent = agentic_agent.Agent(working_directory=root)
+    port = free_port()
+    try:
+        server = agent._execute_background_command(f"{sys.executable} -m http.server {port} --bind 127.0.0.1")
+        ready = agent._wait_for_port(port, timeout=10, pid=server["pid"])
+        assert ready["ready"], ready
+
+        crashed = agent._execute_background_command("echo 'address in use' >&2; exit 1")
+        result = agent._wait_for_port(free_port(), timeout=10, pid=crashed["pid"])
+        assert not result["ready"] and result["exit_code"] == 1
+        assert result["log_tail"] == "address in use\n"
+        assert result["waited_seconds"] < 5
+
+        stopped = agent._stop_process(server["pid"])
+        assert stopped["status"] == "stopped"
+        assert not agent._wait_for_port(port, timeout=0.2)["ready"]
+
+        # A shell with a child: stopping the group takes both down
+        sleeper = agent._execute_background_command("sleep 60 & wait")["pid"]
+        agent.close()
+        assert agent.processes.get(sleeper).ended is not None
+        assert not _group_alive(sleeper)
+    finally:
+        agent.close()
+
+
+def test_stop_probes_only_the_group():
+    manager = ProcessManager(tempfile.mkdtemp(prefix="processes_"))
+    try:
+        # The shell exits on SIGTERM at once; its child lingers until it is reaped
+        pid = manager.start("sleep 60 & wait").pid
+        time.sleep(0.2)
+        probes = []
+        killpg = os.killpg
+
+        def record_probe(pgid, sig):
+            if sig == 0:
+                probes.append(pgid)
+            return killpg(pgid, sig)
+
+        with mock.patch.object(process_manager.os, "killpg", side_effect=record_probe), \
+                mock.patch.object(process_manager.os, "listdir", side_effect=AssertionError("scanned /proc")):
+            started = time.monotonic()
+            stopped = manager.stop(pid, timeout=5)
+            elapsed = time.monotonic() - started
+
+        assert stopped["status"] == "stopped"
+        assert not _group_alive(pid)
+        assert set(probes) == {pid}
+        # Backing off from 10 ms to 250 ms: a handful of probes, not one every 20 ms
+        assert len(probes) < 5 + elapsed / 0.25
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    test_incremental_logs_and_reaping()
+    test_read_log_stops_at_line_end()
+    test_wait_for_port_and_stop()
+    test_stop_probes_only_the_group()
+    print("Process manager tests completed!")
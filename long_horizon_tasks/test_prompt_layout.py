@@ -0,0 +1,77 @@
+"""
+Tests for the cache-friendly prompt layout used by the plan/act/check loop.
+
+This script tests:
+1. Every request starts with the same tools + system prompt prefix
+2. Phase instructions are appended at the end instead of re-sending the system prompt
+3. The prefix-cacheable token estimate for consecutive requests
+"""
+
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import agentic_agent
+from prompt_layout import MIN_CACHEABLE_TOKENS, PromptLayout
+
+
+class RecordingResponses:
+    def __init__(self):
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return SimpleNamespace(output=[], output_text="Yes", usage=None)
+
+
+def test_requests_share_a_fixed_prefix(monkeypatch):
+    responses = RecordingResponses()
+    monkeypatch.setattr(agentic_agent, "client", SimpleNamespace(responses=responses))
+    agent = agentic_agent.Agent(working_directory=tempfile.mkdtemp(prefix="agent_layout_"))
+
+    agent.run("Write a README")
+
+    # plan, act, check and summary each make a tool turn and a results call
+    assert len(responses.requests) == 8
+    for request in responses.requests:
+        assert "instructions" not in request
+        assert request["tools"] is agentic_agent.TOOLS.schemas
+        assert request["input"][0] == {"role": "system", "content": agent.system_prompt}
+        later_items = [str(item.get("content")) for item in request["input"][1:]]
+        assert not any(agent.system_prompt in content for content in later_items)
+
+    # The tool-results instruction is sent last and never stored in memory
+    assert responses.requests[1]["input"][-1] == {
+        "role": "developer",
+        "content": agentic_agent.TOOL_RESULTS_INSTRUCTION,
+    }
+    assert all(item.get("role") != "developer" for item in agent.memory)
+
+    # Each request repeats everything the previous one sent, except the transient instruction
+    calls = agent.prompt_layout.calls
+    assert calls[2]["prefix_items"] == len(responses.requests[1]["input"]) - 1
+
+
+def test_cacheable_estimate():
+    layout = PromptLayout("test-model")
+    system = {"role": "system", "content": "x" * (MIN_CACHEABLE_TOKENS * 8)}
+    tools = [{"type": "function", "name": "noop"}]
+
+    first = layout.measure(layout.build(tools, [system, {"role": "user", "content": "one"}]))
+    second = layout.measure(layout.build(tools, [system, {"role": "user", "content": "two"}], "Plan."))
+
+    assert first["prefix_tokens"] == 0
+    assert second["prefix_items"] == 1
+    assert second["prefix_tokens"] > MIN_CACHEABLE_TOKENS * 2
+    assert second["cacheable_tokens"] % 128 == 0
+    assert 0 < second["cacheable_tokens"] <= second["prefix_tokens"] < second["input_tokens"]
+    assert layout.totals()["calls"] == 2
+
+
+if __name__ == "__main__":
+    test_cacheable_estimate()
+    print("Prompt layout tests completed!")
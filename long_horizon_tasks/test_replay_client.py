@@ -0,0 +1,124 @@
+"""
+Tests for the record/replay cache for model calls.
+
+This script tests:
+1. A recorded Agent.run_loop replays offline with identical results, in another working directory
+2. MeetingNotesAgent.chat replays through chat.completions
+3. Replay misses and passthrough mode
+4. Request keys leave out timing fields and generated file names of tool results
+"""
+
+import json
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from openai.types.chat import ChatCompletion
+from openai.types.responses import Response
+
+import agentic_agent
+from replay_client import ReplayClient, ReplayMiss, request_key
+
+
+def make_response(number, name, arguments):
+    return Response.model_validate({
+        "id": f"resp_{number}", "created_at": 0, "model": "test", "object": "response",
+        "parallel_tool_calls": True, "tool_choice": "auto", "tools": [],
+        "output": [{"type": "function_call", "id": f"fc_{number}", "call_id": f"call_{number}",
+                    "name": name, "arguments": json.dumps(arguments)}],
+    })
+
+
+class LiveResponses:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **request):
+        self.calls += 1
+        if self.calls == 1:
+            return make_response(1, "write_file", {"filepath": "a.txt", "content": "hi"})
+        return make_response(2, "finish", {"summary": "Wrote a.txt"})
+
+
+def test_record_then_replay_agent_run():
+    store = tempfile.mkdtemp(prefix="replay_store_")
+    workdir = tempfile.mkdtemp(prefix="replay_work_")
+    live = SimpleNamespace(responses=LiveResponses())
+
+    recorder = ReplayClient(live, store, mode="record")
+    recorded = agentic_agent.Agent(working_directory=workdir, client=recorder).run_loop("Write a.txt")
+    assert recorded == "Wrote a.txt"
+    assert recorder.stats == {"hits": 0, "recorded": 2, "live": 2}
+
+    # Replayed in another checkout: the system prompt and tool results name a different directory
+    replayer = ReplayClient(None, store, mode="replay")
+    elsewhere = tempfile.mkdtemp(prefix="replay_other_")
+    replayed = agentic_agent.Agent(working_directory=elsewhere, client=replayer).run_loop("Write a.txt")
+    assert replayed == recorded
+    assert replayer.stats == {"hits": 2, "recorded": 0, "live": 0}
+    assert live.responses.calls == 2
+    with open(os.path.join(elsewhere, "a.txt")) as file:
+        assert file.read() == "hi"
+
+
+def test_replay_meeting_notes_chat():
+    import meeting_notes_agent
+
+    store = tempfile.mkdtemp(prefix="replay_store_")
+    completion = ChatCompletion.model_validate({
+        "id": "chat_1", "created": 0, "model": "test", "object": "chat.completion",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": "No meetings yet."}}],
+    })
+    live = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **request: completion)))
+
+    agent = meeting_notes_agent.MeetingNotesAgent(client=ReplayClient(live, store, mode="record"))
+    assert agent.chat("Any meetings?") == "No meetings yet."
+
+    agent = meeting_notes_agent.MeetingNotesAgent(client=ReplayClient(None, store, mode="replay"))
+    assert agent.chat("Any meetings?") == "No meetings yet."
+
+
+def test_miss_and_passthrough():
+    store = tempfile.mkdtemp(prefix="replay_store_")
+    with pytest.raises(ReplayMiss):
+        ReplayClient(None, store, mode="replay").responses.create(model="m", input=[])
+
+    live = SimpleNamespace(responses=LiveResponses())
+    client = ReplayClient(live, store, mode="passthrough")
+    client.responses.create(model="m", input=[])
+    assert client.stats["live"] == 1
+    assert os.listdir(store) == []
+
+    # Keys are stable for equal requests regardless of dict ordering
+    assert request_key("responses", {"model": "m", "input": [{"a": 1, "b": 2}]}) == \
+        request_key("responses", {"input": [{"b": 2, "a": 1}], "model": "m"})
+
+
+def test_keys_leave_out_volatile_fields():
+    def request(seconds, spill_name):
+        output = {"result": {"passed": 3, "duration_seconds": seconds, "slowest": [{"test": "t", "seconds": seconds}],
+                             "stdout_file": f".agent_output/{spill_name}.stdout.log"}}
+        return {"model": "m", "input": [{"type": "function_call_output", "call_id": "call_1",
+                                         "output": json.dumps(output)}]}
+
+    assert request_key("responses", request(1.5, "20250101-120000-1a2b3c4d")) == \
+        request_key("responses", request(0.25, "20261018-093000-9f8e7d6c"))
+    changed = request(1.5, "20250101-120000-1a2b3c4d")
+    changed["input"][0]["output"] = changed["input"][0]["output"].replace('"passed": 3', '"passed": 2')
+    assert request_key("responses", changed) != request_key("responses", request(1.5, "20250101-120000-1a2b3c4d"))
+
+
+if __name__ == "__main__":
+    test_record_then_replay_agent_run()
+    test_replay_meeting_notes_chat()
+    test_miss_and_passthrough()
+    test_keys_leave_out_volatile_fields()
+    print("Replay client tests completed!")
@@ -0,0 +1,77 @@
+"""
+Tests for the single-loop fast mode (Agent.run_loop).
+
+This script tests:
+1. The loop keeps calling the model while it emits function calls
+2. The finish tool ends the run with its summary
+3. The plan/act/check cycle is still the default mode
+4. A long loop keeps every request within max_input_tokens
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import agentic_agent
+from bench_run_modes import bench, step_files_scenario
+from fake_llm_server import ScriptedClient
+
+
+def make_agent(client):
+    return agentic_agent.Agent(
+        working_directory=tempfile.mkdtemp(prefix="agent_loop_"),
+        client=client,
+    )
+
+
+def test_loop_runs_until_finish():
+    client = ScriptedClient(step_files_scenario(steps=3))
+    agent = make_agent(client)
+
+    summary = agent.run("Write three step files.", mode="loop")
+
+    assert summary == "All steps written."
+    assert client.model.stats["responses"] == 4
+    assert sorted(os.listdir(os.path.join(agent.working_directory, "notes"))) == [
+        "step_0.md", "step_1.md", "step_2.md"
+    ]
+    outputs = [item for item in agent.memory if isinstance(item, dict) and item.get("type") == "function_call_output"]
+    assert len(outputs) == 4
+
+
+def test_loop_stops_when_model_answers_without_tools():
+    agent = make_agent(ScriptedClient({"final": {"text": "Nothing to do."}}))
+
+    assert agent.run_loop("Say hello.") == "Nothing to do."
+
+
+def test_plan_mode_is_default():
+    client = ScriptedClient(step_files_scenario(steps=1))
+    agent = make_agent(client)
+
+    agent.run("Write one step file.")
+
+    # plan, act, check and summary: each a tool turn plus a results call
+    assert client.model.stats["responses"] == 8
+    assert os.path.exists(os.path.join(agent.working_directory, "notes", "step_0.md"))
+
+
+def test_long_loop_stays_within_budget():
+    # 60 turns of 5 KB writes would be about 80k tokens by the end without compaction
+    result = bench("loop", steps=60, latency=0, content_bytes=5_000, max_input_tokens=8_000)
+
+    assert result["round_trips"] == 61
+    assert result["within_budget"]
+    assert result["largest_request_tokens"] <= 8_000
+
+
+if __name__ == "__main__":
+    test_loop_runs_until_finish()
+    test_loop_stops_when_model_answers_without_tools()
+    test_plan_mode_is_default()
+    test_long_loop_stays_within_budget()
+    print("Run loop tests completed!")
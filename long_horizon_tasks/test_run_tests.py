@@ -0,0 +1,162 @@
+"""
+Tests for the run_tests tool.
+
+This script tests:
+1. Results come back as counts, failures with tracebacks and the slowest tests
+2. affected=True reruns only the test files that import what changed
+3. The import graph follows relative imports, packages and conftest.py
+4. Tests run under the virtualenv activated in the shell session, not the agent's interpreter
+5. None of the agent's own modules are importable from the project's tests
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import agentic_agent
+from import_graph import ImportGraph
+from pytest_runner import find_python
+
+
+FILES = {
+    "pytest.ini": "[pytest]\ntestpaths = tests\n",
+    "shop/__init__.py": "",
+    "shop/prices.py": "def total(items):\n    return sum(items)\n",
+    "shop/cart.py": "from .prices import total\n\ndef checkout(items):\n    return total(items)\n",
+    "shop/emails.py": "def greeting(name):\n    return f'Hello {name}'\n",
+    "tests/conftest.py": "import os, sys\nsys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))\n",
+    "tests/test_cart.py": ("from shop.cart import checkout\n\n"
+                           "def test_checkout():\n    assert checkout([1, 2]) == 3\n\n"
+                           "def test_empty():\n    assert checkout([]) == 0\n"),
+    "tests/test_emails.py": ("import pytest\nfrom shop import emails\n\n"
+                             "def test_greeting():\n    assert emails.greeting('Ann') == 'Hello Ann'\n\n"
+                             "@pytest.mark.skip(reason='not yet')\ndef test_later():\n    pass\n"),
+}
+
+
+def make_project():
+    root = tempfile.mkdtemp(prefix="run_tests_")
+    for name, content in FILES.items():
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(content)
+    return root
+
+
+def test_structured_results():
+    agent = agentic_agent.Agent(working_directory=make_project())
+
+    result = agent._run_tests()
+    assert (result["passed"], result["failed"], result["errors"], result["skipped"]) == (3, 0, 0, 1)
+    assert result["exit_code"] == 0 and result["failures"] == []
+    assert len(result["slowest"]) == 4
+
+    agent._write_file("shop/prices.py", "def total(items):\n    return sum(items) + 1\n")
+    result = agent._run_tests(keyword="cart")
+    assert (result["passed"], result["failed"]) == (0, 2)
+    assert result["failures"][0]["test"] == "tests/test_cart.py::test_checkout"
+    assert "assert 4 == 3" in result["failures"][0]["message"]
+
+    result = agent._run_tests(tests=["tests/test_cart.py::test_empty"])
+    assert result["failed"] == 1 and result["passed"] == 0
+    assert agent._run_tests(tests=["../elsewhere"]).startswith("Access denied")
+
+
+def test_affected_selection():
+    root = make_project()
+    agent = agentic_agent.Agent(working_directory=root)
+
+    # The first run is the baseline, so everything counts as changed
+    assert agent._run_tests(affected=True)["selection"]["test_files"] == [
+        os.path.join("tests", "test_cart.py"), os.path.join("tests", "test_emails.py")]
+    assert "No tests are affected" in agent._run_tests(affected=True)["message"]
+
+    agent._write_file("shop/prices.py", "def total(items):\n    return sum(items)  # same\n")
+    result = agent._run_tests(affected=True)
+    assert result["selection"] == {"changed_files": 1, "test_files": [os.path.join("tests", "test_cart.py")]}
+    assert result["passed"] == 2
+
+    # Changed by a shell command, outside write_file
+    agent._execute_command("echo '# edited' >> shop/emails.py")
+    result = agent._run_tests(affected=True)
+    assert result["selection"]["test_files"] == [os.path.join("tests", "test_emails.py")]
+    assert (result["passed"], result["skipped"]) == (1, 1)
+    agent.close()
+
+
+def test_import_graph():
+    root = os.path.realpath(make_project())
+    graph = ImportGraph(root)
+    path = lambda name: os.path.join(root, name)
+
+    assert graph.dependencies(path("shop/cart.py")) == {path("shop/prices.py"), path("shop/__init__.py")}
+    assert graph.affected_tests([path("shop/__init__.py")]) == {path("tests/test_cart.py"), path("tests/test_emails.py")}
+    assert graph.affected_tests([path("tests/conftest.py")]) == {path("tests/test_cart.py"), path("tests/test_emails.py")}
+
+    os.remove(path("shop/prices.py"))
+    graph.mark_stale()
+    assert path("shop/prices.py") in graph.take_changed()
+    assert graph.affected_tests([path("shop/prices.py")]) == {path("tests/test_cart.py")}
+
+
+def make_virtualenv(root):
+    """A fake virtualenv whose python records that it ran, then runs this interpreter."""
+    bin_dir = os.path.join(root, "venv", "bin")
+    os.makedirs(bin_dir)
+    python = os.path.join(bin_dir, "python")
+    with open(python, "w") as file:
+        file.write(f'#!/bin/sh\necho "$@" >> "{root}/venv/used.log"\nexec "{sys.executable}" "$@"\n')
+    os.chmod(python, 0o755)
+    return python
+
+
+def test_session_virtualenv_interpreter():
+    root = os.path.realpath(make_project())
+    python = make_virtualenv(root)
+    agent = agentic_agent.Agent(working_directory=root)
+    try:
+        # Without an activated virtualenv, python on the agent's PATH runs the tests
+        result = agent._run_tests()
+        assert result["python"] == find_python(os.environ)
+        assert not os.path.exists(os.path.join(root, "venv", "used.log"))
+
+        # The same as `source venv/bin/activate`
+        agent._execute_command('export VIRTUAL_ENV="$PWD/venv" PATH="$PWD/venv/bin:$PATH"')
+        result = agent._run_tests(keyword="cart")
+        assert result["python"] == python
+        assert result["passed"] == 2
+        with open(os.path.join(root, "venv", "used.log")) as file:
+            assert file.read().startswith("-m pytest -p agent_pytest_report")
+    finally:
+        agent.close()
+
+    # Without VIRTUAL_ENV, the first python on PATH
+    assert find_python({"PATH": os.path.dirname(python)}) == python
+    assert find_python({"PATH": "", "VIRTUAL_ENV": "/nonexistent"}) == sys.executable
+
+
+def test_agent_modules_do_not_shadow_the_project():
+    root = make_project()
+    with open(os.path.join(root, "tests", "test_imports.py"), "w") as file:
+        file.write("import importlib.util\n\n"
+                   "def test_agent_modules_not_importable():\n"
+                   "    for name in ('pytest_runner', 'sandbox_fs', 'tracing', 'patching'):\n"
+                   "        assert importlib.util.find_spec(name) is None, name\n")
+    agent = agentic_agent.Agent(working_directory=root)
+
+    result = agent._run_tests(tests=["tests/test_imports.py"])
+    assert (result["passed"], result["failed"]) == (1, 0), result["failures"]
+    agent.close()
+
+
+if __name__ == "__main__":
+    test_structured_results()
+    test_affected_selection()
+    test_import_graph()
+    test_session_virtualenv_interpreter()
+    test_agent_modules_do_not_shadow_the_project()
+    print("Run tests tool tests completed!")
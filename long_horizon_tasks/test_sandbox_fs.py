@@ -0,0 +1,161 @@
+"""
+Tests for the sandboxed file operations behind the agent's file tools.
+
+This script tests:
+1. Validated directories are cached, so repeated operations don't walk the path again
+2. A directory swapped for a symlink after validation is not followed outside
+3. Symlinks that stay inside the working directory still work through the tools
+4. A background command's log file is created through the sandbox too
+5. A directory deleted and recreated by something other than the file tools is walked again
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import agentic_agent
+from sandbox_fs import Sandbox, SandboxError
+
+
+def make_tree():
+    root = tempfile.mkdtemp(prefix="sandbox_")
+    outside = tempfile.mkdtemp(prefix="outside_")
+    os.makedirs(os.path.join(root, "docs", "guides"))
+    with open(os.path.join(root, "docs", "guides", "setup.md"), "w") as file:
+        file.write("inside\n")
+    return root, outside
+
+
+def test_validated_directories_are_cached():
+    root, _ = make_tree()
+    sandbox = Sandbox(root)
+
+    path = sandbox.resolve("docs/guides/setup.md")
+    assert path == os.path.join(root, "docs", "guides", "setup.md")
+    assert sandbox.stats["opened"] == 2  # docs and docs/guides
+
+    for _ in range(5):
+        assert sandbox.resolve("docs/guides/setup.md") == path
+        descriptor = sandbox.open("docs/guides/setup.md")
+        assert os.read(descriptor, 100) == b"inside\n"
+        os.close(descriptor)
+    assert sandbox.stats["opened"] == 2
+
+    # Operations through the cache still see new files, and forgetting the cache re-walks
+    sandbox.makedirs("docs/guides/extra/deep")
+    assert sorted(sandbox.listdir("docs/guides")) == ["extra", "setup.md"]
+    sandbox.invalidate()
+    sandbox.resolve("docs/guides/setup.md")
+    assert sandbox.stats["opened"] == 6
+
+    assert sandbox.resolve("missing/dir/file.txt") == os.path.join(root, "missing", "dir", "file.txt")
+    for escape in ("../elsewhere", "/etc/passwd", "docs/../../elsewhere"):
+        try:
+            sandbox.resolve(escape)
+            assert False, escape
+        except SandboxError:
+            pass
+    sandbox.close()
+
+
+def test_swapped_directory_is_not_followed():
+    root, outside = make_tree()
+    os.makedirs(os.path.join(outside, "guides"))
+    with open(os.path.join(outside, "guides", "setup.md"), "w") as file:
+        file.write("secret\n")
+    agent = agentic_agent.Agent(working_directory=root)
+
+    # Validated while docs/ is a real directory ...
+    is_valid, path, _ = agent._validate_path("docs/guides/setup.md")
+    assert is_valid
+
+    # ... then docs/ is replaced by a symlink out of the sandbox (as a command might)
+    os.rename(os.path.join(root, "docs"), os.path.join(root, "old_docs"))
+    os.symlink(outside, os.path.join(root, "docs"))
+    agent._files_changed()
+
+    descriptor = None
+    try:
+        descriptor = agent.sandbox.open(path)
+    except SandboxError:
+        pass
+    assert descriptor is None
+    assert agent._read_file("docs/guides/setup.md").startswith("Access denied")
+    assert "secret" not in agent._read_file(path)
+    assert agent._write_file(path, "overwritten").startswith("Access denied")
+    with open(os.path.join(outside, "guides", "setup.md")) as file:
+        assert file.read() == "secret\n"
+
+    # The final component swapped for a symlink is caught too
+    os.symlink(os.path.join(outside, "guides", "setup.md"), os.path.join(root, "notes.md"))
+    assert "secret" not in agent._read_file(os.path.join(root, "notes.md"))
+    agent.close()
+
+
+def test_inside_symlinks_still_work():
+    root, _ = make_tree()
+    os.symlink(os.path.join(root, "docs", "guides"), os.path.join(root, "guides"))
+    agent = agentic_agent.Agent(working_directory=root)
+
+    assert agent._read_file("guides/setup.md") == "inside\n"
+    assert agent._validate_path("guides/setup.md")[1] == os.path.join(root, "docs", "guides", "setup.md")
+    assert agent._write_file("guides/new.md", "new\n").startswith("Successfully")
+    assert agent._edit_file("guides/new.md", edits=[{"search": "new", "replace": "newer"}])["lines"] == 1
+    assert agent._move_file("guides/new.md", "archive/2024/new.md").startswith("Successfully")
+    with open(os.path.join(root, "archive", "2024", "new.md")) as file:
+        assert file.read() == "newer\n"
+    assert agent._list_directory("guides")["entries"] == ["setup.md"]
+    assert sorted(agent._list_directory(".")["entries"]) == ["archive", "docs", "guides"]
+    agent.close()
+
+
+def test_background_log_is_not_followed_outside():
+    root, outside = make_tree()
+    agent = agentic_agent.Agent(working_directory=root)
+    make_directories = agent.sandbox.makedirs
+
+    def swap_after_creating(path):
+        # logs/ is replaced by a symlink out of the sandbox between creation and open
+        make_directories(path)
+        os.rename(os.path.join(root, "logs"), os.path.join(root, "old_logs"))
+        os.symlink(outside, os.path.join(root, "logs"))
+
+    with mock.patch.object(agent.sandbox, "makedirs", side_effect=swap_after_creating):
+        started = agent._execute_background_command("echo kept", log_file="logs/job.log")
+    # The swap is noticed when the log is opened, and the symlink is not followed
+    assert "outside allowed directory" in started["error"] and "pid" not in started
+    assert os.listdir(outside) == [] and os.listdir(os.path.join(root, "old_logs")) == []
+    agent.close()
+
+
+def test_recreated_directory_is_walked_again():
+    root, _ = make_tree()
+    agent = agentic_agent.Agent(working_directory=root)
+    os.makedirs(os.path.join(root, "build"))
+    with open(os.path.join(root, "build", "a.txt"), "w") as file:
+        file.write("old\n")
+    assert agent._read_file("build/a.txt") == "old\n"
+
+    # Replaced behind the file tools' back (a background process, a test run), so no invalidate()
+    shutil.rmtree(os.path.join(root, "build"))
+    os.makedirs(os.path.join(root, "build"))
+    assert agent._list_directory("build")["entries"] == []
+    assert agent._write_file("build/b.txt", "new\n").startswith("Successfully")
+    assert agent._read_file("build/b.txt") == "new\n"
+    assert agent._list_directory("build")["entries"] == ["b.txt"]
+    assert agent.sandbox.stats["stale"] == 1
+    agent.close()
+
+
+if __name__ == "__main__":
+    test_validated_directories_are_cached()
+    test_swapped_directory_is_not_followed()
+    test_inside_symlinks_still_work()
+    test_background_log_is_not_followed_outside()
+    test_recreated_directory_is_walked_again()
+    print("\nAll sandbox tests completed!")
@@ -0,0 +1,111 @@
+"""
+Tests for the persistent shell session behind execute_command.
+
+This script tests:
+1. cd, exported variables and exit codes carry over between commands
+2. A timed-out command is killed and the next one runs in a fresh shell in the same directory
+3. A command that exits the shell reports its exit code and the session recovers
+4. run(wait=False) returns None at once while another command is running
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import agentic_agent
+from shell_session import ShellSession, ansi_c_quote
+
+
+def test_state_persists_between_commands():
+    root = os.path.realpath(tempfile.mkdtemp(prefix="shell_"))
+    os.makedirs(os.path.join(root, "src"))
+    agent = agentic_agent.Agent(working_directory=root)
+    try:
+        result = agent._execute_command("cd src && export GREETING='hello there'")
+        assert result["exit_code"] == 0
+        assert result["cwd"] == os.path.join(root, "src")
+
+        result = agent._execute_command("echo \"$GREETING\" from $(basename $PWD); echo oops >&2; false")
+        assert result["exit_code"] == 1
+        assert result["stdout"] == "hello there from src\n"
+        assert result["stderr"] == "oops\n"
+
+        # Quotes, backslashes and non-ASCII text reach the shell unchanged
+        command = "printf '%s' \"it's \\\\ $((1 + 1)) ü\""
+        assert agent._execute_command(command)["stdout"] == "it's \\ 2 ü"
+        assert ansi_c_quote("a'b") == "$'a\\x27b'"
+
+        # Commands don't wait on stdin
+        assert agent._execute_command("cat; echo done")["stdout"] == "done\n"
+    finally:
+        agent.close()
+
+
+def test_timeout_restarts_in_same_directory():
+    root = os.path.realpath(tempfile.mkdtemp(prefix="shell_"))
+    os.makedirs(os.path.join(root, "build"))
+    session = ShellSession(root)
+    try:
+        session.run("cd build && export MODE=fast")
+        started = time.monotonic()
+        result = session.run("sleep 30", timeout=0.5)
+        assert result["timed_out"] and result["exit_code"] is None
+        assert time.monotonic() - started < 5
+
+        result = session.run("echo \"[$MODE]\"; pwd")
+        assert result["restarted"]
+        assert result["stdout"].text() == f"[]\n{os.path.join(root, 'build')}\n"
+        assert session.run("true")["restarted"] is False
+        assert session.restarts == 1
+    finally:
+        session.close()
+
+
+def test_exit_and_recovery():
+    root = os.path.realpath(tempfile.mkdtemp(prefix="shell_"))
+    agent = agentic_agent.Agent(working_directory=root)
+    try:
+        result = agent._execute_command("echo bye; exit 3")
+        assert result["exit_code"] == 3
+        assert result["stdout"] == "bye\n"
+
+        result = agent._execute_command("pwd")
+        assert result["exit_code"] == 0
+        assert result["stdout"] == root + "\n"
+        assert "note" in result
+
+        result = agent._execute_command("sleep 10", timeout=0.3)
+        assert result["error"] == "Command timed out after 0.3 seconds"
+        assert agent._execute_command("echo ok")["stdout"] == "ok\n"
+    finally:
+        agent.close()
+
+
+def test_busy_session_does_not_wait():
+    session = ShellSession(tempfile.mkdtemp(prefix="shell_"))
+    try:
+        results = []
+        thread = threading.Thread(target=lambda: results.append(session.run("sleep 0.5; echo slow")))
+        thread.start()
+        time.sleep(0.2)
+        start = time.perf_counter()
+        assert session.run("echo fast", wait=False) is None
+        assert time.perf_counter() - start < 0.1
+        thread.join()
+        assert results[0]["stdout"].text() == "slow\n"
+        assert session.run("echo fast", wait=False)["stdout"].text() == "fast\n"
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    test_state_persists_between_commands()
+    test_timeout_restarts_in_same_directory()
+    test_exit_and_recovery()
+    test_busy_session_does_not_wait()
+    print("Shell session tests completed!")
@@ -0,0 +1,65 @@
+"""
+Tests for streaming responses with eager tool dispatch.
+
+This script tests:
+1. A function call starts as soon as its item is complete, before the stream ends
+2. Text deltas are printed as they arrive
+3. Calls started while streaming are not run a second time
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import agentic_agent
+from fake_llm_server import ScriptedClient
+
+
+SCENARIO = {
+    "rules": [{"when": agentic_agent.TOOL_RESULTS_INSTRUCTION, "text": "Both commands ran."}],
+    "steps": [{"tool_calls": [{"name": "execute_command", "arguments": {"command": "first"}},
+                              {"name": "execute_command", "arguments": {"command": "second"}}]}],
+}
+
+
+def test_tools_start_while_stream_is_running(capsys):
+    # The model is still producing the second call 0.2 seconds after the first
+    client = ScriptedClient(SCENARIO, item_delay_ms=200)
+    stream_ends, commands = [], []
+    create = client.responses.create
+
+    def timed_create(**request):
+        yield from create(**request)
+        stream_ends.append(time.monotonic())
+
+    client.responses.create = timed_create
+    agent = agentic_agent.Agent(
+        working_directory=tempfile.mkdtemp(prefix="agent_stream_"),
+        client=client,
+        stream=True,
+    )
+
+    def record_command(command, timeout=30):
+        commands.append((command, time.monotonic()))
+        return {"command": command, "exit_code": 0}
+
+    agent._execute_command = record_command
+
+    result = agent.prompt("Run both commands.")
+
+    assert result == ""
+    assert [command for command, _ in commands] == ["first", "second"]
+    assert commands[0][1] < stream_ends[0]
+    outputs = [item for item in agent.memory if isinstance(item, dict) and item.get("type") == "function_call_output"]
+    assert [output["call_id"] for output in outputs] == ["call_1_0", "call_1_1"]
+    assert agent.memory[-1] == {"role": "assistant", "content": "Both commands ran."}
+    assert capsys.readouterr().out.count("Both commands ran.") == 1
+
+
+if __name__ == "__main__":
+    print("Run with pytest: python -m pytest test_streaming.py")
@@ -0,0 +1,120 @@
+"""
+Tests for the find_symbol / find_references tools.
+
+This script tests:
+1. Definitions come back with signatures, line ranges and docstring summaries
+2. References cover calls, attributes and imports
+3. Files are re-parsed only when their content changes
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import agentic_agent
+from symbol_index import SymbolIndex
+
+
+SERVICE = '''"""Time bank service."""
+
+from storage.db import Database
+
+RATE: float = 1.5
+
+
+class LedgerService:
+    """Moves hours between members."""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def transfer(self, sender: str, receiver: str, hours: float = 1.0) -> bool:
+        """Transfer hours from sender to receiver.
+
+        Returns True on success.
+        """
+        return self.db.connect() is not None
+
+
+def make_service():
+    return LedgerService(Database())
+'''
+
+DB = '''class Database:
+    def connect(self):
+        return object()
+'''
+
+
+def make_workspace():
+    root = tempfile.mkdtemp(prefix="symbols_")
+    os.makedirs(os.path.join(root, "storage"))
+    with open(os.path.join(root, "service.py"), "w") as file:
+        file.write(SERVICE)
+    with open(os.path.join(root, "storage", "db.py"), "w") as file:
+        file.write(DB)
+    with open(os.path.join(root, "broken.py"), "w") as file:
+        file.write("def broken(:\n")
+    return root
+
+
+def test_find_symbol():
+    index = SymbolIndex(make_workspace())
+
+    assert index.find_symbol("LedgerService.transfer") == [{
+        "path": "service.py",
+        "qualname": "LedgerService.transfer",
+        "kind": "method",
+        "lines": "14-19",
+        "signature": "async def transfer(self, sender: str, receiver: str, hours: float=1.0) -> bool",
+        "doc": "Transfer hours from sender to receiver.",
+    }]
+    assert index.find_symbol("Database")[0]["signature"] == "class Database"
+    assert [entry["qualname"] for entry in index.find_symbol("connect")] == ["Database.connect"]
+    assert index.find_symbol("make_service")[0]["kind"] == "function"
+    assert index.find_symbol("RATE")[0]["kind"] == "variable"
+    assert index.find_symbol("transfer", kind="function") == []
+    assert "broken.py" in index.errors()
+
+
+def test_find_references():
+    index = SymbolIndex(make_workspace())
+
+    result = index.find_references("Database")
+    assert [(ref["path"], ref["line"]) for ref in result["references"]] == [
+        ("service.py", 3), ("service.py", 11), ("service.py", 23)]
+    assert result["references"][0]["text"] == "from storage.db import Database"
+
+    assert index.find_references("Database.connect")["references"][0]["line"] == 19
+    assert index.find_references("Database", limit=1)["truncated"]
+
+
+def test_cache_by_mtime_and_hash():
+    root = make_workspace()
+    agent = agentic_agent.Agent(working_directory=root)
+
+    assert agent._find_symbol("connect")["count"] == 1
+    index = agent._symbol_index
+    index.max_staleness = 60
+    parsed = index.stats["parsed"]
+
+    # Touching a file without changing it doesn't re-parse it
+    os.utime(os.path.join(root, "service.py"))
+    index.mark_stale()
+    agent._find_symbol("connect")
+    assert index.stats["parsed"] == parsed
+
+    agent._write_file("storage/db.py", DB + "\n    def close(self):\n        pass\n")
+    assert agent._find_symbol("close")["definitions"][0]["lines"] == "5-6"
+    assert index.stats["parsed"] == parsed + 1
+    assert agent._find_references("close")["count"] == 0
+
+
+if __name__ == "__main__":
+    test_find_symbol()
+    test_find_references()
+    test_cache_by_mtime_and_hash()
+    print("Symbol index tests completed!")
@@ -0,0 +1,96 @@
+"""
+Tests for the shared decorator-based tool registry.
+
+This script tests:
+1. Schemas are built from type hints and docstrings
+2. Dispatch by name for plain functions and agent methods
+3. Argument validation before the call
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool_registry import ToolRegistry
+
+
+TOOLS = ToolRegistry()
+
+
+@TOOLS.tool
+def tag_files(paths: list[str], tag: str, recursive: bool = False, limit: int = None):
+    """
+    Add a tag to several files.
+
+    Args:
+        paths: The files to tag
+        tag: The tag to add. Long descriptions can
+            continue on the next line.
+        recursive: Also tag files in subdirectories
+    """
+    return {"tagged": paths, "tag": tag, "recursive": recursive}
+
+
+class Notebook:
+    def __init__(self):
+        self.notes = []
+
+    @TOOLS.tool
+    def _add_note(self, text: str):
+        """
+        Add a note.
+
+        Args:
+            text: The note text
+        """
+        self.notes.append(text)
+        return len(self.notes)
+
+
+def test_schema_from_hints_and_docstring():
+    schema = TOOLS.get("tag_files").schema
+
+    assert schema["name"] == "tag_files"
+    assert schema["description"] == "Add a tag to several files."
+    properties = schema["parameters"]["properties"]
+    assert properties["paths"] == {"type": "array", "items": {"type": "string"}, "description": "The files to tag"}
+    assert properties["tag"]["description"] == "The tag to add. Long descriptions can continue on the next line."
+    assert properties["recursive"]["type"] == "boolean"
+    assert properties["limit"] == {"type": "integer"}
+    assert schema["parameters"]["required"] == ["paths", "tag"]
+
+    # Methods drop `self` and the leading underscore
+    assert TOOLS.names() == ["tag_files", "add_note"]
+    assert list(TOOLS.get("add_note").schema["parameters"]["properties"]) == ["text"]
+    assert TOOLS.chat_schemas()[1]["function"]["name"] == "add_note"
+
+
+def test_dispatch():
+    result = TOOLS.dispatch("tag_files", {"paths": ["a.md"], "tag": "docs"})
+    assert result == {"tagged": ["a.md"], "tag": "docs", "recursive": False}
+
+    notebook = Notebook()
+    assert TOOLS.dispatch("add_note", {"text": "hello"}, notebook) == 1
+    assert notebook.notes == ["hello"]
+
+    assert TOOLS.dispatch("missing", {}) == "Error: Unknown tool missing"
+
+
+def test_validation():
+    assert TOOLS.validate("tag_files", {"paths": ["a.md"]}) == "missing required argument 'tag'"
+    assert TOOLS.validate("tag_files", {"paths": "a.md", "tag": "x"}) == "argument 'paths' must be of type array, got str"
+    assert TOOLS.validate("tag_files", {"paths": [1], "tag": "x"}) == "argument 'paths' has an item that must be of type string, got int"
+    assert TOOLS.validate("tag_files", {"paths": [], "tag": "x", "limit": True}) == "argument 'limit' must be of type integer, got bool"
+    assert TOOLS.validate("tag_files", {"paths": [], "tag": "x", "color": "red"}) == "unexpected argument 'color'"
+    assert TOOLS.validate("tag_files", {"paths": [], "tag": "x", "limit": None}) is None
+
+    result = TOOLS.dispatch("add_note", {}, Notebook())
+    assert result == "Error: Invalid arguments for add_note: missing required argument 'text'"
+
+
+if __name__ == "__main__":
+    test_schema_from_hints_and_docstring()
+    test_dispatch()
+    test_validation()
+    print("Tool registry tests completed!")
@@ -0,0 +1,100 @@
+"""
+Tests for structured tracing.
+
+This script tests:
+1. A plan-mode run records nested run -> iteration -> phase -> model/tool spans
+2. Tool spans from parallel workers keep their parent and record exit codes
+3. The JSONL file rotates and the summary reads every rotated file
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import agentic_agent
+from fake_llm_server import ScriptedClient
+from tracing import Tracer, format_folded, format_tree, read_spans, summarize
+
+
+def test_plan_run_spans_nest():
+    trace_file = os.path.join(tempfile.mkdtemp(prefix="trace_"), "trace.jsonl")
+    client = ScriptedClient({
+        "rules": [{"when": agentic_agent.CHECK_PROMPT, "text": "Yes"},
+                  {"when": agentic_agent.ACT_PROMPT,
+                   "tool_calls": [{"name": "write_file", "arguments": {"filepath": "a.txt", "content": "hi"}}]}],
+        "final": {"text": "Write a.txt"},
+    })
+    agent = agentic_agent.Agent(working_directory=tempfile.mkdtemp(prefix="trace_work_"),
+                                client=client, tracer=Tracer(trace_file))
+    agent.run("Write a.txt")
+    agent.tracer.close()
+
+    summary = summarize(read_spans(trace_file))
+    paths = set(summary)
+    assert ("run", "iteration", "phase:plan", "model_call") in paths
+    assert ("run", "iteration", "phase:act", "handle_tool_call", "tool:write_file", "validate_path") in paths
+    assert ("run", "iteration", "phase:summary", "handle_tool_call", "model_call") in paths
+    assert summary[("run",)]["count"] == 1
+    # plan, act, check and summary each make two model calls
+    assert sum(entry["count"] for path, entry in summary.items() if path[-1] == "model_call") == 8
+
+    model_call = next(span for span in read_spans(trace_file) if span["name"] == "model_call")
+    assert model_call["attrs"]["input_tokens"] > 0
+    assert model_call["attrs"]["payload_chars"] > 0
+
+    tree = format_tree(summary)
+    assert tree.splitlines()[1].startswith("run")
+    assert "run;iteration;phase:plan;model_call " in format_folded(summary)
+
+
+def test_parallel_tool_spans_keep_their_parent():
+    trace_file = os.path.join(tempfile.mkdtemp(prefix="trace_"), "trace.jsonl")
+    client = ScriptedClient({"steps": [
+        {"tool_calls": [{"name": "execute_command", "arguments": {"command": "exit 3"}},
+                        {"name": "list_directory", "arguments": {"path": "."}}]},
+        {"tool_calls": [{"name": "finish", "arguments": {"summary": "done"}}]},
+    ]})
+    agent = agentic_agent.Agent(working_directory=tempfile.mkdtemp(prefix="trace_work_"),
+                                client=client, tracer=Tracer(trace_file))
+    agent.run_loop("Run a command")
+    agent.tracer.close()
+
+    spans = read_spans(trace_file)
+    by_id = {span["span_id"]: span for span in spans}
+    command = next(span for span in spans if span["name"] == "tool:execute_command")
+    assert command["attrs"]["exit_code"] == 3
+    assert by_id[command["parent_id"]]["name"] == "iteration"
+    assert len({span["trace_id"] for span in spans}) == 1
+
+
+def test_rotation_and_disabled_tracer():
+    trace_file = os.path.join(tempfile.mkdtemp(prefix="trace_"), "trace.jsonl")
+    tracer = Tracer(trace_file, max_bytes=2000, backup_count=2)
+    for number in range(60):
+        with tracer.span("step", number=number):
+            pass
+    tracer.close()
+
+    assert os.path.exists(trace_file + ".1")
+    assert not os.path.exists(trace_file + ".3")
+    assert os.path.getsize(trace_file) <= 2000
+    spans = read_spans(trace_file)
+    numbers = [span["attrs"]["number"] for span in spans]
+    assert numbers == sorted(numbers) and numbers[-1] == 59
+
+    disabled = Tracer(None)
+    with disabled.span("anything", size=1) as span:
+        span.set(more=2)
+    assert disabled.path is None
+
+
+if __name__ == "__main__":
+    test_plan_run_spans_nest()
+    test_parallel_tool_spans_keep_their_parent()
+    test_rotation_and_disabled_tracer()
+    print("Tracing tests completed!")
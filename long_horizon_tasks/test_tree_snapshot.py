@@ -0,0 +1,104 @@
+"""
+Tests for the snapshot_tree and changes_since tools.
+
+This script tests:
+1. A snapshot returns the whole tree with sizes and hashes in one call
+2. changes_since reports adds, removals, moves and edits, and nothing for unchanged files
+3. Unchanged files are not hashed again, and unknown snapshot ids are rejected
+"""
+
+import os
+import sys
+import tempfile
+from unittest import mock
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tree_snapshot
+from tree_snapshot import changes_since, snapshot_tree
+
+
+def make_folder(monkeypatch):
+    root = tempfile.mkdtemp(prefix="snapshot_")
+    monkeypatch.chdir(root)
+    os.makedirs("notes/old")
+    for name, text in {"README.md": "# Notes\n", "todo.md": "- buy milk\n", "notes/meeting.md": "Agenda\n",
+                       "notes/old/draft.md": "draft\n", "recipe.txt": "Flour, water\n"}.items():
+        with open(name, "w") as file:
+            file.write(text)
+    return root
+
+
+def test_snapshot_tree(monkeypatch):
+    make_folder(monkeypatch)
+
+    snapshot = snapshot_tree(".")
+    assert snapshot["files"] == 5 and snapshot["directories"] == 2
+    assert snapshot["bytes"] == sum(os.path.getsize(path) for path in
+                                    ["README.md", "todo.md", "notes/meeting.md", "notes/old/draft.md", "recipe.txt"])
+    tree = snapshot["tree"]
+    assert sorted(tree) == ["README.md", "notes", "recipe.txt", "todo.md"]
+    assert sorted(tree["notes"]) == ["meeting.md", "old"]
+    size, modified, digest = tree["notes"]["old"]["draft.md"]
+    assert size == 6 and len(digest) == 16
+    assert os.path.exists(os.path.join(tree_snapshot.SNAPSHOT_DIR, snapshot["snapshot_id"] + ".json"))
+
+    # Snapshots themselves are not part of the tree, and a long tree is cut short
+    assert tree_snapshot.SNAPSHOT_DIR not in snapshot_tree(".")["tree"]
+    short = snapshot_tree(".", max_entries=3)
+    assert "truncated" in short
+
+
+def test_changes_since(monkeypatch):
+    make_folder(monkeypatch)
+    snapshot_id = snapshot_tree(".")["snapshot_id"]
+
+    assert changes_since(snapshot_id)["unchanged"] == 5
+
+    # What an organizer might do
+    os.makedirs("recipes")
+    os.rename("recipe.txt", "recipes/bread.txt")
+    os.rename("notes/old/draft.md", "notes/draft.md")
+    os.rmdir("notes/old")
+    with open("todo.md", "a") as file:
+        file.write("- call home\n")
+    with open("notes/index.md", "w") as file:
+        file.write("meeting.md\n")
+    os.remove("README.md")
+
+    changes = changes_since(snapshot_id)
+    assert changes["moved"] == [{"from": "notes/old/draft.md", "to": "notes/draft.md"},
+                                {"from": "recipe.txt", "to": "recipes/bread.txt"}]
+    assert changes["added"] == ["notes/index.md"]
+    assert changes["removed"] == ["README.md"]
+    assert changes["edited"] == [{"path": "todo.md", "bytes_before": 11, "bytes_after": 23}]
+    assert changes["directories_added"] == ["recipes"]
+    assert changes["directories_removed"] == ["notes/old"]
+    assert changes["unchanged"] == 1  # notes/meeting.md
+
+    # The new snapshot is the base for the next check
+    again = changes_since(changes["snapshot_id"])
+    assert again["unchanged"] == 5
+    assert not any(key in again for key in ("added", "removed", "moved", "edited"))
+
+
+def test_unchanged_files_are_not_rehashed(monkeypatch):
+    make_folder(monkeypatch)
+    snapshot_id = snapshot_tree(".")["snapshot_id"]
+    with open("todo.md", "a") as file:
+        file.write("- call home\n")
+
+    with mock.patch.object(tree_snapshot, "_hash_file", wraps=tree_snapshot._hash_file) as hash_file:
+        changes = changes_since(snapshot_id)
+    assert [call.args[0] for call in hash_file.call_args_list] == [os.path.join(os.getcwd(), "todo.md")]
+    assert changes["rehashed"] == 1
+
+    for bad in ("missing-id", "../etc/passwd", ""):
+        with pytest.raises(ValueError):
+            changes_since(bad)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
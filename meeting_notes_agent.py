@@ -6,6 +6,8 @@ from pathlib import Path
 import logging
 import sys
 
+from replay_client import client_from_env
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -13,8 +15,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Check for OpenAI API key
-if not os.getenv("OPENAI_API_KEY"):
+# Check for OpenAI API key (not needed when replaying recorded responses or when
+# OPENAI_BASE_URL points at a local server such as fake_llm_server.py)
+LOCAL_SERVER = bool(os.getenv("OPENAI_BASE_URL")) and not os.getenv("OPENAI_API_KEY")
+if not os.getenv("OPENAI_API_KEY") and os.getenv("AGENT_REPLAY_MODE") != "replay" and not LOCAL_SERVER:
     logger.error("OPENAI_API_KEY environment variable is not set!")
     logger.error("Please set it with: export OPENAI_API_KEY='your-api-key-here'")
     print("\n" + "=" * 70)
@@ -32,7 +36,7 @@ if not os.getenv("OPENAI_API_KEY"):
         sys.exit(1)
 
 try:
-    client = OpenAI()
+    client = client_from_env(lambda: OpenAI(api_key="local") if LOCAL_SERVER else OpenAI())
 except Exception as error:
     logger.error(f"Failed to initialize OpenAI client: {error}")
     if __name__ == "__main__":
@@ -177,7 +181,7 @@ def update_todo_status(filename, todo_text, completed=True):
 
 
 class MeetingNotesAgent:
-    def __init__(self):
+    def __init__(self, client=None):
         self.tools = [
             {
                 "type": "function",
@@ -302,6 +306,9 @@ Always be thorough and accurate in capturing meeting details."""
         self.conversation_history = [
             {"role": "system", "content": self.system_prompt}
         ]
+        
+        # OpenAI-compatible client; None uses the module-level client
+        self.client = client
     
     def execute_tool(self, tool_name, arguments):
         """Execute a tool function and return the result."""
@@ -339,7 +346,8 @@ Always be thorough and accurate in capturing meeting details."""
         })
         
         while True:
-            response = client.chat.completions.create(
+            model_client = self.client if self.client is not None else client
+            response = model_client.chat.completions.create(
                 model="gpt-4o",
                 messages=self.conversation_history,
                 tools=self.tools,
@@ -0,0 +1,230 @@
+"""
+Record/replay cache for model calls.
+
+ReplayClient wraps an OpenAI client and exposes the two endpoints the agents use,
+`responses.create` and `chat.completions.create`. Each request is canonicalized
+(model, input/messages, tools, instructions and any other arguments), hashed, and
+its response is kept in an on-disk content-addressed store:
+
+    <store_dir>/<first two hex chars>/<sha256>.json
+
+Modes:
+    record       Call the live API and store every response (overwriting old ones)
+    replay       Serve responses from the store only; a missing entry raises
+                 ReplayMiss. No network or API key is needed.
+    passthrough  Call the live API without touching the store
+
+Replays only hit when a run sends the same requests as the recorded one. Keys
+leave out what differs between otherwise identical runs, so a recording made in
+one checkout replays in another:
+
+    - the agents' working directories (registered with register_working_directory,
+      which Agent does) are replaced with a placeholder
+    - timing fields of tool results (VOLATILE_FIELDS) are dropped, also inside
+      JSON-encoded tool outputs
+    - generated names (timestamp-uuid spill files and snapshot ids) are replaced
+      with a placeholder
+
+Example:
+    client = client_from_env(OpenAI)   # uses AGENT_REPLAY_MODE / AGENT_REPLAY_DIR
+
+    AGENT_REPLAY_MODE=record python agentic_agent.py   # once, online
+    AGENT_REPLAY_MODE=replay python agentic_agent.py   # offline, in milliseconds
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import re
+import tempfile
+from types import SimpleNamespace
+
+
+MODES = ("record", "replay", "passthrough")
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".model_cache")
+
+
+# Tool result fields that differ from run to run; left out of request keys
+VOLATILE_FIELDS = frozenset({"duration_seconds", "slowest", "waited_seconds", "runtime_seconds", "pid"})
+
+# Names like "20250101-120000-1a2b3c4d" (command output spill files, snapshot ids)
+_GENERATED_NAME = re.compile(r"\b\d{8}-\d{6}-[0-9a-f]{8}\b")
+
+# Working directories of the agents in this process, named by a placeholder in keys
+_working_directories = set()
+
+
+class ReplayMiss(LookupError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+def _canonical(value):
+    """Convert request arguments (dicts, lists, SDK objects) into plain JSON data."""
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if hasattr(value, "model_dump"):
+        return _canonical(value.model_dump(exclude_none=True, mode="json"))
+    if hasattr(value, "__dict__"):
+        return _canonical(vars(value))
+    return str(value)
+
+
+def register_working_directory(path):
+    """Key requests that mention `path` (or its real path) as if they named a placeholder."""
+    _working_directories.update({os.path.abspath(path), os.path.realpath(path)})
+
+
+def _normalized(value):
+    """Canonical request data without what differs between runs (see the module docstring)."""
+    if isinstance(value, dict):
+        return {key: _normalized(item) for key, item in value.items() if key not in VOLATILE_FIELDS}
+    if isinstance(value, list):
+        return [_normalized(item) for item in value]
+    if not isinstance(value, str):
+        return value
+    if value[:1] in ("{", "["):
+        try:
+            decoded = json.loads(value)
+        except ValueError:
+            pass
+        else:
+            # A tool output or call arguments
+            return json.dumps(_normalized(decoded), sort_keys=True)
+    # Longest first, so a directory isn't replaced inside a longer one
+    for directory in sorted(_working_directories, key=len, reverse=True):
+        value = value.replace(directory, "<working_directory>")
+    return _GENERATED_NAME.sub("<generated>", value)
+
+
+def request_key(endpoint, request):
+    """The content address of a request: sha256 of its canonical, normalized JSON."""
+    canonical = json.dumps(
+        {"endpoint": endpoint, "request": _normalized(_canonical(request))},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _response_class(endpoint):
+    if endpoint == "responses":
+        from openai.types.responses import Response
+        return Response
+    from openai.types.chat import ChatCompletion
+    return ChatCompletion
+
+
+class _Endpoint:
+    def __init__(self, owner, endpoint, live_create):
+        self._owner = owner
+        self._endpoint = endpoint
+        self._live_create = live_create
+
+    def create(self, **request):
+        return self._owner._create(self._endpoint, self._live_create, request)
+
+
+class ReplayClient:
+    """
+    A drop-in stand-in for the parts of OpenAI the agents call.
+
+    Args:
+        client: The live client, or a zero-argument factory for one. A factory is
+            only called when a live request is actually needed, so replay mode works
+            without an API key.
+        store_dir: Directory of the content-addressed response store
+        mode: "record", "replay" or "passthrough"
+
+    Attributes:
+        stats: Counts of "hits" (served from the store), "recorded" and "live" calls
+    """
+
+    def __init__(self, client=None, store_dir=DEFAULT_STORE_DIR, mode="replay"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown replay mode {mode!r}; expected one of {', '.join(MODES)}")
+        if isinstance(client, type) or inspect.isroutine(client):
+            self._client, self._client_factory = None, client
+        else:
+            self._client, self._client_factory = client, None
+        self.store_dir = store_dir
+        self.mode = mode
+        self.stats = {"hits": 0, "recorded": 0, "live": 0}
+
+        self.responses = _Endpoint(self, "responses", lambda **request: self.live.responses.create(**request))
+        self.chat = SimpleNamespace(
+            completions=_Endpoint(self, "chat.completions", lambda **request: self.live.chat.completions.create(**request))
+        )
+
+    @property
+    def live(self):
+        """The wrapped live client, created on first use when a factory was given."""
+        if self._client is None and self._client_factory is not None:
+            self._client = self._client_factory()
+        if self._client is None:
+            raise RuntimeError("ReplayClient has no live client to call")
+        return self._client
+
+    def __getattr__(self, name):
+        # Endpoints other than responses/chat (e.g. audio) go straight to the live client
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.live, name)
+
+    def _path(self, key):
+        return os.path.join(self.store_dir, key[:2], f"{key}.json")
+
+    def _create(self, endpoint, live_create, request):
+        if self.mode == "passthrough":
+            self.stats["live"] += 1
+            return live_create(**request)
+
+        if request.get("stream"):
+            raise ValueError("Streaming requests cannot be recorded or replayed; use passthrough mode")
+
+        key = request_key(endpoint, request)
+        path = self._path(key)
+
+        if self.mode == "replay":
+            try:
+                with open(path, "r") as file:
+                    entry = json.load(file)
+            except FileNotFoundError:
+                raise ReplayMiss(f"No recorded response for {endpoint} request {key[:12]} in {self.store_dir}")
+            self.stats["hits"] += 1
+            return _response_class(endpoint).model_validate(entry["response"])
+
+        self.stats["live"] += 1
+        response = live_create(**request)
+        entry = {
+            "endpoint": endpoint,
+            "request": _canonical(request),
+            "response": response.model_dump(mode="json"),
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename so a crash never leaves a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            json.dump(entry, file)
+        os.replace(temp_path, path)
+        self.stats["recorded"] += 1
+        return response
+
+
+def client_from_env(client_factory):
+    """
+    Build the module-level client for an agent script.
+
+    With AGENT_REPLAY_MODE unset (or "passthrough") this is just client_factory().
+    Otherwise the client is wrapped in a ReplayClient storing responses in
+    AGENT_REPLAY_DIR (default: .model_cache next to this file).
+    """
+    mode = os.environ.get("AGENT_REPLAY_MODE", "passthrough")
+    if mode == "passthrough":
+        return client_factory()
+    return ReplayClient(client_factory, os.environ.get("AGENT_REPLAY_DIR", DEFAULT_STORE_DIR), mode)
@@ -0,0 +1,317 @@
+"""
+A small registry for agent tools.
+
+Decorate a function (or an agent method) with a registry's `tool` decorator and the
+registry builds the tool's JSON schema once, at import time, from the type hints and
+the docstring. Agents hand `registry.schemas` to the model and dispatch each
+function_call with a dict lookup instead of a long `if item.name == ...` chain.
+
+Example:
+    TOOLS = ToolRegistry()
+
+    @TOOLS.tool
+    def read_file(filepath: str):
+        \"\"\"
+        Read the contents of a file at the specified filepath.
+
+        Args:
+            filepath: The path to the file to read
+        \"\"\"
+        ...
+
+    result = TOOLS.dispatch("read_file", {"filepath": "notes.md"})
+"""
+
+import asyncio
+import inspect
+import types
+import typing
+
+
+# JSON schema types for the Python annotations tools use
+JSON_TYPES = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    dict: "object",
+}
+
+
+def _json_schema(annotation):
+    """Convert a type hint into a JSON schema fragment."""
+    origin = typing.get_origin(annotation)
+
+    # Optional[X] / X | None -> X
+    if origin in (typing.Union, types.UnionType):
+        members = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(members) == 1:
+            return _json_schema(members[0])
+        return {}
+
+    if origin is list:
+        schema = {"type": "array"}
+        item_args = typing.get_args(annotation)
+        if item_args:
+            schema["items"] = _json_schema(item_args[0])
+        return schema
+
+    if origin is dict:
+        return {"type": "object"}
+
+    if annotation in JSON_TYPES:
+        return {"type": JSON_TYPES[annotation]}
+
+    return {}
+
+
+def _parse_docstring(docstring):
+    """
+    Split a docstring into the tool description and per-argument descriptions.
+
+    The description is everything before the "Args:" section. Each argument is
+    documented as "name: description", with continuation lines indented further.
+
+    Returns:
+        tuple: (description: str, argument_descriptions: dict)
+    """
+    lines = inspect.cleandoc(docstring or "").splitlines()
+    description_lines = []
+    argument_descriptions = {}
+    current = None
+    in_args = False
+
+    for line in lines:
+        stripped = line.strip()
+        if stripped in ("Args:", "Arguments:", "Parameters:"):
+            in_args = True
+            continue
+        if stripped in ("Returns:", "Raises:", "Example:", "Examples:"):
+            in_args = False
+            current = None
+            continue
+        if not in_args:
+            description_lines.append(stripped)
+            continue
+
+        name, separator, text = stripped.partition(":")
+        if separator and name.isidentifier() and not line.startswith(" " * 8):
+            current = name
+            argument_descriptions[current] = text.strip()
+        elif current and stripped:
+            argument_descriptions[current] += " " + stripped
+
+    description = " ".join(" ".join(description_lines).split())
+    return description, argument_descriptions
+
+
+class Tool:
+    """A registered tool: the Python callable plus its prebuilt schema."""
+
+    __slots__ = ("name", "func", "schema", "parameters", "required", "is_method")
+
+    def __init__(self, name, func, description=None):
+        self.name = name
+        self.func = func
+
+        signature = inspect.signature(func)
+        hints = typing.get_type_hints(func)
+        doc_description, argument_descriptions = _parse_docstring(func.__doc__)
+
+        parameters = list(signature.parameters.values())
+        self.is_method = bool(parameters) and parameters[0].name == "self"
+        if self.is_method:
+            parameters = parameters[1:]
+
+        properties = {}
+        self.required = []
+        for parameter in parameters:
+            property_schema = _json_schema(hints.get(parameter.name))
+            if parameter.name in argument_descriptions:
+                property_schema["description"] = argument_descriptions[parameter.name]
+            properties[parameter.name] = property_schema
+            if parameter.default is inspect.Parameter.empty:
+                self.required.append(parameter.name)
+
+        self.parameters = properties
+        self.schema = {
+            "type": "function",
+            "name": name,
+            "description": description or doc_description,
+            "parameters": {
+                "type": "object",
+                "properties": properties,
+                "required": list(self.required),
+            },
+        }
+
+    def validate(self, arguments):
+        """
+        Check a call's arguments against the schema.
+
+        Returns:
+            str or None: A description of the first problem found, or None if the
+            arguments are valid.
+        """
+        if not isinstance(arguments, dict):
+            return "arguments must be a JSON object"
+
+        for name in self.required:
+            if name not in arguments:
+                return f"missing required argument '{name}'"
+
+        for name, value in arguments.items():
+            if name not in self.parameters:
+                return f"unexpected argument '{name}'"
+            if value is None and name not in self.required:
+                continue
+            problem = _check_type(value, self.parameters[name])
+            if problem:
+                return f"argument '{name}' {problem}"
+
+        return None
+
+
+def _check_type(value, schema):
+    expected = schema.get("type")
+    if expected is None:
+        return None
+
+    if expected == "string":
+        valid = isinstance(value, str)
+    elif expected == "integer":
+        valid = isinstance(value, int) and not isinstance(value, bool)
+    elif expected == "number":
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+    elif expected == "boolean":
+        valid = isinstance(value, bool)
+    elif expected == "array":
+        valid = isinstance(value, list)
+        if valid and "items" in schema:
+            for element in value:
+                problem = _check_type(element, schema["items"])
+                if problem:
+                    return f"has an item that {problem}"
+    elif expected == "object":
+        valid = isinstance(value, dict)
+    else:
+        valid = True
+
+    if not valid:
+        return f"must be of type {expected}, got {type(value).__name__}"
+    return None
+
+
+class ToolRegistry:
+    """
+    Registered tools, their schemas and name -> tool dispatch.
+
+    Schemas are built once when a tool registers, so every agent that uses the
+    registry shares the same list instead of rebuilding it in __init__.
+    """
+
+    def __init__(self):
+        self._tools = {}
+        self.schemas = []  # Responses API format
+        self._chat_schemas = None
+
+    def tool(self, func=None, *, name=None, description=None):
+        """
+        Register a function as a tool. Usable as @registry.tool or
+        @registry.tool(name="...", description="...").
+
+        A leading underscore is dropped from the function name, so agent methods like
+        `_read_file` register as `read_file`.
+        """
+        def register(func):
+            tool_name = name or func.__name__.lstrip("_")
+            if tool_name in self._tools:
+                raise ValueError(f"Tool already registered: {tool_name}")
+            tool = Tool(tool_name, func, description)
+            self._tools[tool_name] = tool
+            self.schemas.append(tool.schema)
+            self._chat_schemas = None
+            return func
+
+        if func is not None:
+            return register(func)
+        return register
+
+    def __contains__(self, name):
+        return name in self._tools
+
+    def __len__(self):
+        return len(self._tools)
+
+    def get(self, name):
+        return self._tools.get(name)
+
+    def names(self):
+        return list(self._tools)
+
+    def chat_schemas(self):
+        """The schemas in Chat Completions format ({"type": "function", "function": {...}})."""
+        if self._chat_schemas is None:
+            self._chat_schemas = [
+                {
+                    "type": "function",
+                    "function": {
+                        "name": schema["name"],
+                        "description": schema["description"],
+                        "parameters": schema["parameters"],
+                    },
+                }
+                for schema in self.schemas
+            ]
+        return self._chat_schemas
+
+    def validate(self, name, arguments):
+        tool = self._tools.get(name)
+        if tool is None:
+            return f"unknown tool '{name}'"
+        return tool.validate(arguments)
+
+    def _resolve(self, name, arguments, instance):
+        """Return (callable, None) for a valid call, or (None, error string)."""
+        tool = self._tools.get(name)
+        if tool is None:
+            return None, f"Error: Unknown tool {name}"
+
+        problem = tool.validate(arguments)
+        if problem:
+            return None, f"Error: Invalid arguments for {name}: {problem}"
+
+        if tool.is_method:
+            if instance is None:
+                raise TypeError(f"Tool {name} is a method and needs an instance to dispatch on")
+            return getattr(instance, tool.func.__name__), None
+        return tool.func, None
+
+    def dispatch(self, name, arguments, instance=None):
+        """
+        Validate the arguments and call the tool.
+
+        Method tools are looked up on `instance` by attribute, so subclasses and
+        per-instance overrides are respected.
+
+        Returns:
+            The tool's result, or an error string if the tool is unknown or the
+            arguments are invalid.
+        """
+        func, error = self._resolve(name, arguments, instance)
+        if error:
+            return error
+        return func(**arguments)
+
+    async def adispatch(self, name, arguments, instance=None):
+        """
+        Async counterpart of dispatch: coroutine tools are awaited and plain tools
+        run in a worker thread so they don't block the event loop.
+        """
+        func, error = self._resolve(name, arguments, instance)
+        if error:
+            return error
+        if inspect.iscoroutinefunction(func):
+            return await func(**arguments)
+        return await asyncio.to_thread(func, **arguments)
@@ -0,0 +1,290 @@
+"""
+Structured tracing for the agents: nested spans written to a rotating JSONL file.
+
+Each span records its name, parent, wall time and any attributes set on it (token
+usage, payload sizes, exit codes, ...). Spans nest through a context variable, so
+a span opened inside another becomes its child, across asyncio tasks as well as
+worker threads started through contextvars.copy_context().
+
+    tracer = Tracer("agent_trace.jsonl")
+    with tracer.span("model_call", model=MODEL) as span:
+        response = client.responses.create(...)
+        span.set(output_tokens=response.usage.output_tokens)
+
+Tracing is off unless a path is given; a disabled tracer hands out a shared no-op
+span, so instrumented code costs next to nothing when nobody is tracing.
+default_tracer() reads the path from AGENT_TRACE_FILE.
+
+One JSON object per line:
+
+    {"trace_id": ..., "span_id": ..., "parent_id": ..., "name": "tool:read_file",
+     "start": 1733150000.123, "duration_ms": 1.52, "status": "ok", "attrs": {...}}
+
+Summarize a trace as a tree of span paths with total and self time:
+
+    python tracing.py agent_trace.jsonl
+    python tracing.py agent_trace.jsonl --folded > trace.folded   # for flamegraph.pl
+"""
+
+import argparse
+import contextvars
+import glob
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class RotatingJsonlWriter:
+    """
+    Appends JSON lines to a file, rotating it to path.1 ... path.N once it grows past
+    max_bytes (like logging.handlers.RotatingFileHandler).
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._lock = threading.Lock()
+        self._file = None
+        self._size = 0
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+
+    def _rotate(self):
+        self._file.close()
+        for number in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{number}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{number + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def write(self, record):
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._open()
+            if self._size and self._size + len(line) > self.max_bytes:
+                self._rotate()
+            self._file.write(line)
+            self._file.flush()
+            self._size += len(line)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class Span:
+    """One timed operation. Use as a context manager; set() adds attributes."""
+
+    __slots__ = ("tracer", "name", "attrs", "trace_id", "span_id", "parent_id", "start", "_t0", "_token")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+        return self
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.span_id = self.tracer._next_id()
+        self._token = _current_span.set(self)
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        duration = time.perf_counter() - self._t0
+        _current_span.reset(self._token)
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration_ms": round(duration * 1000, 3),
+            "status": "ok" if exc_type is None else "error",
+            "attrs": self.attrs,
+        }
+        if exc_type is not None:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer._writer.write(record)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """
+    Creates spans and writes finished ones to a rotating JSONL file.
+
+    Args:
+        path: The JSONL file; None disables tracing
+        max_bytes: Rotate the file once it would grow past this size
+        backup_count: Rotated files to keep (path.1 is the most recent)
+    """
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT):
+        self.path = path
+        self.enabled = path is not None
+        self._writer = RotatingJsonlWriter(path, max_bytes, backup_count) if self.enabled else None
+        self._ids = itertools.count(1)
+        self._prefix = uuid.uuid4().hex[:8]
+
+    def _next_id(self):
+        return f"{self._prefix}-{next(self._ids)}"
+
+    def span(self, name, **attrs):
+        """A new span, a child of the span currently open in this context (if any)."""
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attrs)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+_default_tracer = None
+
+
+def default_tracer():
+    """The process-wide tracer, writing to AGENT_TRACE_FILE (disabled when unset)."""
+    global _default_tracer
+    if _default_tracer is None:
+        _default_tracer = Tracer(
+            os.environ.get("AGENT_TRACE_FILE"),
+            max_bytes=int(os.environ.get("AGENT_TRACE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+        )
+    return _default_tracer
+
+
+def read_spans(path):
+    """Every span in a trace file and its rotated backups, oldest file first."""
+    backups = sorted(glob.glob(f"{glob.escape(path)}.[0-9]*"),
+                     key=lambda name: int(name.rsplit(".", 1)[1]), reverse=True)
+    spans = []
+    for name in backups + ([path] if os.path.exists(path) else []):
+        with open(name, "r", encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if line:
+                    spans.append(json.loads(line))
+    return spans
+
+
+def summarize(spans):
+    """
+    Aggregate spans by their path from the root (e.g. run/iteration/phase:plan/model_call).
+
+    Returns:
+        dict: path tuple -> {"count", "total_ms", "self_ms"}. Self time is the span's
+        time minus the time of its direct children. A span whose parent is missing
+        (e.g. rotated away) is treated as a root.
+    """
+    by_id = {span["span_id"]: span for span in spans}
+    paths = {}
+
+    def path_of(span):
+        span_id = span["span_id"]
+        if span_id not in paths:
+            parent = by_id.get(span["parent_id"])
+            paths[span_id] = (path_of(parent) if parent is not None else ()) + (span["name"],)
+        return paths[span_id]
+
+    child_ms = {}
+    for span in spans:
+        if span["parent_id"] in by_id:
+            child_ms[span["parent_id"]] = child_ms.get(span["parent_id"], 0.0) + span["duration_ms"]
+
+    summary = {}
+    for span in spans:
+        entry = summary.setdefault(path_of(span), {"count": 0, "total_ms": 0.0, "self_ms": 0.0})
+        entry["count"] += 1
+        entry["total_ms"] += span["duration_ms"]
+        entry["self_ms"] += max(0.0, span["duration_ms"] - child_ms.get(span["span_id"], 0.0))
+    return summary
+
+
+def format_tree(summary, width=30):
+    """Render a summary as an indented tree, heaviest paths first, with time bars."""
+    grand_total = sum(entry["total_ms"] for path, entry in summary.items() if len(path) == 1) or 1.0
+    children = {}
+    for path in summary:
+        children.setdefault(path[:-1], []).append(path)
+
+    lines = [f"{'span':<48}{'count':>8}{'total ms':>12}{'self ms':>12}  share"]
+
+    def walk(parent, depth):
+        for path in sorted(children.get(parent, []), key=lambda path: -summary[path]["total_ms"]):
+            entry = summary[path]
+            bar = "█" * max(1, round(width * entry["total_ms"] / grand_total))
+            label = ("  " * depth + path[-1])[:47]
+            lines.append(f"{label:<48}{entry['count']:>8}{entry['total_ms']:>12.1f}"
+                         f"{entry['self_ms']:>12.1f}  {bar}")
+            walk(path, depth + 1)
+
+    walk((), 0)
+    return "\n".join(lines)
+
+
+def format_folded(summary):
+    """Folded stacks ("a;b;c <self microseconds>") for flamegraph.pl or speedscope."""
+    return "\n".join(
+        f"{';'.join(path)} {round(entry['self_ms'] * 1000)}"
+        for path, entry in sorted(summary.items())
+        if entry["self_ms"] > 0
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize an agent trace file")
+    parser.add_argument("trace_file", help="JSONL trace (rotated backups are read too)")
+    parser.add_argument("--folded", action="store_true", help="Print folded stacks instead of a tree")
+    args = parser.parse_args()
+
+    summary = summarize(read_spans(args.trace_file))
+    print(format_folded(summary) if args.folded else format_tree(summary))
+
+
+if __name__ == "__main__":
+    main()
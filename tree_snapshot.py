@@ -0,0 +1,206 @@
+"""
+Snapshots of a directory tree for the agents' snapshot_tree and changes_since tools.
+
+Learning what a folder holds one list_directory call per level, and reading files
+again to see whether they changed, costs a model turn per folder and per file.
+snapshot_tree() walks the whole tree with os.scandir in one call and records every
+file's size, modification time and content hash. The snapshot is saved under
+SNAPSHOT_DIR, so another agent (the reviewer checking the organizer's work) can
+pass its id to changes_since(), which rescans the tree and reports only what was
+added, removed, moved (the same content at a new path) or edited.
+
+Rescans are incremental: a file whose size and modification time match the
+earlier snapshot keeps its recorded hash instead of being read again.
+
+    snapshot_tree("notes")  ->  {"snapshot_id": "...", "files": 120, "tree": {...}}
+    changes_since("...")    ->  {"moved": [{"from": "a.md", "to": "docs/a.md"}], ...}
+"""
+
+import hashlib
+import json
+import os
+import time
+import uuid
+
+
+# Where snapshots are saved, relative to the current directory
+SNAPSHOT_DIR = ".agent_snapshots"
+
+# Directories that are never part of a snapshot (the last is content_index's cache)
+SKIP_DIRS = {".git", "__pycache__", SNAPSHOT_DIR, ".agent_cache"}
+
+# Most entries in a returned tree, and most paths listed per kind of change
+MAX_TREE_ENTRIES = 2000
+MAX_REPORTED_CHANGES = 200
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def _hash_file(path):
+    digest = hashlib.blake2b(digest_size=8)
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _scan(root, known=None):
+    """
+    Every file and directory below `root`, by path relative to it.
+
+    Args:
+        known: Earlier file records ({path: [size, mtime_ns, hash]}) whose hashes are
+            reused for files that haven't changed size or modification time
+
+    Returns:
+        tuple: ({path: [size, mtime_ns, hash]}, [directory paths]), and the number of files hashed
+    """
+    known = known or {}
+    files, directories, hashed = {}, [], 0
+    stack = [""]
+    while stack:
+        relative = stack.pop()
+        with os.scandir(os.path.join(root, relative) if relative else root) as entries:
+            for entry in entries:
+                path = f"{relative}/{entry.name}" if relative else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        directories.append(path)
+                        stack.append(path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    previous = known.get(path)
+                    if previous and previous[0] == stat.st_size and previous[1] == stat.st_mtime_ns:
+                        digest = previous[2]
+                    else:
+                        try:
+                            digest = _hash_file(entry.path)
+                        except OSError:
+                            continue  # removed or unreadable since it was listed
+                        hashed += 1
+                    files[path] = [stat.st_size, stat.st_mtime_ns, digest]
+    return files, sorted(directories), hashed
+
+
+def _save(root, files, directories):
+    snapshot_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    record = {"id": snapshot_id, "root": root, "created": time.time(), "files": files, "directories": directories}
+    with open(os.path.join(SNAPSHOT_DIR, f"{snapshot_id}.json"), "w", encoding="utf-8") as file:
+        json.dump(record, file)
+    return snapshot_id
+
+
+def _load(snapshot_id):
+    if not snapshot_id or os.path.basename(snapshot_id) != snapshot_id:
+        raise ValueError(f"Not a snapshot id: {snapshot_id!r}")
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, f"{snapshot_id}.json"), encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        raise ValueError(f"No snapshot {snapshot_id!r}; take one with snapshot_tree first") from None
+
+
+def _tree(files, directories, max_entries):
+    """
+    A nested dict of the tree: directories map to dicts, files to [size, modified, hash].
+    Stops after max_entries entries.
+    """
+    tree, count = {}, 0
+    for path in directories + sorted(files):
+        if count >= max_entries:
+            return tree, True
+        *parents, name = path.split("/")
+        node = tree
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        if path in files:
+            size, mtime_ns, digest = files[path]
+            node[name] = [size, time.strftime("%Y-%m-%d %H:%M", time.localtime(mtime_ns / 1e9)), digest]
+        else:
+            node.setdefault(name, {})
+        count += 1
+    return tree, False
+
+
+def snapshot_tree(path=".", max_entries=MAX_TREE_ENTRIES):
+    """
+    Record the tree below `path` and return it with a snapshot id for changes_since.
+
+    Returns:
+        dict: snapshot_id, files, directories, bytes, and "tree" (see _tree), with
+        "truncated" when it was cut at max_entries
+    """
+    root = os.path.abspath(path)
+    if not os.path.isdir(root):
+        raise ValueError(f"Not a directory: {path}")
+    files, directories, _ = _scan(root)
+    tree, truncated = _tree(files, directories, max_entries)
+    result = {
+        "snapshot_id": _save(root, files, directories),
+        "files": len(files),
+        "directories": len(directories),
+        "bytes": sum(record[0] for record in files.values()),
+        "tree": tree,
+    }
+    if truncated:
+        result["truncated"] = f"Only the first {max_entries} entries are shown"
+    return result
+
+
+def _capped(result, key, items):
+    if items:
+        result[key] = items[:MAX_REPORTED_CHANGES]
+        if len(items) > MAX_REPORTED_CHANGES:
+            result[f"{key}_omitted"] = len(items) - MAX_REPORTED_CHANGES
+
+
+def changes_since(snapshot_id):
+    """
+    Compare the tree a snapshot was taken of with its current state.
+
+    A removed file whose content reappears at an added path is reported as a move.
+    The current state is saved as a new snapshot, so calls can be chained.
+
+    Returns:
+        dict: snapshot_id (the new snapshot), unchanged (count), and whichever of
+        added, removed, moved ({"from", "to"}), edited ({"path", "bytes_before",
+        "bytes_after"}), directories_added and directories_removed are not empty
+    """
+    before = _load(snapshot_id)
+    root = before["root"]
+    old_files = before["files"]
+    files, directories, hashed = _scan(root, old_files)
+
+    removed = sorted(set(old_files) - set(files))
+    added = sorted(set(files) - set(old_files))
+    edited = [{"path": path, "bytes_before": old_files[path][0], "bytes_after": files[path][0]}
+              for path in sorted(set(files) & set(old_files)) if files[path][2] != old_files[path][2]]
+
+    # Pair removed and added files with the same content, preferring the same file name
+    added_by_hash = {}
+    for path in added:
+        added_by_hash.setdefault(files[path][2], []).append(path)
+    moved, moved_to = [], set()
+    for path in removed:
+        candidates = [candidate for candidate in added_by_hash.get(old_files[path][2], ()) if candidate not in moved_to]
+        if candidates:
+            name = path.rsplit("/", 1)[-1]
+            target = next((candidate for candidate in candidates if candidate.rsplit("/", 1)[-1] == name), candidates[0])
+            moved.append({"from": path, "to": target})
+            moved_to.add(target)
+    moved_from = {move["from"] for move in moved}
+
+    result = {
+        "snapshot_id": _save(root, files, directories),
+        "since": snapshot_id,
+        "unchanged": len(files) - len(added) - len(edited),
+        "rehashed": hashed,
+    }
+    _capped(result, "added", [path for path in added if path not in moved_to])
+    _capped(result, "removed", [path for path in removed if path not in moved_from])
+    _capped(result, "moved", moved)
+    _capped(result, "edited", edited)
+    _capped(result, "directories_added", sorted(set(directories) - set(before["directories"])))
+    _capped(result, "directories_removed", sorted(set(before["directories"]) - set(directories)))
+    return result
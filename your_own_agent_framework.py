@@ -1,29 +1,25 @@
 from openai import OpenAI
 client = OpenAI()
 import json 
+from tool_registry import ToolRegistry
 
-def get_horoscope(sign):
+TOOLS = ToolRegistry()
+
+@TOOLS.tool
+def get_horoscope(sign: str):
+    """
+    Get today's horoscope for an astrological sign.
+
+    Args:
+        sign: An astrological sign like Taurus or Aquarius
+    """
     print(f"Getting horoscope for {sign}")
     return f"{sign}: Next Tuesday you will befriend a baby otter."
 
 
 class Agent:
     def __init__(self):
-        self.tools = [{
-            "type": "function",
-            "name": "get_horoscope",
-            "description": "Get today's horoscope for an astrological sign.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "sign": {
-                        "type": "string",
-                        "description": "An astrological sign like Taurus or Aquarius",
-                    },
-                },
-                "required": ["sign"],
-            },
-        }] # tools to use
+        self.tools = TOOLS.schemas # tools to use, built once at import
         self.name = "Agent"
         self.system_prompt = f"""
         You are a helpful oracle.
@@ -54,18 +50,17 @@ class Agent:
         for item in output:
             print(item)
             if item.type == "function_call":
-                if item.name == "get_horoscope":
-                    # 3. Execute the function logic for get_horoscope
-                    horoscope = get_horoscope(json.loads(item.arguments))
-                    
-                    # 4. Provide function call results to the model
-                    self.memory.append({
-                        "type": "function_call_output",
-                        "call_id": item.call_id,
-                        "output": json.dumps({
-                            "horoscope": horoscope
-                        })
+                # 3. Execute the function logic for the tool the model picked
+                horoscope = TOOLS.dispatch(item.name, json.loads(item.arguments))
+                
+                # 4. Provide function call results to the model
+                self.memory.append({
+                    "type": "function_call_output",
+                    "call_id": item.call_id,
+                    "output": json.dumps({
+                        "horoscope": horoscope
                     })
+                })
             elif item.type == "text":
                 self.memory.append({"role": "assistant", "content": item.content})
         print(self.memory)